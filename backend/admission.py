@@ -0,0 +1,172 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+# Upstream admission settings
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "32"))
+LLM_RATE_LIMIT = float(os.environ.get("LLM_RATE_LIMIT", "0"))  # requests/s, 0 = unlimited
+LLM_RATE_BURST = int(os.environ.get("LLM_RATE_BURST", str(LLM_MAX_CONCURRENCY)))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "256"))
+LLM_MAX_QUEUE_TIME = float(os.environ.get("LLM_MAX_QUEUE_TIME", "10"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when an upstream call is refused instead of queued"""
+
+    def __init__(self, reason: str, status_code: int, retry_after: float):
+        super().__init__(f"Upstream capacity exceeded ({reason})")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations (how long to wait for a token)"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self) -> None:
+        self.tokens += 1
+
+
+class AdmissionController:
+    """Concurrency limit, rate limit and a bounded wait queue for upstream calls.
+
+    Calls beyond the concurrency limit wait in a queue of at most
+    ``max_queue`` entries for at most ``max_queue_time`` seconds. Anything
+    that can't be admitted in time fails fast with AdmissionRejected:
+    429 when the rate limit is the bottleneck, 503 when the queue is.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, rate: float = LLM_RATE_LIMIT,
+                 burst: int = LLM_RATE_BURST, max_queue: int = LLM_MAX_QUEUE,
+                 max_queue_time: float = LLM_MAX_QUEUE_TIME):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self.bucket: Optional[TokenBucket] = TokenBucket(rate, burst) if rate > 0 else None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "rate_limited": 0, "queue_timeout": 0}
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+        self._recent_waits: deque = deque(maxlen=1024)
+        # Smoothed time a call holds its slot, used for Retry-After hints
+        self._service_time = 1.0
+
+    def _retry_after(self) -> float:
+        return self._service_time * (self.waiting + 1) / self.max_concurrency
+
+    def _reject(self, reason: str, status_code: int, retry_after: float):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, status_code, retry_after)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        started = time.monotonic()
+        if self.waiting >= self.max_queue:
+            self._reject("queue_full", 503, self._retry_after())
+
+        self.waiting += 1
+        reserved = admitted = False
+        try:
+            if self.bucket is not None:
+                delay = self.bucket.reserve(started)
+                reserved = True
+                if delay > self.max_queue_time:
+                    self._reject("rate_limited", 429, delay)
+                if delay:
+                    await asyncio.sleep(delay)
+
+            if not self._semaphore.locked():
+                # A free slot is taken without waiting, even if the rate delay used up the queue time
+                await self._semaphore.acquire()
+            else:
+                remaining = self.max_queue_time - (time.monotonic() - started)
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), max(0.0, remaining))
+                except asyncio.TimeoutError:
+                    self._reject("queue_timeout", 503, self._retry_after())
+            admitted = True
+        finally:
+            self.waiting -= 1
+            # A call that never goes out (rejected or cancelled while waiting) gives its rate token back
+            if reserved and not admitted:
+                self.bucket.refund()
+
+        admitted_at = time.monotonic()
+        wait = admitted_at - started
+        self.admitted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self._recent_waits.append(wait)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - admitted_at)
+
+    async def try_admit(self) -> Optional[Callable[[], None]]:
+        """Take a slot (and rate token) only if one is free right now, for optional extra calls like hedges.
+
+        Returns the function that gives the slot back, or None when
+        admitting would mean waiting; nothing queued is ever overtaken.
+        """
+        if self._semaphore.locked() or self.waiting:
+            return None
+        if self.bucket is not None and self.bucket.reserve(time.monotonic()) > 0:
+            self.bucket.refund()
+            return None
+        # Free and nobody waiting, so this returns without suspending
+        await self._semaphore.acquire()
+        self.admitted += 1
+        self.in_flight += 1
+
+        def release() -> None:
+            self.in_flight -= 1
+            self._semaphore.release()
+        return release
+
+    def stats(self) -> Dict[str, Any]:
+        recent = sorted(self._recent_waits)
+
+        def percentile(p: float) -> float:
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+
+        return {
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "wait_seconds": {
+                "mean": self.total_wait / self.admitted if self.admitted else 0.0,
+                "p50": percentile(0.50),
+                "p99": percentile(0.99),
+                "max": self.max_wait,
+            },
+        }
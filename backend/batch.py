@@ -0,0 +1,61 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+# Bulk conversation settings
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_JOBS = int(os.environ.get("BATCH_MAX_JOBS", "1000"))
+BATCH_MAX_MESSAGES = int(os.environ.get("BATCH_MAX_MESSAGES", "50"))
+
+
+async def run_batch(jobs: Sequence[Tuple[str, List[str]]],
+                    run_turn: Callable[[str, str], Awaitable[Dict[str, Any]]],
+                    describe_error: Callable[[Exception], Dict[str, Any]],
+                    concurrency: int = BATCH_MAX_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+    """Run (session_id, messages) jobs, yielding each job's result as soon as it finishes.
+
+    Jobs for the same session run one after another in submission order;
+    different sessions run in parallel on at most ``concurrency`` workers.
+    A job stops at its first failed turn, since later turns build on it.
+    Closing the iterator cancels whatever is still running.
+    """
+    sessions: Dict[str, List[int]] = {}
+    for index, (session_id, _) in enumerate(jobs):
+        sessions.setdefault(session_id, []).append(index)
+    pending = deque(sessions.values())
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def run_job(index: int) -> Dict[str, Any]:
+        session_id, messages = jobs[index]
+        started = time.perf_counter()
+        turns: List[Dict[str, Any]] = []
+        error = None
+        for message in messages:
+            try:
+                turns.append(await run_turn(session_id, message))
+            except Exception as e:
+                error = describe_error(e)
+                break
+        return {
+            "index": index,
+            "session_id": session_id,
+            "turns": turns,
+            "error": error,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    async def worker() -> None:
+        while pending:
+            for index in pending.popleft():
+                results.put_nowait(await run_job(index))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(pending))))]
+    try:
+        for _ in range(len(jobs)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
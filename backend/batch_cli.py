@@ -0,0 +1,109 @@
+"""Send conversations in bulk to /api/chat/batch and write the results as NDJSON.
+
+Input is either a CSV with ``session_id`` and ``message`` columns (one
+turn per row; rows sharing a session_id form one conversation, in row
+order; a blank session_id makes the row a conversation of its own) or a
+JSONL file of ``{"session_id": ..., "messages": [...]}`` jobs. Sessions
+longer than the server's per-job limit (--max-messages) are sent as
+consecutive jobs for the same session_id, which the server runs in order.
+Results are written one line per job as the server finishes them; a
+summary goes to stderr.
+
+    python batch_cli.py requests.csv --url http://localhost:8000 --concurrency 8 > results.ndjson
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Iterator, List
+
+from batch import BATCH_MAX_CONCURRENCY, BATCH_MAX_JOBS, BATCH_MAX_MESSAGES
+
+
+def read_jobs(path: str) -> List[Dict[str, Any]]:
+    """Jobs from a CSV of turns or a JSONL file of conversations"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if not path.endswith(".csv"):
+            return [json.loads(line) for line in f if line.strip()]
+        jobs: Dict[str, Dict[str, Any]] = {}
+        singles: List[Dict[str, Any]] = []
+        for row in csv.DictReader(f):
+            session_id = (row.get("session_id") or "").strip()
+            if not session_id:
+                singles.append({"messages": [row["message"]]})
+                continue
+            jobs.setdefault(session_id, {"session_id": session_id, "messages": []})["messages"].append(row["message"])
+        return list(jobs.values()) + singles
+
+
+def split_long_jobs(jobs: List[Dict[str, Any]], max_messages: int) -> List[Dict[str, Any]]:
+    """Jobs with at most max_messages each; a longer session becomes consecutive jobs for its session_id.
+
+    A part still runs if an earlier part of its session failed. Raises
+    ValueError for a long job without a session_id, since its parts would
+    each start a new conversation.
+    """
+    split = []
+    for number, job in enumerate(jobs, 1):
+        messages = job["messages"]
+        if len(messages) <= max_messages:
+            split.append(job)
+            continue
+        if not job.get("session_id"):
+            raise ValueError(f"job {number} has {len(messages)} messages (limit {max_messages}) and no session_id "
+                             f"to continue it under; give it a session_id or shorten it")
+        split.extend({**job, "messages": messages[start:start + max_messages]}
+                     for start in range(0, len(messages), max_messages))
+    return split
+
+
+def post_batch(url: str, jobs: List[Dict[str, Any]], concurrency: int, timeout: float) -> Iterator[Dict[str, Any]]:
+    """Job results from one batch request, yielded as the lines arrive"""
+    body = json.dumps({"jobs": jobs, "concurrency": concurrency}).encode("utf-8")
+    request = urllib.request.Request(f"{url.rstrip('/')}/api/chat/batch", data=body,
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV of turns or JSONL of conversations")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY)
+    parser.add_argument("--chunk", type=int, default=BATCH_MAX_JOBS, help="jobs per request")
+    parser.add_argument("--max-messages", type=int, default=BATCH_MAX_MESSAGES,
+                        help="turns per job accepted by the server (its BATCH_MAX_MESSAGES)")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for the next result")
+    args = parser.parse_args()
+
+    try:
+        jobs = split_long_jobs(read_jobs(args.input), args.max_messages)
+    except ValueError as e:
+        raise SystemExit(f"Error in {args.input}: {e}")
+    started = time.perf_counter()
+    failed = turns = 0
+    # Chunks run one after another, so a session split across two keeps its order
+    for offset in range(0, len(jobs), args.chunk):
+        try:
+            for result in post_batch(args.url, jobs[offset:offset + args.chunk], args.concurrency, args.timeout):
+                result["index"] += offset
+                failed += result["error"] is not None
+                turns += len(result["turns"])
+                sys.stdout.write(json.dumps(result) + "\n")
+                sys.stdout.flush()
+        except urllib.error.HTTPError as e:
+            raise SystemExit(f"Error from batch endpoint: {e.code} {e.read().decode('utf-8', 'replace')}")
+
+    elapsed = time.perf_counter() - started
+    print(f"{len(jobs)} jobs ({turns} turns, {failed} failed) in {elapsed:.1f}s, "
+          f"{turns / elapsed if elapsed else 0:.1f} turns/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Check that a conversation survives being served by alternating workers.
+
+Each simulated worker has its own RedisSessionStore (and so no shared
+Python state) on top of one shared FakeRedis; consecutive turns of the
+same session are routed to different workers.
+
+Run from the backend directory:
+
+    python -m benchmarks.alternating_workers --workers 3 --turns 6
+"""
+import argparse
+import asyncio
+
+import server
+from benchmarks.fake_llm import FakeAsyncLLM
+from benchmarks.fake_redis import FakeRedis
+from session_store import RedisSessionStore
+
+
+async def run(workers: int, turns: int):
+    redis = FakeRedis()
+    stores = [RedisSessionStore(client=redis) for _ in range(workers)]
+    server.cerebras_client = FakeAsyncLLM(latency=0)
+    server.completion_cache = None
+
+    session_id = "alternating"
+    for turn in range(turns):
+        server.session_store = stores[turn % workers]
+        await server.chat_with_ai(server.ChatMessage(message=f"message {turn}", session_id=session_id))
+
+    for index, store in enumerate(stores):
+        history = await store.history(session_id)
+        users = [t.content for t in history if t.type == "user"]
+        if users != [f"message {turn}" for turn in range(turns)]:
+            raise SystemExit(f"worker {index} sees a broken history: {users}")
+    print(f"{turns} turns over {workers} workers: every worker sees all {turns * 2} history entries in order")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=6)
+    args = parser.parse_args()
+    asyncio.run(run(args.workers, args.turns))
+
+
+if __name__ == "__main__":
+    main()
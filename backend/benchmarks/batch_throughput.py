@@ -0,0 +1,72 @@
+"""Throughput of /api/chat/batch against a fake LLM as the concurrency cap grows.
+
+Runs the same batch (``--sessions`` conversations of ``--turns`` turns
+each, every turn one upstream call of ``--latency`` seconds) at
+concurrency 1, 2, 4, ... up to the cap, through the endpoint's NDJSON
+generator, and reports turns/s, speedup over concurrency 1, scaling
+efficiency, and how soon the first result line was ready.
+
+Run from the backend directory:
+
+    python -m benchmarks.batch_throughput --sessions 32 --turns 3 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import server
+from batch import BATCH_MAX_CONCURRENCY
+from benchmarks.fake_llm import FakeAsyncLLM
+
+
+async def run(sessions: int, turns: int, concurrency: int, tag: str) -> tuple:
+    request = server.BatchRequest(concurrency=concurrency, jobs=[
+        {"session_id": f"batch-{tag}-{i}",
+         "messages": [f"I need a shelf for my garage, note {i}.{turn}" for turn in range(turns)]}
+        for i in range(sessions)
+    ])
+    started = time.perf_counter()
+    first = None
+    results = []
+    async for line in server.batch_lines(request):
+        first = first or time.perf_counter() - started
+        results.append(json.loads(line))
+    elapsed = time.perf_counter() - started
+    failed = [result for result in results if result["error"] is not None]
+    if len(results) != sessions or failed:
+        raise SystemExit(f"batch at concurrency {concurrency} lost or failed jobs: {failed[:1]}")
+    return elapsed, first
+
+
+async def sweep(args) -> None:
+    levels = [level for level in (1, 2, 4, 8, 16, 32, 64) if level < args.cap] + [args.cap]
+    total_turns = args.sessions * args.turns
+    baseline = None
+    for concurrency in levels:
+        elapsed, first = await run(args.sessions, args.turns, concurrency, str(concurrency))
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(f"concurrency {concurrency:3d}: {elapsed:6.2f}s, {total_turns / elapsed:7.1f} turns/s, "
+              f"speedup {speedup:5.2f}x, efficiency {speedup / concurrency:4.0%}, first result after {first:.2f}s")
+    if speedup / levels[-1] < 0.8:
+        raise SystemExit("batch throughput stopped scaling before the concurrency cap")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--cap", type=int, default=BATCH_MAX_CONCURRENCY, help="at most BATCH_MAX_CONCURRENCY")
+    args = parser.parse_args()
+
+    server.cerebras_client = FakeAsyncLLM(latency=args.latency)
+    # Every turn should reach the (fake) model
+    server.completion_cache = None
+
+    asyncio.run(sweep(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Snap and quote throughput against a large synthetic SKU catalog.
+
+Builds a catalog of about --skus parts (mostly shelves on a fine
+width x depth grid, plus posts, panels and dividers) and measures:
+nearest-SKU lookups through the bisect indexes next to a linear scan,
+quotes for distinct configurations (memo misses), and quotes for a
+recurring working set (memo hits), all single-threaded.
+
+Run from the backend directory:
+
+    python -m benchmarks.catalog_lookup --skus 100000
+"""
+import argparse
+import json
+import math
+import random
+import time
+import tracemalloc
+
+from catalog import CATALOG_PATH, Catalog
+from shelf_schema import SHELF_FIELDS, canonical_config
+
+OPTIONS = {field.name: field.options for field in SHELF_FIELDS if field.options}
+
+
+def synthetic_catalog(skus: int) -> dict:
+    """The shipped styles and finishes over ~skus parts, sizes on a 0.25 in grid"""
+    with open(CATALOG_PATH, encoding="utf-8") as f:
+        shipped = json.load(f)
+    side = int(math.sqrt(skus * 0.94))
+    widths = [12 + 0.25 * i for i in range(side)]
+    lengths = [8 + 0.25 * i * 40 / side for i in range(side)]
+    heights = [12 + 0.25 * i for i in range(max(1, skus // 20))]
+    items = [{"sku": f"WS-{i}-{j}", "kind": "shelf", "width": w, "length": l, "price": 10 + w * l / 100}
+             for i, w in enumerate(widths) for j, l in enumerate(lengths)]
+    items += [{"sku": f"SS-{i}", "kind": "solid_shelf", "width": w, "length": l, "price": 20 + w * l / 80}
+              for i, (w, l) in enumerate(zip(widths, lengths))]
+    items += [{"sku": f"PT-{i}", "kind": "post", "height": h, "price": 5 + h / 5} for i, h in enumerate(heights)]
+    items += [{"sku": f"DV-{i}", "kind": "divider", "length": l, "price": 4 + l / 4} for i, l in enumerate(lengths)]
+    items += [{"sku": f"TP-{i}", "kind": "top_panel", "width": w, "length": l, "price": 15 + w * l / 50}
+              for i, (w, l) in enumerate(zip(widths, lengths))]
+    items += [{"sku": f"SP-{i}", "kind": "side_panel", "length": l, "height": h, "price": 12 + l * h / 80}
+              for i, (l, h) in enumerate(zip(lengths, heights))]
+    items += [{"sku": f"BP-{i}", "kind": "back_panel", "width": w, "height": h, "price": 15 + w * h / 80}
+              for i, (w, h) in enumerate(zip(widths, heights))]
+    items.append({"sku": "CS-5", "kind": "caster", "price": 9.99})
+    return {**shipped, "items": items}
+
+
+def random_config(rng: random.Random) -> dict:
+    shelves = rng.randint(2, 8)
+    dividers = rng.choice((0, 0, 1, 2))
+    return canonical_config({
+        "width": rng.uniform(12, 110), "length": rng.uniform(8, 48), "post_height": rng.uniform(24, 110),
+        "number_of_shelves": shelves,
+        "shelf_style": rng.choice(OPTIONS["shelf_style"]),
+        "color_and_finish": rng.choice(OPTIONS["color_and_finish"]),
+        "type_of_posts": rng.choice(OPTIONS["type_of_posts"]),
+        "enclosure_type": rng.choice(OPTIONS["enclosure_type"]),
+        "solid_bottom_shelf": rng.random() < 0.3,
+        "shelf_dividers_count": dividers,
+        "shelf_dividers_shelves": [rng.randint(1, shelves)] if dividers else [],
+    })
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:,.0f}/s ({seconds / count * 1e6:.2f} us each)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--working-set", type=int, default=1000, help="distinct configurations behind the hits")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    data = synthetic_catalog(args.skus)
+    started = time.perf_counter()
+    catalog = Catalog(data, quote_cache_size=args.working_set)
+    build = time.perf_counter() - started
+    tracemalloc.start()
+    Catalog(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"catalog: {catalog.items:,} SKUs, built in {build * 1000:.0f} ms ({peak / 1e6:.1f} MB peak)")
+
+    points = [(rng.uniform(12, 110), rng.uniform(8, 48)) for _ in range(args.lookups)]
+    started = time.perf_counter()
+    for width, length in points:
+        catalog.nearest("shelf", width, length)
+    print(f"nearest shelf SKU (bisect):      {rate(len(points), time.perf_counter() - started)}")
+
+    flat = [item for item in data["items"] if item["kind"] == "shelf"]
+    scan = points[:200]
+    started = time.perf_counter()
+    for width, length in scan:
+        min(flat, key=lambda item: (abs(item["width"] - width), abs(item["length"] - length)))
+    print(f"nearest shelf SKU (linear scan): {rate(len(scan), time.perf_counter() - started)}")
+
+    configs = [random_config(rng) for _ in range(args.lookups // 4)]
+    started = time.perf_counter()
+    for config in configs:
+        catalog.quote_config(config)
+    print(f"quote, memo miss:                {rate(len(configs), time.perf_counter() - started)}")
+
+    working_set = configs[:args.working_set]
+    for config in working_set:
+        catalog.quote_config(config)
+    recurring = [rng.choice(working_set) for _ in range(args.lookups)]
+    hits = catalog.hits
+    started = time.perf_counter()
+    for config in recurring:
+        catalog.quote_config(config)
+    elapsed = time.perf_counter() - started
+    print(f"quote, memo hit:                 {rate(len(recurring), elapsed)} "
+          f"[{catalog.hits - hits} hits]")
+
+    entities = [{"width": c["width"], "length": c["length"], "postHeight": c["post_height"],
+                 "numberOfShelves": c["number_of_shelves"]} for c in working_set]
+    picks = [rng.choice(entities) for _ in range(args.lookups // 4)]
+    started = time.perf_counter()
+    for item in picks:
+        catalog.quote(item)
+    print(f"quote from chat entities (canonicalise + memo): {rate(len(picks), time.perf_counter() - started)}")
+
+
+if __name__ == "__main__":
+    main()
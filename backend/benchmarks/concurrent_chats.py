@@ -0,0 +1,41 @@
+"""Check that concurrent chats overlap instead of queueing on the event loop.
+
+Run from the backend directory:
+
+    python -m benchmarks.concurrent_chats --concurrency 10 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+import server
+from benchmarks.fake_llm import FakeAsyncLLM, FakeSyncLLM
+
+
+async def run(concurrency: int, latency: float, sync_client: bool) -> float:
+    server.cerebras_client = (FakeSyncLLM if sync_client else FakeAsyncLLM)(latency=latency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        server.chat_with_ai(server.ChatMessage(message="I need a shelf for my garage", session_id=f"bench-{i}"))
+        for i in range(concurrency)
+    ))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--sync-client", action="store_true", help="use a blocking fake client")
+    args = parser.parse_args()
+
+    elapsed = asyncio.run(run(args.concurrency, args.latency, args.sync_client))
+    print(f"{args.concurrency} concurrent chats: {elapsed:.3f}s "
+          f"(one LLM call = {args.latency:.3f}s, serial would be {args.concurrency * args.latency:.3f}s)")
+    if elapsed > args.latency * 2:
+        raise SystemExit("chats were serialized")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Replay recorded conversations with full and windowed context.
+
+The fake model answers from its prompt alone (see ContextLLM), so a
+window that loses an agreed value shows up as a wrong extraction. Reports
+prompt tokens per model call for both modes, checks every call saw the
+whole configuration agreed so far, and that the final session
+configuration is the same. The "workshop" conversation is longer than
+the default window.
+
+Run from the backend directory:
+
+    python -m benchmarks.context_replay --max-turns 2
+"""
+import argparse
+import asyncio
+import json
+import os
+
+import context_builder
+import server
+from benchmarks.fake_llm import ContextLLM
+from session_store import InMemorySessionStore
+
+CONVERSATIONS = os.path.join(os.path.dirname(__file__), "data", "conversations.json")
+
+
+def load_conversations():
+    with open(CONVERSATIONS) as f:
+        return json.load(f)
+
+
+async def replay(conversations, max_turns: int, token_budget: int):
+    context_builder.CONTEXT_MAX_TURNS = max_turns
+    context_builder.CONTEXT_TOKEN_BUDGET = token_budget
+    server.session_store = InMemorySessionStore()
+    server.completion_cache = None
+
+    tokens, states, mismatches = {}, {}, {}
+    for conversation in conversations:
+        name = conversation["name"]
+        server.cerebras_client = llm = ContextLLM(conversation)
+        tokens[name] = []
+        for turn in conversation["turns"]:
+            response = await server.chat_with_ai(server.ChatMessage(message=turn["user"], session_id=name))
+            # None: answered without calling the model
+            if response.prompt_tokens is not None:
+                tokens[name].append(response.prompt_tokens)
+        states[name] = (await server.session_store.load(name)).entities.to_dict()
+        mismatches[name] = llm.mismatches
+    return tokens, states, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-turns", type=int, default=context_builder.CONTEXT_MAX_TURNS)
+    parser.add_argument("--token-budget", type=int, default=context_builder.CONTEXT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    conversations = load_conversations()
+    full_tokens, full_states, _ = asyncio.run(replay(conversations, 10**6, 10**9))
+    window_tokens, window_states, mismatches = asyncio.run(replay(conversations, args.max_turns, args.token_budget))
+
+    for conversation in conversations:
+        name = conversation["name"]
+        print(f"{name:10s} full    {full_tokens[name]}")
+        print(f"{'':10s} window  {window_tokens[name]}")
+        for user_message, known, expected in mismatches[name]:
+            raise SystemExit(f"{name}: the windowed prompt for {user_message!r} carried {known}, expected {expected}")
+        if full_states[name] != window_states[name]:
+            raise SystemExit(f"{name}: windowed context changed the extracted configuration")
+    total_full = sum(map(sum, full_tokens.values()))
+    total_window = sum(map(sum, window_tokens.values()))
+    print(f"prompt tokens: full {total_full}, windowed {total_window} "
+          f"({100 * (1 - total_window / total_full):.1f}% fewer); every prompt carried the agreed configuration")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Check per-session ordering and duplicate-submit coalescing on /api/chat.
+
+Fires N identical submits for one session at once (a double-click storm)
+and expects one upstream call and one history exchange; then fires
+distinct messages concurrently and expects whole, non-interleaved
+exchanges.
+
+Run from the backend directory:
+
+    python -m benchmarks.duplicate_submits --submits 10
+"""
+import argparse
+import asyncio
+
+import server
+from benchmarks.fake_llm import FakeAsyncLLM
+from session_store import InMemorySessionStore
+
+
+async def run(submits: int, latency: float):
+    server.session_store = InMemorySessionStore()
+    server.completion_cache = None
+    server.cerebras_client = llm = FakeAsyncLLM(latency=latency)
+
+    request = server.ChatMessage(message="I need a shelf for my garage", session_id="dupes")
+    responses = await asyncio.gather(*(server.chat_with_ai(request) for _ in range(submits)))
+    history = await server.session_store.history("dupes")
+    if llm.calls != 1 or len(history) != 2 or len({r.response for r in responses}) != 1:
+        raise SystemExit(f"expected 1 upstream call and 2 history entries, got {llm.calls} and {len(history)}")
+    print(f"{submits} identical submits: {llm.calls} upstream call, {len(history)} history entries")
+
+    messages = [f"message {i}" for i in range(submits)]
+    await asyncio.gather(*(
+        server.chat_with_ai(server.ChatMessage(message=m, session_id="ordered")) for m in messages
+    ))
+    history = await server.session_store.history("ordered")
+    types = [turn.type for turn in history]
+    if types != ["user", "ai"] * submits:
+        raise SystemExit(f"interleaved history: {types}")
+    print(f"{submits} distinct concurrent submits: {len(history)} entries, exchanges never interleave")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submits", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.submits, args.latency))
+
+
+if __name__ == "__main__":
+    main()
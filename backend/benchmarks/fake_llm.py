@@ -0,0 +1,265 @@
+"""Local stand-in for the Cerebras client used by the benchmarks."""
+import ast
+import asyncio
+import json
+import random
+import time
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from response_parser import split_response
+from shelf_schema import ENTITY_FIELDS, REPLY_KEY, STATE_LABELS
+
+CANNED_REPLY = """Great! A garage shelf is a popular choice. Could you tell me how wide, deep and tall it should be, and how many shelf levels you need?
+
+```json
+{
+  "extracted_entities": {
+    "width": null,
+    "length": null,
+    "post_height": null,
+    "number_of_shelves": null,
+    "shelf_style": null,
+    "solid_bottom_shelf": null,
+    "color_and_finish": null,
+    "type_of_posts": null
+  },
+  "has_sufficient_entities": false,
+  "next_questions": ["What width do you need?", "How deep should it be?"]
+}
+```"""
+
+
+@lru_cache(maxsize=1024)
+def to_structured(reply: str) -> str:
+    """Recorded free-text reply re-encoded the way JSON-schema mode returns it"""
+    clean, data, _ = split_response(reply)
+    data = data or {}
+    return json.dumps({
+        REPLY_KEY: clean,
+        "extracted_entities": {name: (data.get("extracted_entities") or {}).get(name) for name in ENTITY_FIELDS},
+        "has_sufficient_entities": data.get("has_sufficient_entities", False),
+        "next_questions": data.get("next_questions", []),
+    })
+
+
+def reply_text(reply: str, kwargs: Dict[str, Any]) -> str:
+    """Honour response_format like the real provider would"""
+    return to_structured(reply) if "response_format" in kwargs else reply
+
+
+def make_chunk(content: str) -> Any:
+    """Build an object shaped like a streamed completion chunk"""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+def make_completion(content: str) -> Any:
+    """Build an object shaped like a Cerebras chat completion"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=0, completion_tokens=len(content.split())),
+    )
+
+
+class _FakeCompletions:
+    def __init__(self, owner: "FakeAsyncLLM"):
+        self._owner = owner
+
+    async def create(self, messages: List[Dict[str, str]], stream: bool = False, **kwargs) -> Any:
+        self._owner.calls += 1
+        reply = reply_text(self._owner.reply, kwargs)
+        if stream:
+            return self._stream(reply)
+        await asyncio.sleep(self._owner.latency)
+        return make_completion(reply)
+
+    async def _stream(self, reply: str):
+        # Spread the total latency across the tokens, first token after one step
+        tokens = reply.split(" ")
+        delay = self._owner.latency / len(tokens)
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(delay)
+            yield make_chunk(token if i == 0 else " " + token)
+
+
+class _FakeSyncCompletions:
+    def __init__(self, owner: "FakeSyncLLM"):
+        self._owner = owner
+
+    def create(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        self._owner.calls += 1
+        time.sleep(self._owner.latency)
+        return make_completion(reply_text(self._owner.reply, kwargs))
+
+
+class FakeAsyncLLM:
+    """Async fake client with a fixed per-call latency"""
+
+    def __init__(self, latency: float = 0.5, reply: str = CANNED_REPLY):
+        self.latency = latency
+        self.reply = reply
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+
+class FakeSyncLLM:
+    """Blocking fake client, exercises the thread-pool offload path"""
+
+    def __init__(self, latency: float = 0.5, reply: str = CANNED_REPLY):
+        self.latency = latency
+        self.reply = reply
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_FakeSyncCompletions(self))
+
+
+class ReplayLLM(FakeAsyncLLM):
+    """Answers each user message with its recorded assistant reply"""
+
+    def __init__(self, replies: Dict[str, str], latency: float = 0.0):
+        super().__init__(latency=latency)
+        self.replies = replies
+        self.prompts: List[List[Dict[str, str]]] = []
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(self))
+
+
+class _ReplayCompletions:
+    def __init__(self, owner: ReplayLLM):
+        self._owner = owner
+
+    async def create(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        self._owner.calls += 1
+        self._owner.prompts.append(messages)
+        await asyncio.sleep(self._owner.latency)
+        return make_completion(reply_text(self._owner.replies[messages[-1]["content"]], kwargs))
+
+
+def parse_state_block(text: str) -> Dict[str, Any]:
+    """Entities listed in a "current configuration" context block"""
+    fields = {f"- {label}: ": name for name, label in STATE_LABELS.items()}
+    entities = {}
+    for line in text.splitlines():
+        prefix = next((prefix for prefix in fields if line.startswith(prefix)), None)
+        if prefix is None:
+            continue
+        value = line[len(prefix):]
+        try:
+            entities[fields[prefix]] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            entities[fields[prefix]] = value
+    return entities
+
+
+class ContextLLM(FakeAsyncLLM):
+    """Fake model that only knows what its prompt tells it.
+
+    Each recorded user message of ``conversation`` introduces the entities
+    its expected state adds or changes. A reply reports the configuration
+    rebuilt from the prompt alone (the "current configuration" block, then
+    the user messages still in the window), with the recorded prose. Turns
+    whose prompt no longer carries the whole agreed configuration are
+    collected in ``mismatches``.
+    """
+
+    def __init__(self, conversation: Dict[str, Any], latency: float = 0.0):
+        super().__init__(latency=latency)
+        self.introduced: Dict[str, Dict[str, Any]] = {}
+        self.expected: Dict[str, Dict[str, Any]] = {}
+        self.recorded: Dict[str, str] = {}
+        previous: Dict[str, Any] = {}
+        for turn in conversation["turns"]:
+            expected = turn["expected_entities"]
+            self.introduced[turn["user"]] = {k: v for k, v in expected.items() if previous.get(k) != v}
+            self.expected[turn["user"]] = expected
+            self.recorded[turn["user"]] = turn["assistant"]
+            previous = expected
+        self.mismatches: List[tuple] = []
+        self.chat = SimpleNamespace(completions=_ContextCompletions(self))
+
+    def known_entities(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        known: Dict[str, Any] = {}
+        for message in messages[1:]:
+            if message["role"] == "system":
+                known.update(parse_state_block(message["content"]))
+            elif message["role"] == "user":
+                known.update(self.introduced.get(message["content"], {}))
+        return known
+
+    def reply_for(self, messages: List[Dict[str, str]]) -> str:
+        user_message = messages[-1]["content"]
+        known = self.known_entities(messages)
+        if known != self.expected[user_message]:
+            self.mismatches.append((user_message, known, self.expected[user_message]))
+        clean, data, _ = split_response(self.recorded[user_message])
+        data = {**(data or {}), "extracted_entities": {name: known.get(name) for name in ENTITY_FIELDS}}
+        return f"{clean}\n\n```json\n{json.dumps(data, indent=2)}\n```"
+
+
+class _ContextCompletions:
+    def __init__(self, owner: ContextLLM):
+        self._owner = owner
+
+    async def create(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        self._owner.calls += 1
+        await asyncio.sleep(self._owner.latency)
+        return make_completion(reply_text(self._owner.reply_for(messages), kwargs))
+
+
+class SimulatedLLM:
+    """Fake provider for load tests: sampled latency, a token rate and realistic replies.
+
+    Time to first token is drawn from ``latency_dist`` ("fixed", "uniform"
+    or "lognormal") around ``latency`` seconds; the rest of the reply is
+    generated at ``tokens_per_second`` (whitespace-separated words stand in
+    for tokens). Replies are looked up by the last user message, falling
+    back to CANNED_REPLY. Seeded, so runs are reproducible.
+    """
+
+    def __init__(self, replies: Dict[str, str], latency: float = 0.3, latency_dist: str = "lognormal",
+                 sigma: float = 0.5, tokens_per_second: float = 1000.0, seed: int = 0):
+        if latency_dist not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {latency_dist}")
+        self.replies = replies
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.sigma = sigma
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self.chat = SimpleNamespace(completions=_SimulatedCompletions(self))
+
+    def first_token_delay(self) -> float:
+        if self.latency_dist == "fixed":
+            return self.latency
+        if self.latency_dist == "uniform":
+            return self._rng.uniform(0, 2 * self.latency)
+        # Median-preserving lognormal: a long right tail like real providers
+        return self.latency * self._rng.lognormvariate(0, self.sigma)
+
+    def reply_for(self, messages: List[Dict[str, str]]) -> str:
+        return self.replies.get(messages[-1]["content"], CANNED_REPLY)
+
+
+class _SimulatedCompletions:
+    def __init__(self, owner: SimulatedLLM):
+        self._owner = owner
+
+    async def create(self, messages: List[Dict[str, str]], stream: bool = False, **kwargs) -> Any:
+        owner = self._owner
+        owner.calls += 1
+        reply = reply_text(owner.reply_for(messages), kwargs)
+        delay = owner.first_token_delay()
+        if stream:
+            return self._stream(reply, delay)
+        await asyncio.sleep(delay + len(reply.split()) / owner.tokens_per_second)
+        completion = make_completion(reply)
+        completion.usage.prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        return completion
+
+    async def _stream(self, reply: str, delay: float):
+        await asyncio.sleep(delay)
+        step = 1 / self._owner.tokens_per_second
+        for i, token in enumerate(reply.split(" ")):
+            if i:
+                await asyncio.sleep(step)
+            yield make_chunk(token if i == 0 else " " + token)
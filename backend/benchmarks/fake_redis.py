@@ -0,0 +1,102 @@
+"""In-memory stand-in for the subset of redis.asyncio used by the shared stores.
+
+Several store instances built on one FakeRedis behave like separate
+workers talking to the same Redis server.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self._redis = redis
+        self._commands: List[tuple] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._commands.clear()
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> List[Any]:
+        # Nothing else runs between queued commands, like MULTI/EXEC
+        commands, self._commands = self._commands, []
+        return [getattr(self._redis, "_" + name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def lock(self, name: str, timeout: Optional[float] = None) -> asyncio.Lock:
+        return self._locks.setdefault(name, asyncio.Lock())
+
+    async def get(self, key: str) -> Any:
+        return self._get(key)
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None) -> None:
+        self._set(key, value, ex)
+
+    async def hgetall(self, key: str) -> Dict[str, Any]:
+        return self._hgetall(key)
+
+    async def lrange(self, key: str, start: int, end: int) -> List[Any]:
+        return self._lrange(key, start, end)
+
+    async def delete(self, *keys: str) -> int:
+        return self._delete(*keys)
+
+    async def aclose(self) -> None:
+        pass
+
+    def _get(self, key: str) -> Any:
+        return self.data.get(key)
+
+    def _set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        self.data[key] = value
+        return True
+
+    def _hgetall(self, key: str) -> Dict[str, Any]:
+        return dict(self.data.get(key, {}))
+
+    def _hset(self, key: str, mapping: Dict[str, Any]) -> int:
+        self.data.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def _hget(self, key: str, field: str) -> Any:
+        return self.data.get(key, {}).get(field)
+
+    def _hsetnx(self, key: str, field: str, value: Any) -> bool:
+        fields = self.data.setdefault(key, {})
+        if field in fields:
+            return False
+        fields[field] = value
+        return True
+
+    def _llen(self, key: str) -> int:
+        return len(self.data.get(key, []))
+
+    def _rpush(self, key: str, *values: Any) -> int:
+        items = self.data.setdefault(key, [])
+        items.extend(values)
+        return len(items)
+
+    def _lrange(self, key: str, start: int, end: int) -> List[Any]:
+        items = self.data.get(key, [])
+        return list(items[start:] if end == -1 else items[start:end + 1])
+
+    def _expire(self, key: str, seconds: int) -> bool:
+        return key in self.data
+
+    def _delete(self, *keys: str) -> int:
+        return sum(self.data.pop(key, None) is not None for key in keys)
@@ -0,0 +1,69 @@
+"""Precision/recall and latency of the local fast-path extractor.
+
+Scores extract_spec per field against a labeled message corpus, reports
+how often the fast path would answer (and whether it should), and times
+fast_path_turn per message.
+
+Run from the backend directory:
+
+    python -m benchmarks.fast_path_accuracy
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+from fast_path import extract_spec, fast_path_turn
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "spec_messages.json")
+
+
+def score(corpus):
+    true_pos, false_pos, false_neg = Counter(), Counter(), Counter()
+    for item in corpus:
+        found = extract_spec(item["message"]).entities
+        expected = item["expected"]
+        for field, value in found.items():
+            if expected.get(field) == value:
+                true_pos[field] += 1
+            else:
+                false_pos[field] += 1
+        for field, value in expected.items():
+            if found.get(field) != value:
+                false_neg[field] += 1
+    return true_pos, false_pos, false_neg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(CORPUS) as f:
+        corpus = json.load(f)
+
+    true_pos, false_pos, false_neg = score(corpus)
+    print(f"{'field':24s} {'precision':>9s} {'recall':>7s}")
+    for field in sorted(set(true_pos) | set(false_pos) | set(false_neg)):
+        tp, fp, fn = true_pos[field], false_pos[field], false_neg[field]
+        print(f"{field:24s} {tp / (tp + fp) if tp + fp else 1:9.3f} {tp / (tp + fn) if tp + fn else 1:7.3f}")
+    tp, fp, fn = sum(true_pos.values()), sum(false_pos.values()), sum(false_neg.values())
+    print(f"{'overall':24s} {tp / (tp + fp):9.3f} {tp / (tp + fn):7.3f}")
+
+    taken = [fast_path_turn(item["message"], {}) is not None for item in corpus]
+    wrong = [item["message"] for item, hit in zip(corpus, taken) if hit != item["fast_path"]]
+    print(f"fast path taken for {sum(taken)}/{len(corpus)} messages, {len(wrong)} routing mistakes")
+    for message in wrong:
+        print(f"  wrong route: {message!r}")
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        for item in corpus:
+            fast_path_turn(item["message"], {})
+    per_message = (time.perf_counter() - started) / (args.iterations * len(corpus))
+    print(f"fast_path_turn: {per_message * 1e6:.1f} µs per message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Inject tail latency and transient errors into the fake provider.
+
+A fraction of upstream calls stall (--slow-rate, --slow-latency) and a
+fraction fail with a connection error (--error-rate). Reports p50/p99/p999
+latency and the client-visible error rate with the resilience layer off
+(one attempt, no deadline) and on (deadline, jittered retries, hedging).
+
+Run from the backend directory:
+
+    python -m benchmarks.fault_injection --requests 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from cerebras.cloud.sdk import APIConnectionError
+from fastapi import HTTPException
+
+import server
+from admission import AdmissionController
+from benchmarks.fake_llm import FakeAsyncLLM
+from resilience import CircuitBreaker, ResilientCaller
+from session_store import InMemorySessionStore
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+class FaultyLLM(FakeAsyncLLM):
+    """Fake provider with a slow tail and random connection errors"""
+
+    def __init__(self, latency: float, slow_rate: float, slow_latency: float, error_rate: float, seed: int):
+        super().__init__(latency=latency)
+        rng = random.Random(seed)
+        inner_create = self.chat.completions.create
+
+        async def create(*a, **kw):
+            roll = rng.random()
+            if roll < error_rate:
+                await asyncio.sleep(latency / 4)
+                raise APIConnectionError(request=httpx.Request("POST", "http://fake-llm"))
+            if roll < error_rate + slow_rate:
+                self.calls += 1
+                await asyncio.sleep(slow_latency)
+                return await inner_create(*a, **kw)
+            return await inner_create(*a, **kw)
+
+        self.chat.completions.create = create
+
+
+async def one_request(index: int, latencies, statuses):
+    started = time.perf_counter()
+    try:
+        await server.chat_with_ai(server.ChatMessage(message="I need a shelf", session_id=f"fault-{index}"))
+        latencies.append(time.perf_counter() - started)
+        statuses[200] = statuses.get(200, 0) + 1
+    except HTTPException as e:
+        statuses[e.status_code] = statuses.get(e.status_code, 0) + 1
+
+
+async def run(args, resilient: bool):
+    server.session_store = InMemorySessionStore()
+    server.completion_cache = None
+    server.llm_admission = AdmissionController(max_concurrency=10**6)
+    server.cerebras_client = FaultyLLM(args.latency, args.slow_rate, args.slow_latency, args.error_rate, args.seed)
+    if resilient:
+        server.llm_resilience = ResilientCaller(
+            deadline=args.deadline, max_attempts=3, base_delay=0.01, max_delay=0.1,
+            hedge=True, hedge_delay=args.latency * 3,
+            # Isolated faults shouldn't trip the breaker in this scenario
+            breaker=CircuitBreaker(failure_threshold=10**6), admission=server.llm_admission,
+        )
+    else:
+        server.llm_resilience = ResilientCaller(deadline=10**6, max_attempts=1, hedge=False,
+                                                breaker=CircuitBreaker(failure_threshold=10**6))
+
+    latencies, statuses = [], {}
+    for start in range(0, args.requests, args.concurrency):
+        batch = range(start, min(args.requests, start + args.concurrency))
+        await asyncio.gather(*(one_request(i, latencies, statuses) for i in batch))
+
+    errors = args.requests - statuses.get(200, 0)
+    label = "resilience on " if resilient else "resilience off"
+    print(f"{label}: statuses {dict(sorted(statuses.items()))}, error rate {errors / args.requests:.2%}, "
+          f"p50 {percentile(latencies, 0.5) * 1000:.0f} ms, p99 {percentile(latencies, 0.99) * 1000:.0f} ms, "
+          f"p999 {percentile(latencies, 0.999) * 1000:.0f} ms, upstream calls {server.cerebras_client.calls}")
+    print(f"  {server.llm_resilience.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.02)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.03)
+    parser.add_argument("--deadline", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    server.FAST_PATH_ENABLED = False
+    asyncio.run(run(args, resilient=False))
+    asyncio.run(run(args, resilient=True))
+
+
+if __name__ == "__main__":
+    main()
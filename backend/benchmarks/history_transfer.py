@@ -0,0 +1,71 @@
+"""Bytes transferred and server time for GET /api/chat/history on long sessions.
+
+Builds one session with --exchanges user/assistant exchanges, then fetches
+its history the old way (raw model output, uncompressed) and with the
+new options: gzip, clean content (the default), a 304 revalidation, and
+an incremental poll for just the newest exchange.
+
+Run from the backend directory:
+
+    python -m benchmarks.history_transfer --exchanges 200
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import server
+from benchmarks.fake_llm import CANNED_REPLY
+from response_parser import split_response
+from session_store import InMemorySessionStore
+
+CLEAN_REPLY = split_response(CANNED_REPLY)[0]
+
+
+async def measure(client: httpx.AsyncClient, url: str, headers, repeats: int):
+    """(status, wire bytes, mean ms) for one kind of request"""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        response = await client.get(url, headers=headers)
+    elapsed = (time.perf_counter() - started) / repeats
+    return response.status_code, response.num_bytes_downloaded, elapsed * 1000, response
+
+
+async def run(args):
+    server.session_store = InMemorySessionStore()
+    for i in range(args.exchanges):
+        await server.session_store.append_turn("long", f"Message {i}: make it {40 + i % 20} inches wide",
+                                               CANNED_REPLY, CLEAN_REPLY, {"width": 40 + i % 20})
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        identity = {"Accept-Encoding": "identity"}
+        gzip = {"Accept-Encoding": "gzip"}
+        _, _, _, first = await measure(client, "/api/chat/history/long", gzip, 1)
+        etag, length = first.headers["etag"], int(first.headers["x-history-length"])
+
+        cases = {
+            "raw, uncompressed": ("/api/chat/history/long?clean=false", identity),
+            "raw, gzip": ("/api/chat/history/long?clean=false", gzip),
+            "clean, gzip": ("/api/chat/history/long", gzip),
+            "revalidate (304)": ("/api/chat/history/long", {**gzip, "If-None-Match": etag}),
+            "newest exchange only": (f"/api/chat/history/long?after={length - 2}", gzip),
+        }
+        print(f"{args.exchanges} exchanges ({length} turns)")
+        print(f"{'request':22s} {'status':>6s} {'bytes':>9s} {'ms':>8s}")
+        for name, (url, headers) in cases.items():
+            status, size, ms, _ = await measure(client, url, headers, args.repeats)
+            print(f"{name:22s} {status:6d} {size:9d} {ms:8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--exchanges", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
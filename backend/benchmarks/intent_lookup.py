@@ -0,0 +1,133 @@
+"""Accuracy, lookup latency, build time and memory of the opening-intent index.
+
+First scores the shipped corpus against labelled opening messages
+(paraphrases that should hit, and off-topic openers that must fall
+through to the model). Then builds an index over --intents synthetic
+intents and times lookups of perturbed examples (typos, filler, dropped
+words).
+
+Run from the backend directory:
+
+    python -m benchmarks.intent_lookup --intents 10000
+"""
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+
+from benchmarks.load_test import percentile
+from intent_index import IntentIndex, load_intent_index, opening_turn
+
+LABELLED = os.path.join(os.path.dirname(__file__), "data", "opening_messages.json")
+
+PLACES = ("garage", "pantry", "office", "warehouse", "kitchen", "closet", "basement", "store", "shop", "shed",
+          "classroom", "lab", "clinic", "salon", "bakery", "barn", "attic", "laundry", "nursery", "studio")
+TEMPLATES = ("{a} {b} shelving for the {place}", "i need a {a} {b} shelf in my {place}",
+             "{place} {a} storage with {b}", "looking for {b} {a} racks for a {place}")
+FILLER = ("please", "thanks", "hi", "for me", "asap")
+
+
+def syllable_word(rng: random.Random) -> str:
+    return "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(rng.randint(2, 4)))
+
+
+def synthetic_corpus(count: int, seed: int):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        words = {"a": syllable_word(rng), "b": syllable_word(rng), "place": rng.choice(PLACES)}
+        corpus.append({"intent": f"intent-{i}", "reply": f"Stored reply {i}",
+                       "examples": [template.format(**words) for template in TEMPLATES]})
+    return corpus
+
+
+def perturb(text: str, rng: random.Random) -> str:
+    words = text.split()
+    kind = rng.choice(("typo", "filler", "drop"))
+    if kind == "typo":
+        index = rng.randrange(len(words))
+        word = words[index]
+        if len(word) > 3:
+            cut = rng.randrange(1, len(word) - 1)
+            words[index] = word[:cut] + word[cut + 1:]
+    elif kind == "filler":
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FILLER))
+    elif len(words) > 3:
+        words.pop(rng.randrange(len(words)))
+    return " ".join(words)
+
+
+def timed_lookups(index: IntentIndex, queries, repeat: int = 1):
+    latencies, answers = [], []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            answers.append(index.lookup(query))
+            latencies.append(time.perf_counter() - started)
+    return latencies, answers
+
+
+def score_shipped_corpus() -> None:
+    index = load_intent_index()
+    with open(LABELLED) as f:
+        labelled = json.load(f)
+    hits = wrong = false_hits = 0
+    positives = [item for item in labelled if item["intent"]]
+    for item in labelled:
+        intent, similarity, _ = index.search(item["message"])
+        answered = opening_turn(index, item["message"]) is not None
+        if item["intent"] is None:
+            false_hits += answered
+            if answered:
+                print(f"  false hit: {item['message']!r} -> {intent.name} ({similarity:.2f})")
+        elif answered:
+            hits += 1
+            if intent.name != item["intent"]:
+                wrong += 1
+                print(f"  wrong intent: {item['message']!r} -> {intent.name}, expected {item['intent']}")
+    negatives = len(labelled) - len(positives)
+    print(f"shipped corpus: {index.stats()['intents']} intents, {len(index)} examples, built in "
+          f"{index.build_seconds * 1000:.2f} ms")
+    print(f"  answered {hits}/{len(positives)} labelled openers ({hits / len(positives):.0%}), {wrong} with the "
+          f"wrong intent; {false_hits}/{negatives} off-topic messages answered")
+
+    messages = [item["message"] for item in labelled]
+    latencies, _ = timed_lookups(index, messages, repeat=200)
+    print(f"  lookup p50 {percentile(latencies, 0.5) * 1e6:.1f} us, p99 {percentile(latencies, 0.99) * 1e6:.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--intents", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    score_shipped_corpus()
+
+    corpus = synthetic_corpus(args.intents, args.seed)
+    started = time.perf_counter()
+    index = IntentIndex(corpus)
+    build = time.perf_counter() - started
+    # Traced separately: tracemalloc slows the build down several times
+    del index
+    tracemalloc.start()
+    index = IntentIndex(corpus)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"\nsynthetic corpus: {args.intents} intents, {len(index)} examples")
+    print(f"  build {build:.2f} s, memory {retained / 1e6:.1f} MB retained ({peak / 1e6:.1f} MB peak)")
+
+    rng = random.Random(args.seed + 1)
+    picks = [rng.randrange(args.intents) for _ in range(args.queries)]
+    queries = [perturb(rng.choice(corpus[i]["examples"]), rng) for i in picks]
+    latencies, answers = timed_lookups(index, queries)
+    wrong = sum(answer is not None and answer.name != corpus[i]["intent"] for answer, i in zip(answers, picks))
+    print(f"  {args.queries} perturbed lookups: hit rate {index.stats()['hit_rate']:.1%}, {wrong} wrong intents, "
+          f"p50 {percentile(latencies, 0.5) * 1e6:.0f} us, p99 {percentile(latencies, 0.99) * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Load-test the chat API against a simulated LLM and write diffable JSON results.
+
+Virtual users replay the recorded multi-turn conversations in
+data/conversations.json, each under a fresh session id, with at most
+--concurrency users active at once. The upstream client is replaced by
+SimulatedLLM (seeded latency distribution, token rate, recorded replies),
+so no provider tokens are spent.
+
+Transports:
+  direct   call the endpoint coroutines in-process (no HTTP)
+  asgi     HTTP through httpx's in-process ASGI transport
+  uvicorn  a real uvicorn server on a local port, in this process
+
+Reports requests/s, p50/p95/p99 turn latency (and time to first byte with
+--stream), RSS growth and event-loop lag.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test --transport uvicorn --conversations 200 --concurrency 20 \\
+        --output load_results.json
+    python -m benchmarks.load_test --compare load_results.json --tolerance 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+import server
+from benchmarks.fake_llm import SimulatedLLM
+from benchmarks.session_memory import rss_bytes
+from session_store import InMemorySessionStore
+
+CONVERSATIONS_PATH = os.path.join(os.path.dirname(__file__), "data", "conversations.json")
+
+# Metrics checked by --compare: (higher is better, absolute change ignored as noise)
+COMPARED_METRICS = {
+    "requests_per_second": (True, 0.0),
+    "latency_ms.p50": (False, 1.0),
+    "latency_ms.p95": (False, 1.0),
+    "latency_ms.p99": (False, 1.0),
+    "loop_lag_ms.p99": (False, 1.0),
+    "rss_growth_mib": (False, 1.0),
+}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def summarize_ms(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 3),
+        "p95": round(percentile(values, 0.95) * 1000, 3),
+        "p99": round(percentile(values, 0.99) * 1000, 3),
+        "max": round(max(values, default=0.0) * 1000, 3),
+    }
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes a sleeping task"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class DirectDriver:
+    """Calls the endpoint coroutines without HTTP"""
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def turn(self, session_id: str, message: str, stream: bool) -> tuple[int, float]:
+        started = time.perf_counter()
+        if not stream:
+            try:
+                await server.chat_with_ai(server.ChatMessage(message=message, session_id=session_id))
+            except server.HTTPException as e:
+                return e.status_code, 0.0
+            return 200, 0.0
+        first_byte = 0.0
+        status = 200
+        async for event in server.stream_chat_events(session_id, message):
+            if not first_byte:
+                first_byte = time.perf_counter() - started
+            if event.startswith("event: error"):
+                status = json.loads(event.split("data: ", 1)[1])["status"]
+        return status, first_byte
+
+
+class HTTPDriver:
+    """Posts to the API over httpx, in-process (ASGI) or to a local uvicorn server"""
+
+    def __init__(self, transport: str, concurrency: int):
+        self.transport = transport
+        self.concurrency = concurrency
+        self.client: Optional[httpx.AsyncClient] = None
+        self._server = None
+        self._server_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self.transport == "asgi":
+            self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app),
+                                            base_url="http://loadtest", timeout=None)
+            return
+
+        import uvicorn
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        config = uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning",
+                                lifespan="off", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._server_task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self.client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=None)
+
+    async def stop(self) -> None:
+        await self.client.aclose()
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._server_task
+
+    async def turn(self, session_id: str, message: str, stream: bool) -> tuple[int, float]:
+        payload = {"message": message, "session_id": session_id}
+        if not stream:
+            response = await self.client.post("/api/chat", json=payload)
+            return response.status_code, 0.0
+        started = time.perf_counter()
+        first_byte = 0.0
+        status = 200
+        event = None
+        async with self.client.stream("POST", "/api/chat/stream", json=payload) as response:
+            async for line in response.aiter_lines():
+                if not first_byte:
+                    first_byte = time.perf_counter() - started
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif event == "error" and line.startswith("data: "):
+                    status = json.loads(line[len("data: "):])["status"]
+        return status, first_byte
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_conversations() -> List[Dict[str, Any]]:
+    with open(CONVERSATIONS_PATH) as f:
+        return json.load(f)
+
+
+async def run(args) -> Dict[str, Any]:
+    conversations = load_conversations()
+    replies = {turn["user"]: turn["assistant"] for conv in conversations for turn in conv["turns"]}
+
+    server.session_store = InMemorySessionStore()
+    server.FAST_PATH_ENABLED = not args.no_fast_path
+    if not args.cache:
+        # Every virtual user replays the same script, so a cache would answer almost everything
+        server.completion_cache = None
+    server.cerebras_client = SimulatedLLM(replies, latency=args.latency, latency_dist=args.latency_dist,
+                                          sigma=args.sigma, tokens_per_second=args.token_rate, seed=args.seed)
+
+    driver = DirectDriver() if args.transport == "direct" else HTTPDriver(args.transport, args.concurrency)
+    await driver.start()
+
+    latencies: List[float] = []
+    first_bytes: List[float] = []
+    statuses: Dict[int, int] = {}
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def virtual_user(index: int) -> None:
+        conversation = conversations[index % len(conversations)]
+        session_id = f"load-{index}"
+        async with slots:
+            for turn in conversation["turns"]:
+                started = time.perf_counter()
+                status, first_byte = await driver.turn(session_id, turn["user"], args.stream)
+                elapsed = time.perf_counter() - started
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+                    if args.stream:
+                        first_bytes.append(first_byte)
+                if args.think_time:
+                    await asyncio.sleep(args.think_time)
+
+    # Warm up imports, pools and allocator before the baseline RSS sample
+    await asyncio.gather(*(virtual_user(-1 - i) for i in range(min(args.concurrency, len(conversations)))))
+    latencies.clear()
+    first_bytes.clear()
+    statuses.clear()
+    rss_before = rss_bytes()
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(args.conversations)))
+    wall = time.perf_counter() - started
+    await monitor.stop()
+    rss_after = rss_bytes()
+    await driver.stop()
+
+    requests = sum(statuses.values())
+    results = {
+        "requests": requests,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(requests / wall, 2),
+        "latency_ms": summarize_ms(latencies),
+        "loop_lag_ms": summarize_ms(monitor.samples),
+        "rss_growth_mib": round((rss_after - rss_before) / 2**20, 2),
+        "upstream_calls": server.cerebras_client.calls,
+    }
+    if args.stream:
+        results["first_byte_ms"] = summarize_ms(first_bytes)
+    return results
+
+
+def lookup(results: Dict[str, Any], dotted: str) -> Optional[float]:
+    value: Any = results
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print the change of each compared metric; return those worse than the tolerance"""
+    regressions = []
+    for name, (higher_is_better, noise) in COMPARED_METRICS.items():
+        current, previous = lookup(results, name), lookup(baseline, name)
+        if current is None or previous is None:
+            continue
+        change = (current - previous) / previous if previous else 0.0
+        print(f"  {name:22s} {previous:10.2f} -> {current:10.2f} ({change:+.1%})")
+        worse = -change if higher_is_better else change
+        if worse > tolerance and abs(current - previous) > noise:
+            regressions.append(f"{name}: {previous} -> {current}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transport", choices=("direct", "asgi", "uvicorn"), default="direct")
+    parser.add_argument("--conversations", type=int, default=200, help="virtual users, one conversation each")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users active at once")
+    parser.add_argument("--stream", action="store_true", help="use /api/chat/stream")
+    parser.add_argument("--latency", type=float, default=0.2, help="median time to first token (s)")
+    parser.add_argument("--latency-dist", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal shape")
+    parser.add_argument("--token-rate", type=float, default=2000.0, help="simulated tokens/s per reply")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between a user's turns (s)")
+    parser.add_argument("--cache", action="store_true", help="keep the completion cache enabled")
+    parser.add_argument("--no-fast-path", action="store_true", help="send every turn to the (fake) model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="fail if worse than these saved results")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"compared with {baseline.get('revision')}:")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            raise SystemExit("load-test regressions:\n  " + "\n  ".join(regressions))
+        print(f"no regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Measure the per-request cost of the Prometheus instrumentation.
+
+Scrapes /metrics once after a few fake turns to show the output, then
+times exactly what one model-backed /api/chat turn records (clock reads,
+four histogram observations, token and parse-path counters) against an
+empty loop.
+
+Run from the backend directory:
+
+    python -m benchmarks.metrics_overhead --iterations 200000
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+import metrics
+import server
+from benchmarks.fake_llm import FakeAsyncLLM
+from session_store import InMemorySessionStore
+
+USAGE = SimpleNamespace(prompt_tokens=850, completion_tokens=120)
+
+
+def instrumented_turn() -> None:
+    started = time.perf_counter()
+    metrics.PROMPT_SECONDS.observe(metrics.since(started))
+    llm_started = time.perf_counter()
+    metrics.LLM_SECONDS.observe(metrics.since(llm_started))
+    metrics.record_usage(USAGE)
+    parse_started = time.perf_counter()
+    metrics.PARSE_SECONDS.observe(metrics.since(parse_started))
+    metrics.record_parse_path("fenced")
+    metrics.TOTAL_SECONDS.observe(metrics.since(started))
+
+
+def empty_turn() -> None:
+    pass
+
+
+def per_call(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations
+
+
+async def scrape_after_turns(turns: int) -> str:
+    server.session_store = InMemorySessionStore()
+    server.cerebras_client = FakeAsyncLLM(latency=0.01)
+    for i in range(turns):
+        await server.chat_with_ai(server.ChatMessage(message=f"I need a shelf for room {i}", session_id=f"m-{i}"))
+    response = await server.get_metrics()
+    return response.body.decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    body = asyncio.run(scrape_after_turns(args.turns))
+    print("\n".join(line for line in body.splitlines()
+                    if line.startswith("shelf_") and "_bucket" not in line))
+
+    baseline = per_call(empty_turn, args.iterations)
+    instrumented = per_call(instrumented_turn, args.iterations)
+    print(f"\ninstrumentation per request: {(instrumented - baseline) * 1e6:.2f} µs "
+          f"({args.iterations} iterations)")
+
+
+if __name__ == "__main__":
+    main()
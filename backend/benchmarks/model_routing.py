@@ -0,0 +1,142 @@
+"""Offline replay of the recorded conversations with and without model routing.
+
+Every turn goes through server.run_chat_turn against a fake provider
+that answers with the recorded reply. Latency is simulated, not slept:
+each model has a lognormal time to first token and a token rate. The
+small model corrupts --small-error-rate of its replies (broken JSON, a
+wrong value, or a spurious extra field) so the confidence check has
+something to catch. Reports mean and p95 turn latency, per-turn
+extraction accuracy against the labels, route mix and escalations.
+
+Run from the backend directory:
+
+    python -m benchmarks.model_routing --repeats 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import metrics
+import model_router
+import server
+from admission import AdmissionController
+from benchmarks.fake_llm import make_completion, reply_text
+from benchmarks.load_test import percentile
+from context_builder import estimate_tokens
+from session_store import InMemorySessionStore
+from shelf_schema import SHELF_FIELDS
+
+DATA = os.path.join(os.path.dirname(__file__), "data", "conversations.json")
+
+
+class RoutedReplayLLM:
+    """Recorded replies for either model; simulated latency per call is appended to ``calls``"""
+
+    def __init__(self, replies: Dict[str, str], profiles: Dict[str, tuple], small_error_rate: float, seed: int):
+        self.replies = replies
+        self.profiles = profiles
+        self.small_error_rate = small_error_rate
+        self.calls: List[tuple] = []
+        self._rng = random.Random(seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, messages: List[Dict[str, str]], model: str, stream: bool = False, **kwargs) -> Any:
+        reply = reply_text(self.replies[messages[-1]["content"]], kwargs)
+        if model == model_router.SMALL_MODEL and self._rng.random() < self.small_error_rate:
+            reply = self.corrupt(reply)
+        first_token, tokens_per_second = self.profiles[model]
+        seconds = first_token * self._rng.lognormvariate(0, 0.3) + estimate_tokens(reply) / tokens_per_second
+        self.calls.append((model, seconds))
+        return make_completion(reply)
+
+    def corrupt(self, reply: str) -> str:
+        data = json.loads(reply)
+        entities = data["extracted_entities"]
+        kind = self._rng.choice(("broken_json", "wrong_value", "spurious_field"))
+        if kind == "broken_json":
+            return reply[:len(reply) // 2]
+        if kind == "wrong_value":
+            known = [name for name, value in entities.items() if isinstance(value, (int, float))
+                     and not isinstance(value, bool)]
+            if known:
+                entities[self._rng.choice(known)] += 6
+                return json.dumps(data)
+        unset = [field for field in SHELF_FIELDS if entities[field.name] is None and field.options]
+        if unset:
+            field = self._rng.choice(unset)
+            entities[field.name] = field.options[0]
+        return json.dumps(data)
+
+
+def reset_route_metrics() -> None:
+    for route in metrics.ROUTE_NAMES:
+        metrics.route_turns[route] = 0
+        metrics.route_tokens[route] = {"prompt": 0, "completion": 0}
+        metrics.ROUTE_SECONDS[route] = metrics.StageHistogram()
+    metrics.route_escalations.clear()
+
+
+async def replay(conversations, args, routed: bool):
+    model_router.MODEL_ROUTING_ENABLED = routed
+    reset_route_metrics()
+    profiles = {
+        model_router.LARGE_MODEL: (args.large_ttft, args.large_tps),
+        model_router.SMALL_MODEL: (args.small_ttft, args.small_tps),
+    }
+    replies = {turn["user"]: turn["assistant"] for conversation in conversations for turn in conversation["turns"]}
+    latencies, correct, total = [], 0, 0
+    for seed in range(args.repeats):
+        server.session_store = InMemorySessionStore()
+        llm = server.cerebras_client = RoutedReplayLLM(replies, profiles, args.small_error_rate, seed)
+        for index, conversation in enumerate(conversations):
+            session_id = f"replay-{seed}-{index}"
+            for turn in conversation["turns"]:
+                before = len(llm.calls)
+                await server.run_chat_turn(session_id, turn["user"])
+                latencies.append(sum(seconds for _, seconds in llm.calls[before:]))
+                record = await server.session_store.load(session_id)
+                state = {key: value for key, value in record.entities.to_dict().items() if value is not None}
+                correct += state == turn["expected_entities"]
+                total += 1
+    return latencies, correct / total
+
+
+async def run(args):
+    with open(DATA) as f:
+        conversations = json.load(f)
+    server.completion_cache = None
+    server.FAST_PATH_ENABLED = False
+    server.llm_admission = AdmissionController(max_concurrency=10**6)
+
+    results = {}
+    for name, routed in (("large only", False), ("routed", True)):
+        latencies, accuracy = await replay(conversations, args, routed)
+        results[name] = sum(latencies) / len(latencies)
+        stats = metrics.route_stats()
+        print(f"{name:10s}: mean {results[name] * 1000:6.0f} ms, p95 {percentile(latencies, 0.95) * 1000:6.0f} ms, "
+              f"accuracy {accuracy:.1%} over {len(latencies)} turns")
+        print(f"{'':12s}turns by route {stats['turns']}, escalation rate {stats['escalation_rate']:.1%} "
+              f"{stats['escalations']}, completion tokens "
+              f"{ {route: tokens['completion'] for route, tokens in stats['tokens'].items()} }")
+    saving = 1 - results["routed"] / results["large only"]
+    print(f"mean latency saving from routing: {saving:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--small-error-rate", type=float, default=0.1)
+    parser.add_argument("--large-ttft", type=float, default=0.35, help="seconds to first token, large model")
+    parser.add_argument("--large-tps", type=float, default=450, help="tokens per second, large model")
+    parser.add_argument("--small-ttft", type=float, default=0.12)
+    parser.add_argument("--small-tps", type=float, default=1800)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
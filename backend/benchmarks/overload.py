@@ -0,0 +1,96 @@
+"""Load test /api/chat at several times the upstream capacity.
+
+Offers an open-loop arrival rate of --overload x capacity (capacity =
+concurrency / fake latency) and reports accepted-request latency
+percentiles and rejections, with admission control on and off.
+
+Run from the backend directory:
+
+    python -m benchmarks.overload --overload 5 --duration 5
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import HTTPException
+
+import server
+from admission import AdmissionController
+from benchmarks.fake_llm import FakeAsyncLLM
+from session_store import InMemorySessionStore
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+async def one_request(index: int, latencies, statuses):
+    started = time.perf_counter()
+    try:
+        await server.chat_with_ai(server.ChatMessage(message="I need a shelf", session_id=f"load-{index}"))
+        latencies.append(time.perf_counter() - started)
+        statuses[200] = statuses.get(200, 0) + 1
+    except HTTPException as e:
+        statuses[e.status_code] = statuses.get(e.status_code, 0) + 1
+
+
+async def run(args, admission: bool):
+    server.session_store = InMemorySessionStore()
+    server.completion_cache = None
+    server.cerebras_client = LimitedLLM(args.latency, args.concurrency)
+    server.llm_admission = AdmissionController(
+        max_concurrency=args.concurrency if admission else 10**6,
+        max_queue=args.max_queue if admission else 10**6,
+        max_queue_time=args.max_queue_time if admission else 10**6,
+    )
+
+    capacity = args.concurrency / args.latency
+    interval = 1 / (capacity * args.overload)
+    latencies, statuses, tasks = [], {}, []
+    started = time.perf_counter()
+    index = 0
+    while time.perf_counter() - started < args.duration:
+        tasks.append(asyncio.create_task(one_request(index, latencies, statuses)))
+        index += 1
+        await asyncio.sleep(interval)
+    await asyncio.gather(*tasks)
+
+    label = "admission on " if admission else "admission off"
+    print(f"{label}: {index} requests, statuses {dict(sorted(statuses.items()))}, "
+          f"accepted p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms")
+
+
+class LimitedLLM(FakeAsyncLLM):
+    """Fake provider that serves at most `slots` completions at once; the rest queue"""
+
+    def __init__(self, latency: float, slots: int):
+        super().__init__(latency=latency)
+        self._slots = asyncio.Semaphore(slots)
+        inner_create = self.chat.completions.create
+
+        async def create(*a, **kw):
+            async with self._slots:
+                return await inner_create(*a, **kw)
+
+        self.chat.completions.create = create
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--overload", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--max-queue-time", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server.FAST_PATH_ENABLED = False
+    asyncio.run(run(args, admission=False))
+    asyncio.run(run(args, admission=True))
+
+
+if __name__ == "__main__":
+    main()
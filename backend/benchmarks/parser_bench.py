@@ -0,0 +1,112 @@
+"""Microbenchmark for the response parser, with a regression guard.
+
+Times response_parser.parse_response against the previous multi-regex
+implementation on realistic and adversarial replies (very long,
+malformed, multi-block, nested JSON).
+
+Run from the backend directory:
+
+    python -m benchmarks.parser_bench --save parser_results.json
+    python -m benchmarks.parser_bench --compare parser_results.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+from response_parser import parse_response
+
+CONVERSATIONS = os.path.join(os.path.dirname(__file__), "data", "conversations.json")
+
+
+def legacy_parse(response: str):
+    """The parse + clean passes server.py ran before the single-pass parser"""
+    json_match = re.search(r'```json\s*(\{.*?\})\s*```', response, re.DOTALL)
+    if not json_match:
+        json_match = re.search(r'(\{[^{}]*"extracted_entities"[^{}]*\})', response, re.DOTALL)
+    entities = {}
+    if json_match:
+        try:
+            entities = json.loads(json_match.group(1)).get("extracted_entities", {})
+        except json.JSONDecodeError:
+            json_match = None
+    if not json_match:
+        text_lower = response.lower()
+        for pattern in (r'(\d+)\s*(?:inch|inches|in|"|′)?\s*(?:wide|width)',
+                        r'(\d+)\s*(?:inch|inches|in|"|′)?\s*(?:long|length|deep|depth)',
+                        r'(\d+)\s*(?:inch|inches|in|"|′)?\s*(?:tall|high|height)',
+                        r'(\d+)\s*(?:shelf|shelves|level|levels|tier|tiers)'):
+            re.search(pattern, text_lower)
+    cleaned = re.sub(r'```json.*?```', '', response, flags=re.DOTALL)
+    cleaned = re.sub(r'\{[^{}]*"extracted_entities"[^{}]*\}', '', cleaned, flags=re.DOTALL)
+    return cleaned.strip(), entities
+
+
+def build_cases():
+    with open(CONVERSATIONS) as f:
+        replies = [turn["assistant"] for conv in json.load(f) for turn in conv["turns"]]
+    typical = replies[2]
+    prose, block = typical.split("```json")
+    nested = json.loads(block.strip("`\n"))
+    nested["extracted_entities"]["shelf_dividers"] = {"count": 2, "shelves": {"levels": [1, 2]}}
+
+    return {
+        "realistic": replies,
+        "bare_json": [prose + json.dumps(json.loads(block.strip("`\n")))],
+        "nested_json": [prose + "```json\n" + json.dumps(nested, indent=2) + "\n```"],
+        "multi_block": [prose + "```json\n{\"note\": 1}\n```\n" + typical + "\n" + typical],
+        "malformed": [prose + "```json\n{\"extracted_entities\": {\"width\": 48,, }\n```",
+                      prose + "{\"extracted_entities\": {\"width\": 48"],
+        "no_json": [prose * 3],
+        "very_long": [prose * 200 + "```json" + block],
+    }
+
+
+def time_parser(parser, responses, min_time: float) -> float:
+    """Microseconds per parse, repeated until min_time has elapsed"""
+    loops, elapsed = 0, 0.0
+    started = time.perf_counter()
+    while elapsed < min_time:
+        for response in responses:
+            parser(response)
+        loops += 1
+        elapsed = time.perf_counter() - started
+    return elapsed / (loops * len(responses)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per case")
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--compare", help="fail if slower than these saved results")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':12s} {'single-pass µs':>15s} {'legacy µs':>10s} {'speedup':>8s}")
+    for name, responses in build_cases().items():
+        current = time_parser(parse_response, responses, args.min_time)
+        legacy = time_parser(legacy_parse, responses, args.min_time)
+        results[name] = current
+        print(f"{name:12s} {current:15.2f} {legacy:10.2f} {legacy / current:7.1f}x")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = [
+            f"{name}: {results[name]:.2f} µs vs {value:.2f} µs"
+            for name, value in baseline.items()
+            if name in results and results[name] > value * (1 + args.tolerance)
+        ]
+        if regressions:
+            raise SystemExit("parser regressions:\n  " + "\n  ".join(regressions))
+        print(f"no regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
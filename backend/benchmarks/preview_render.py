@@ -0,0 +1,115 @@
+"""Render time of the shelf preview rasterizer and latency of its cache tiers.
+
+Renders a grid of configurations (sizes, shelf counts, styles, finishes,
+posts, dividers and enclosures) at each image size, then requests the
+same grid through PreviewCache: cold (render), warm (memory LRU) and
+from disk with a fresh cache over the same directory. Finally fires
+concurrent requests for one unseen configuration to show they share a
+single render.
+
+Run from the backend directory:
+
+    python -m benchmarks.preview_render --configs 120
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import tempfile
+import time
+
+from benchmarks.load_test import percentile
+from preview_cache import PREVIEW_SIZES, PreviewCache
+from preview_renderer import encode_png, render
+from shelf_schema import SHELF_FIELDS, canonical_config
+
+OPTIONS = {field.name: field.options for field in SHELF_FIELDS if field.options}
+
+
+def config_grid(count: int, seed: int):
+    """``count`` configurations sampled from the full grid of dimensions and options"""
+    dimensions = list(itertools.product((24, 36, 48, 60, 72), (14, 18, 24), (54, 72, 86), (3, 4, 5, 6)))
+    rng = random.Random(seed)
+    grid = []
+    for width, length, height, shelves in rng.sample(dimensions, min(count, len(dimensions))):
+        dividers = rng.choice((0, 0, 1, 2, 3))
+        grid.append(canonical_config({
+            "width": width, "length": length, "post_height": height, "number_of_shelves": shelves,
+            "shelf_style": rng.choice(OPTIONS["shelf_style"]),
+            "color_and_finish": rng.choice(OPTIONS["color_and_finish"]),
+            "type_of_posts": rng.choice(OPTIONS["type_of_posts"]),
+            "enclosure_type": rng.choice(OPTIONS["enclosure_type"]),
+            "solid_bottom_shelf": rng.random() < 0.3,
+            "shelf_dividers_count": dividers,
+            "shelf_dividers_shelves": rng.sample(range(1, shelves + 1), rng.randint(1, shelves)) if dividers else [],
+        }))
+    return grid
+
+
+def ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f} ms"
+
+
+def bench_render(grid) -> None:
+    for name, size in PREVIEW_SIZES.items():
+        render(grid[0], size)
+        render_times, encode_times, png_bytes = [], [], 0
+        for config in grid:
+            started = time.perf_counter()
+            pixels = render(config, size)
+            rendered = time.perf_counter()
+            png = encode_png(pixels)
+            render_times.append(rendered - started)
+            encode_times.append(time.perf_counter() - rendered)
+            png_bytes += len(png)
+        print(f"{name:6s} {size[0]}x{size[1]}: render p50 {ms(percentile(render_times, 0.5))}, "
+              f"p99 {ms(percentile(render_times, 0.99))}; PNG encode p50 {ms(percentile(encode_times, 0.5))}; "
+              f"mean PNG {png_bytes / len(grid) / 1024:.1f} KiB")
+
+
+async def timed_gets(cache: PreviewCache, grid, size: str):
+    latencies = []
+    for config in grid:
+        started = time.perf_counter()
+        await cache.get(config, size)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def bench_cache(grid, size: str, concurrency: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        cache = PreviewCache(directory=directory)
+        tiers = {"cold (render)": await timed_gets(cache, grid, size),
+                 "memory hit": await timed_gets(cache, grid, size)}
+        cache.close()
+        disk_cache = PreviewCache(directory=directory)
+        tiers["disk hit"] = await timed_gets(disk_cache, grid, size)
+        print(f"\ncache tiers, {len(grid)} configurations at {size}:")
+        for tier, latencies in tiers.items():
+            print(f"  {tier:14s} p50 {ms(percentile(latencies, 0.5))}, p99 {ms(percentile(latencies, 0.99))}")
+        print(f"  disk cache stats: {disk_cache.stats()}")
+
+        unseen = canonical_config({**grid[0], "width": grid[0]["width"] + 1})
+        started = time.perf_counter()
+        await asyncio.gather(*(disk_cache.get(unseen, size) for _ in range(concurrency)))
+        stats = disk_cache.stats()
+        print(f"  {concurrency} concurrent requests for one new configuration: {ms(time.perf_counter() - started)}, "
+              f"{stats['renders']} render, {stats['coalesced']} coalesced")
+        disk_cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", type=int, default=120)
+    parser.add_argument("--size", choices=PREVIEW_SIZES, default="medium", help="image size for the cache tiers")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    grid = config_grid(args.configs, args.seed)
+    bench_render(grid)
+    asyncio.run(bench_cache(grid, args.size, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cost of request profiling and the event-loop lag monitor when nobody is looking.
+
+Times the per-request hooks /api/chat runs with sampling off (the
+sampling decision plus stall attribution) against an empty block, and
+task creation with and without the monitor's task factory. Then runs
+sequential /api/chat turns against a zero-latency fake LLM with
+everything off, with the monitor running, and with every request
+profiled, to show the end-to-end difference.
+
+Run from the backend directory:
+
+    python -m benchmarks.profiling_overhead --iterations 200000 --turns 2000
+"""
+import argparse
+import asyncio
+import time
+from contextlib import nullcontext
+
+import server
+from benchmarks.fake_llm import FakeAsyncLLM
+from profiling import LoopMonitor, RequestProfiler, session_tag
+from session_store import InMemorySessionStore
+
+LABEL = f"POST /api/chat session={session_tag('bench')}"
+
+
+async def per_request_hooks(iterations: int) -> float:
+    profiler, monitor = RequestProfiler(sample_rate=0), LoopMonitor()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with profiler.capture(LABEL, None), monitor.track(LABEL):
+            pass
+    hooked = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with nullcontext():
+            pass
+    return (hooked - (time.perf_counter() - started)) / iterations
+
+
+async def task_creation(iterations: int, monitored: bool) -> float:
+    async def noop():
+        pass
+
+    monitor = LoopMonitor(interval=3600)
+    if monitored:
+        monitor.start()
+    with monitor.track(LABEL) if monitored else nullcontext():
+        started = time.perf_counter()
+        for _ in range(iterations // 10):
+            await asyncio.gather(*(asyncio.create_task(noop()) for _ in range(10)))
+        elapsed = time.perf_counter() - started
+    await monitor.stop()
+    return elapsed / iterations
+
+
+async def chat_turns(turns: int, monitored: bool, sample_rate: float) -> float:
+    server.session_store = InMemorySessionStore()
+    server.request_profiler = RequestProfiler(sample_rate=sample_rate)
+    server.loop_monitor = LoopMonitor()
+    if monitored:
+        server.loop_monitor.start()
+    started = time.perf_counter()
+    for i in range(turns):
+        await server.chat_with_ai(server.ChatMessage(message=f"I need a shelf for room {i}", session_id=f"p-{i}"))
+    elapsed = time.perf_counter() - started
+    await server.loop_monitor.stop()
+    return elapsed / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    hooks = asyncio.run(per_request_hooks(args.iterations))
+    print(f"per-request hooks, sampling off: {hooks * 1e6:.2f} µs")
+    plain = asyncio.run(task_creation(args.iterations, monitored=False))
+    factory = asyncio.run(task_creation(args.iterations, monitored=True))
+    print(f"task creation: {plain * 1e6:.2f} µs plain, {factory * 1e6:.2f} µs with the monitor's task factory")
+
+    server.cerebras_client = FakeAsyncLLM(latency=0)
+    server.completion_cache = None
+    asyncio.run(chat_turns(args.turns // 10, monitored=False, sample_rate=0))
+    for name, monitored, rate in (("all off", False, 0.0), ("monitor on, sampling off", True, 0.0),
+                                  ("monitor on, every request profiled", True, 1.0)):
+        per_turn = asyncio.run(chat_turns(args.turns, monitored, rate))
+        print(f"/api/chat turn, {name:36s} {per_turn * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
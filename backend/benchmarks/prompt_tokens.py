@@ -0,0 +1,100 @@
+"""Compare the legacy hand-written prompt with the schema-generated one.
+
+Reports system prompt size, prompt tokens when replaying the recorded
+conversations, completion tokens for the recorded replies in free-text
+(fenced JSON) and structured-output form, and parse results for both.
+Also checks that the generated prompt is byte-identical across processes.
+
+Run from the backend directory:
+
+    python -m benchmarks.prompt_tokens
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.fake_llm import to_structured
+from context_builder import build_context, estimate_tokens
+from response_parser import parse_response
+from session_store import ShelfEntities, Turn
+from shelf_schema import build_system_prompt
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(BACKEND, "benchmarks", "data")
+
+
+def load(name: str):
+    with open(os.path.join(DATA, name)) as f:
+        return f.read() if name.endswith(".txt") else json.load(f)
+
+
+def replay_prompt_tokens(system_prompt: str, conversations) -> int:
+    """Prompt tokens over every turn of every conversation, full history"""
+    total = 0
+    for conversation in conversations:
+        history, entities = [], ShelfEntities()
+        for turn in conversation["turns"]:
+            _, tokens = build_context(system_prompt, history, entities.to_dict(), turn["user"],
+                                      max_turns=100, token_budget=10**9)
+            total += tokens
+            parsed = parse_response(turn["assistant"])
+            history += [Turn("user", turn["user"], turn["user"]), Turn("ai", turn["assistant"], parsed.clean)]
+            entities.update(parsed.entities)
+    return total
+
+
+def prompt_digest_in_subprocess(structured: bool) -> str:
+    code = ("import hashlib; from shelf_schema import build_system_prompt; "
+            f"print(hashlib.sha256(build_system_prompt({structured}).encode()).hexdigest())")
+    env = dict(os.environ, PYTHONHASHSEED="random")
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                          env=env, cwd=BACKEND).stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    conversations = load("conversations.json")
+    prompts = {
+        "legacy": load("legacy_system_prompt.txt"),
+        "compact fenced": build_system_prompt(False),
+        "compact structured": build_system_prompt(True),
+    }
+
+    print(f"{'system prompt':20s} {'chars':>7s} {'tokens':>7s} {'replay prompt tokens':>21s}")
+    for name, prompt in prompts.items():
+        print(f"{name:20s} {len(prompt):7d} {estimate_tokens(prompt):7d} "
+              f"{replay_prompt_tokens(prompt, conversations):21d}")
+
+    replies = [turn["assistant"] for conversation in conversations for turn in conversation["turns"]]
+    structured = [to_structured(reply) for reply in replies]
+    free_tokens = sum(estimate_tokens(reply) for reply in replies)
+    structured_tokens = sum(estimate_tokens(reply) for reply in structured)
+    print(f"\ncompletion tokens over {len(replies)} recorded replies: free text {free_tokens}, "
+          f"structured {structured_tokens} ({1 - structured_tokens / free_tokens:.1%} fewer)")
+
+    mismatches = 0
+    paths = {}
+    for reply, encoded in zip(replies, structured):
+        legacy, current = parse_response(reply), parse_response(encoded)
+        paths[current.path] = paths.get(current.path, 0) + 1
+        if (legacy.clean, legacy.entities, legacy.next_questions) != \
+                (current.clean, current.entities, current.next_questions):
+            mismatches += 1
+    print(f"structured replies parsed via {paths}, {mismatches} differ from the free-text parse")
+
+    for structured_mode in (False, True):
+        local = hashlib.sha256(build_system_prompt(structured_mode).encode()).hexdigest()
+        remote = prompt_digest_in_subprocess(structured_mode)
+        label = "structured" if structured_mode else "fenced"
+        print(f"{label:10s} prompt sha256 {local[:16]} {'stable' if local == remote else 'DIFFERS'} across processes")
+        if local != remote:
+            raise SystemExit("generated prompt is not byte-stable")
+
+
+if __name__ == "__main__":
+    main()
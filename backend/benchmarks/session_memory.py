@@ -0,0 +1,82 @@
+"""Memory footprint of the session store: bytes per session and RSS over a soak run.
+
+Run from the backend directory:
+
+    python -m benchmarks.session_memory --sessions 5000 --turns 6 --soak-waves 50
+"""
+import argparse
+import asyncio
+import gc
+import os
+import resource
+import tracemalloc
+
+from benchmarks.fake_llm import CANNED_REPLY
+from session_store import InMemorySessionStore
+
+USER_MESSAGE = "I need a shelf for my garage, about 48 wide and 24 deep"
+CLEAN_REPLY = CANNED_REPLY.split("```json")[0].strip()
+ENTITIES = {"width": 48, "length": 24, "postHeight": 72, "numberOfShelves": 5}
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def fill(store: InMemorySessionStore, prefix: str, sessions: int, turns: int):
+    for i in range(sessions):
+        session_id = f"{prefix}-{i}"
+        for _ in range(turns):
+            # Fresh strings per turn, as they would arrive from requests
+            await store.append_turn(session_id, USER_MESSAGE + " ", CANNED_REPLY + " ", CLEAN_REPLY + " ", ENTITIES)
+
+
+async def bytes_per_session(sessions: int, turns: int) -> float:
+    store = InMemorySessionStore(max_sessions=sessions)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    await fill(store, "mem", sessions, turns)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / sessions
+
+
+async def soak(sessions: int, turns: int, waves: int, idle_ttl: float):
+    now = [0.0]
+    store = InMemorySessionStore(idle_ttl=idle_ttl, max_sessions=sessions, clock=lambda: now[0])
+    samples = []
+    for wave in range(waves):
+        await fill(store, f"wave{wave}", sessions, turns)
+        now[0] += idle_ttl / 4
+        gc.collect()
+        samples.append(rss_bytes())
+    return store, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--soak-waves", type=int, default=50)
+    parser.add_argument("--idle-ttl", type=float, default=3600)
+    args = parser.parse_args()
+
+    per_session = asyncio.run(bytes_per_session(args.sessions, args.turns))
+    print(f"{per_session:,.0f} bytes per session ({args.turns} exchanges)")
+
+    store, samples = asyncio.run(soak(args.sessions, args.turns, args.soak_waves, args.idle_ttl))
+    warm = samples[min(len(samples) - 1, 4)]
+    print(f"soak: {args.soak_waves * args.sessions:,} sessions created, {len(store):,} live, "
+          f"{store.evictions:,} evicted")
+    print(f"RSS after warm-up {warm / 2**20:.1f} MiB, final {samples[-1] / 2**20:.1f} MiB, "
+          f"growth {(samples[-1] - warm) / 2**20:+.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Check the backend's cold start against a budget.
+
+Imports ``server`` in fresh interpreters under ``python -X importtime``,
+prints the slowest modules and fails (exit status 1) when the best
+cumulative import time exceeds --budget-ms, or when a heavy optional
+integration is imported eagerly. With --serve it also starts uvicorn and
+reports how long /api/health/ready takes to answer 200.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup_budget --budget-ms 800 --serve
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use only; none of them may load while importing the app
+LAZY_MODULES = ("redis", "numpy", "pandas", "boto3", "botocore", "supabase", "litellm", "kubernetes",
+                "google.cloud", "pymongo", "motor")
+
+# Keeps the environment from switching on integrations while measuring
+ENV = dict(os.environ, CEREBRAS_API_KEY="startup-budget", SESSION_BACKEND="memory",
+           COMPLETION_CACHE_BACKEND="memory", SESSION_JOURNAL_DIR="")
+
+# Best cumulative time for ``import server``; also enforced by tests/test_startup_budget.py
+BUDGET_MS = 800
+
+
+def import_times():
+    """{module: cumulative microseconds} for one ``import server`` in a fresh interpreter"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"], cwd=BACKEND, env=ENV,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def eager_imports(times):
+    """Modules from LAZY_MODULES that were loaded while importing the app"""
+    return sorted(name for name in times if name.split(".")[0] in LAZY_MODULES or name in LAZY_MODULES)
+
+
+def time_to_ready(timeout: float) -> float:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=BACKEND, env=ENV)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise SystemExit("uvicorn exited before becoming ready")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health/ready", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.02)
+        raise SystemExit(f"not ready after {timeout:.0f} s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--serve", action="store_true", help="also measure time until /api/health/ready is 200")
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    best = min(runs, key=lambda times: times["server"])
+    print(f"import server: best {best['server'] / 1000:.0f} ms of {args.runs} "
+          f"(budget {args.budget_ms:.0f} ms)")
+    for name, micros in sorted(best.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {micros / 1000:7.1f} ms  {name}")
+
+    failures = []
+    if best["server"] / 1000 > args.budget_ms:
+        failures.append(f"import time {best['server'] / 1000:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    eager = eager_imports(best)
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager[:5])}")
+
+    if args.serve:
+        print(f"uvicorn start to ready: {time_to_ready(60) * 1000:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
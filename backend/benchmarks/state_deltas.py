@@ -0,0 +1,101 @@
+"""Response size and client updates with versioned state deltas versus full entity echoes.
+
+Replays the recorded conversations twice: as a legacy client that replaces
+its parameters with each reply's extracted_entities, and as a client that
+sends known_version and merges the reply's changes. Reports entity payload
+bytes, whole-response bytes, how many replies would re-render the 3D
+view and how often the client's parameters disagree with the session
+state (which must be never for the versioned client).
+Also times the O(1) completeness check against re-evaluating a dict.
+
+Run from the backend directory:
+
+    python -m benchmarks.state_deltas
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import server
+from benchmarks.context_replay import load_conversations
+from benchmarks.fake_llm import ReplayLLM
+from response_parser import format_entities
+from session_store import InMemorySessionStore, ShelfEntities
+
+REQUIRED = ("width", "length", "postHeight", "numberOfShelves")
+
+
+def size(data) -> int:
+    return len(json.dumps(data).encode("utf-8"))
+
+
+async def replay(conversations, versioned: bool) -> dict:
+    server.session_store = InMemorySessionStore()
+    server.completion_cache = None
+    totals = {"turns": 0, "entity_bytes": 0, "response_bytes": 0, "renders": 0, "diverged": 0}
+    for conversation in conversations:
+        name = conversation["name"]
+        server.cerebras_client = ReplayLLM({t["user"]: t["assistant"] for t in conversation["turns"]})
+        client_state, version = {}, None
+        for turn in conversation["turns"]:
+            request = server.ChatMessage(message=turn["user"], session_id=name, known_version=version)
+            response = await server.chat_with_ai(request)
+            if isinstance(response, server.ChatResponse):
+                response = response.model_dump()
+            if versioned:
+                payload = response["changes"]
+                version = response["state_version"]
+                client_state.update(payload)
+            else:
+                # The response as it was before versioned state
+                for key in ("state_version", "changes"):
+                    response.pop(key)
+                payload = response["extracted_entities"]
+                if payload:
+                    client_state = payload
+            totals["turns"] += 1
+            totals["entity_bytes"] += size(payload)
+            totals["response_bytes"] += size(response)
+            totals["renders"] += bool(payload)
+            state = (await server.session_store.load(name)).entities.changes_since(None)
+            totals["diverged"] += client_state != state
+        if versioned and totals["diverged"]:
+            raise SystemExit(f"{name}: merged client state {client_state} != session state {state}")
+    return totals
+
+
+def time_complete_checks(iterations: int) -> tuple:
+    state = ShelfEntities()
+    state.update({"width": 48, "length": 18, "postHeight": 72, "numberOfShelves": 4, "color": "Chrome"})
+    started = time.perf_counter()
+    for _ in range(iterations):
+        state.complete
+    versioned = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(iterations):
+        entities = format_entities(state.to_dict())
+        all(entities.get(key) is not None for key in REQUIRED)
+    return versioned / iterations, (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    conversations = load_conversations()
+    legacy = asyncio.run(replay(conversations, versioned=False))
+    versioned = asyncio.run(replay(conversations, versioned=True))
+    for name, totals in (("extracted_entities", legacy), ("versioned changes", versioned)):
+        print(f"{name:18s} {totals['turns']} turns: entity payload {totals['entity_bytes'] / totals['turns']:6.1f} B/turn, "
+              f"response {totals['response_bytes'] / totals['turns']:7.1f} B/turn, "
+              f"3D updates {totals['renders']}, turns out of sync with the session {totals['diverged']}")
+
+    complete, recomputed = time_complete_checks(args.iterations)
+    print(f"completeness check: {complete * 1e9:.0f} ns (state.complete) vs "
+          f"{recomputed * 1e9:.0f} ns (re-evaluated from the entity dict)")
+
+
+if __name__ == "__main__":
+    main()
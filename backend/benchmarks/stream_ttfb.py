@@ -0,0 +1,51 @@
+"""Compare time-to-first-byte of /api/chat and /api/chat/stream.
+
+Run from the backend directory:
+
+    python -m benchmarks.stream_ttfb --latency 2.0
+"""
+import argparse
+import asyncio
+import time
+
+import server
+from benchmarks.fake_llm import FakeAsyncLLM
+
+MESSAGE = "I need a shelf for my garage"
+
+
+async def blocking_first_byte() -> float:
+    started = time.perf_counter()
+    await server.chat_with_ai(server.ChatMessage(message=MESSAGE, session_id="ttfb-blocking"))
+    return time.perf_counter() - started
+
+
+async def streaming_first_byte() -> float:
+    started = time.perf_counter()
+    events = server.stream_chat_events("ttfb-stream", MESSAGE)
+    await events.__anext__()
+    elapsed = time.perf_counter() - started
+    async for _ in events:
+        pass
+    return elapsed
+
+
+async def run(latency: float):
+    server.cerebras_client = FakeAsyncLLM(latency=latency)
+    # Both endpoints send the same opener; measure the model path, not the cache
+    server.completion_cache = None
+    blocking = await blocking_first_byte()
+    streaming = await streaming_first_byte()
+    print(f"/api/chat        first byte: {blocking * 1000:8.1f} ms")
+    print(f"/api/chat/stream first byte: {streaming * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=2.0, help="total fake generation time in seconds")
+    args = parser.parse_args()
+    asyncio.run(run(args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare the WebSocket channel with POST /api/chat over a real uvicorn server.
+
+Each of --sessions clients sends --messages messages one after another,
+over one keep-alive HTTP connection or one WebSocket per session (whole
+replies, or streamed token frames). The fake model answers instantly
+(--latency 0), so the numbers are the transport and framework overhead
+per message.
+
+Run from the backend directory:
+
+    python -m benchmarks.ws_vs_http --sessions 20 --messages 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import websockets
+
+import server
+from benchmarks.fake_llm import FakeAsyncLLM
+from benchmarks.load_test import HTTPDriver, percentile
+from session_store import InMemorySessionStore
+
+MESSAGE = "I need a shelf for my garage"
+
+
+async def http_session(driver: HTTPDriver, index: int, messages: int, latencies):
+    for i in range(messages):
+        started = time.perf_counter()
+        response = await driver.client.post("/api/chat", json={"message": f"{MESSAGE} {i}",
+                                                               "session_id": f"http-{index}"})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+
+async def ws_session(url: str, index: int, messages: int, latencies, stream: bool):
+    async with websockets.connect(f"{url}/api/ws/ws-{index}-{stream}") as ws:
+        assert json.loads(await ws.recv())["type"] == "ready"
+        for i in range(messages):
+            started = time.perf_counter()
+            await ws.send(json.dumps({"type": "message", "message": f"{MESSAGE} {i}", "id": i, "stream": stream}))
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame["type"] == "final":
+                    break
+                if frame["type"] == "error":
+                    raise RuntimeError(frame)
+            latencies.append(time.perf_counter() - started)
+
+
+async def run(args):
+    server.session_store = InMemorySessionStore()
+    server.completion_cache = None
+    server.FAST_PATH_ENABLED = False
+    server.cerebras_client = FakeAsyncLLM(latency=args.latency)
+
+    driver = HTTPDriver("uvicorn", args.sessions)
+    await driver.start()
+    ws_url = str(driver.client.base_url).replace("http://", "ws://").rstrip("/")
+
+    modes = {
+        "http POST": lambda i, latencies: http_session(driver, i, args.messages, latencies),
+        "ws": lambda i, latencies: ws_session(ws_url, i, args.messages, latencies, stream=False),
+        "ws stream": lambda i, latencies: ws_session(ws_url, i, args.messages, latencies, stream=True),
+    }
+    for name, session in modes.items():
+        latencies = []
+        started = time.perf_counter()
+        await asyncio.gather(*(session(i, latencies) for i in range(args.sessions)))
+        wall = time.perf_counter() - started
+        print(f"{name:10s}: {len(latencies) / wall:8.1f} messages/s, "
+              f"p50 {percentile(latencies, 0.5) * 1000:6.2f} ms, p99 {percentile(latencies, 0.99) * 1000:6.2f} ms")
+
+    await driver.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
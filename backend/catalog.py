@@ -0,0 +1,229 @@
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from shelf_schema import FRONTEND_KEYS, canonical_config
+
+# Catalog settings
+CATALOG_ENABLED = os.environ.get("CATALOG_ENABLED", "true").lower() == "true"
+CATALOG_PATH = os.environ.get("CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            "data", "catalog.json"))
+QUOTE_CACHE_SIZE = int(os.environ.get("QUOTE_CACHE_SIZE", "4096"))
+
+# Shelves closer together than this (in) can't be assembled; caps the shelf count for a post height
+MIN_SHELF_GAP = 8
+
+# Dimensions each kind of part is indexed (and snapped) by, in lookup order
+KIND_DIMENSIONS = {
+    "shelf": ("width", "length"),
+    "solid_shelf": ("width", "length"),
+    "post": ("height",),
+    "caster": (),
+    "divider": ("length",),
+    "top_panel": ("width", "length"),
+    "side_panel": ("length", "height"),
+    "back_panel": ("width", "height"),
+}
+KIND_LABELS = {
+    "shelf": "Wire shelf",
+    "solid_shelf": "Solid shelf",
+    "post": "Post",
+    "caster": "Caster",
+    "divider": "Shelf divider",
+    "top_panel": "Top panel",
+    "side_panel": "Side panel",
+    "back_panel": "Back panel",
+}
+
+
+class CatalogItem(NamedTuple):
+    sku: str
+    kind: str
+    dimensions: Tuple[float, ...]   # values of KIND_DIMENSIONS[kind]
+    price_cents: int
+
+
+class Variant(NamedTuple):
+    code: str
+    multiplier: float
+
+
+def _nearest(values: Sequence[float], target: float) -> int:
+    """Index of the value closest to target in a sorted sequence; ties go to the smaller value"""
+    i = bisect_left(values, target)
+    if i == 0:
+        return 0
+    if i == len(values):
+        return i - 1
+    return i if values[i] - target < target - values[i - 1] else i - 1
+
+
+class SnapIndex:
+    """Nearest-match lookup over one or more dimensions, one sorted level per dimension.
+
+    Each dimension is snapped in turn: the nearest stocked first dimension,
+    then the nearest second dimension stocked at that value, so a lookup is
+    a bisect per level.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[Tuple[float, ...], Any]]):
+        groups: Dict[float, List[Tuple[Tuple[float, ...], Any]]] = {}
+        for dims, item in entries:
+            groups.setdefault(dims[0], []).append((dims[1:], item))
+        self.values = sorted(groups)
+        self.children = [SnapIndex(groups[value]) if groups[value][0][0] else groups[value][0][1]
+                         for value in self.values]
+
+    def nearest(self, dims: Sequence[float]) -> Any:
+        child = self.children[_nearest(self.values, dims[0])]
+        return child.nearest(dims[1:]) if isinstance(child, SnapIndex) else child
+
+
+class Catalog:
+    """SKUs loaded once at startup: snaps configurations to stocked sizes and prices their parts.
+
+    Shelves and panels are stocked per size; shelf style and finish are
+    variants of every SKU (a suffix on the part number and a price
+    multiplier). Quotes are memoized per canonical configuration in a
+    bounded LRU; the cached dicts are shared, so callers must not mutate them.
+    """
+
+    def __init__(self, data: Mapping[str, Any], quote_cache_size: int = QUOTE_CACHE_SIZE):
+        started = time.perf_counter()
+        self.currency = data.get("currency", "USD")
+        self.styles = {name: Variant(v["code"], v["multiplier"]) for name, v in data.get("styles", {}).items()}
+        self.finishes = {name: Variant(v["code"], v["multiplier"]) for name, v in data.get("finishes", {}).items()}
+        by_kind: Dict[str, List[CatalogItem]] = {}
+        for raw in data["items"]:
+            kind = raw["kind"]
+            item = CatalogItem(raw["sku"], kind, tuple(raw[dim] for dim in KIND_DIMENSIONS[kind]),
+                               round(raw["price"] * 100))
+            by_kind.setdefault(kind, []).append(item)
+        self.items = sum(len(items) for items in by_kind.values())
+        self._singles = {kind: items[0] for kind, items in by_kind.items() if not KIND_DIMENSIONS[kind]}
+        self._indexes = {kind: SnapIndex((item.dimensions, item) for item in items)
+                         for kind, items in by_kind.items() if KIND_DIMENSIONS[kind]}
+        self.build_seconds = time.perf_counter() - started
+
+        self.quote_cache_size = quote_cache_size
+        self._quotes: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.quote_seconds = 0.0
+
+    def nearest(self, kind: str, *dims: float) -> CatalogItem:
+        """The stocked part of this kind closest to the given dimensions"""
+        if not dims:
+            return self._singles[kind]
+        return self._indexes[kind].nearest(dims)
+
+    def quote(self, entities: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        """Quote for session or frontend entities, or None until the configuration is complete and valid"""
+        try:
+            return self.quote_config(canonical_config(entities))
+        except (KeyError, ValueError):
+            return None
+
+    def quote_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Snapped configuration, bill of materials and price of a canonical configuration.
+
+        Raises KeyError when the catalog doesn't stock a needed part, style or finish.
+        """
+        key = tuple(tuple(value) if isinstance(value, list) else value for value in config.values())
+        cached = self._quotes.get(key)
+        if cached is not None:
+            self._quotes.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        started = time.perf_counter()
+        result = self._build_quote(config)
+        self.quote_seconds += time.perf_counter() - started
+        self.misses += 1
+        self._quotes[key] = result
+        if len(self._quotes) > self.quote_cache_size:
+            self._quotes.popitem(last=False)
+        return result
+
+    def _build_quote(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        style = self.styles[config["shelf_style"]]
+        finish = self.finishes[config["color_and_finish"]]
+        shelf = self.nearest("shelf", config["width"], config["length"])
+        width, length = shelf.dimensions
+        post = self.nearest("post", config["post_height"])
+        height = post.dimensions[0]
+        shelves = max(1, min(config["number_of_shelves"], int(height // MIN_SHELF_GAP) - 1))
+        levels = [level for level in config["shelf_dividers_shelves"] if level <= shelves]
+        snapped = {**config, "width": width, "length": length, "post_height": height, "number_of_shelves": shelves,
+                   "shelf_dividers_count": config["shelf_dividers_count"] if levels else 0,
+                   "shelf_dividers_shelves": levels}
+
+        lines: List[Dict[str, Any]] = []
+        line_cents: List[int] = []
+
+        def add(item: CatalogItem, quantity: int, styled: bool = False, finished: bool = True) -> None:
+            variants = [(name, variant) for name, variant, applies in
+                        ((config["shelf_style"], style, styled), (config["color_and_finish"], finish, finished))
+                        if applies]
+            unit_cents = round(item.price_cents * math.prod(variant.multiplier for _, variant in variants))
+            description = [KIND_LABELS[item.kind]]
+            if item.dimensions:
+                description.append(" x ".join(f"{dim:g}" for dim in item.dimensions) + " in")
+            lines.append({
+                "sku": "-".join([item.sku, *(variant.code for _, variant in variants)]),
+                "description": ", ".join(description + [name for name, _ in variants]),
+                "quantity": quantity,
+                "unit_price": unit_cents / 100,
+                "total": unit_cents * quantity / 100,
+            })
+            line_cents.append(unit_cents * quantity)
+
+        add(post, 4)
+        wire_shelves = shelves
+        if config["solid_bottom_shelf"]:
+            add(self.nearest("solid_shelf", width, length), 1)
+            wire_shelves -= 1
+        if wire_shelves:
+            add(shelf, wire_shelves, styled=True)
+        if config["type_of_posts"] == "Mobile":
+            add(self.nearest("caster"), 4, finished=False)
+        if config["shelf_dividers_count"] and levels:
+            add(self.nearest("divider", length), config["shelf_dividers_count"] * len(levels))
+        if config["enclosure_type"] == "top":
+            add(self.nearest("top_panel", width, length), 1)
+        elif config["enclosure_type"] == "sides":
+            add(self.nearest("back_panel", width, height), 1)
+            add(self.nearest("side_panel", length, height), 2)
+
+        return {
+            "configuration": {FRONTEND_KEYS[name]: value for name, value in snapped.items()},
+            "adjusted": {FRONTEND_KEYS[name]: {"requested": config[name], "snapped": value}
+                         for name, value in snapped.items() if value != config[name]},
+            "bill_of_materials": lines,
+            "total": sum(line_cents) / 100,
+            "currency": self.currency,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "items": self.items,
+            "build_ms": round(self.build_seconds * 1000, 2),
+            "quotes_cached": len(self._quotes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "mean_quote_us": round(self.quote_seconds / self.misses * 1e6, 2) if self.misses else None,
+        }
+
+
+def load_catalog(path: str = CATALOG_PATH) -> Optional[Catalog]:
+    """Build the catalog from a JSON file of {currency, styles, finishes, items}"""
+    if not CATALOG_ENABLED:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return Catalog(json.load(f))
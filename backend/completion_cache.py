@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Cache settings
+COMPLETION_CACHE_BACKEND = os.environ.get("COMPLETION_CACHE_BACKEND", "memory")
+COMPLETION_CACHE_TTL = float(os.environ.get("COMPLETION_CACHE_TTL", "3600"))
+COMPLETION_CACHE_MAX_ENTRIES = int(os.environ.get("COMPLETION_CACHE_MAX_ENTRIES", "5000"))
+COMPLETION_CACHE_MAX_BYTES = int(os.environ.get("COMPLETION_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def prompt_version(system_prompt: str) -> str:
+    """Short, stable fingerprint of the system prompt"""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_messages(messages: List[Dict[str, str]]) -> List[List[str]]:
+    """Collapse whitespace and case so trivially different turns share a key.
+
+    The leading system prompt is left out; it is represented by the prompt
+    version. Later system messages (the session's current configuration)
+    are kept, since they change the reply.
+    """
+    normalized = []
+    for index, message in enumerate(messages):
+        if index == 0 and message["role"] == "system":
+            continue
+        content = _WHITESPACE.sub(" ", message["content"]).strip()
+        if message["role"] == "user":
+            content = content.casefold()
+        normalized.append([message["role"], content])
+    return normalized
+
+
+def make_cache_key(params: Dict[str, Any], system_prompt: str, messages: List[Dict[str, str]]) -> str:
+    """Hash (model, sampling params, prompt version, normalized messages) into a cache key"""
+    payload = json.dumps(
+        {
+            "params": params,
+            "prompt": prompt_version(system_prompt),
+            "messages": normalize_messages(messages),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with TTL expiry and an approximate memory cap"""
+
+    def __init__(self, max_entries: int = COMPLETION_CACHE_MAX_ENTRIES,
+                 max_bytes: int = COMPLETION_CACHE_MAX_BYTES, ttl: float = COMPLETION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, size, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        size = len(key) + len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size, time.monotonic() + self.ttl)
+        self.current_bytes += size
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def close(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+class RedisCacheBackend:
+    """Shared cache in Redis; LRU and memory cap come from the server's maxmemory policy"""
+
+    def __init__(self, url: str = REDIS_URL, ttl: float = COMPLETION_CACHE_TTL,
+                 prefix: str = "shelf-ai:completion:", client: Any = None):
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class CompletionCache:
+    """Completion cache with hit/miss counters.
+
+    Entries hold the already-parsed turn (clean prose, entities, sufficiency
+    flag, follow-up questions) next to the raw reply, so hits skip both the
+    upstream call and parse_ai_response.
+    """
+
+    def __init__(self, backend: Any):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never fail the chat request
+            print(f"Completion cache read error: {str(e)}")
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get_any(self, keys: List[str]) -> Optional[Dict[str, Any]]:
+        """The first of ``keys`` that is cached, counted as one lookup"""
+        for key in keys:
+            try:
+                value = await self.backend.get(key)
+            except Exception as e:
+                print(f"Completion cache read error: {str(e)}")
+                self.errors += 1
+                continue
+            if value is not None:
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            print(f"Completion cache write error: {str(e)}")
+            self.errors += 1
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+        if isinstance(self.backend, MemoryCacheBackend):
+            stats.update(
+                entries=len(self.backend),
+                bytes=self.backend.current_bytes,
+                evictions=self.backend.evictions,
+            )
+        return stats
+
+
+def build_completion_cache(backend: str = COMPLETION_CACHE_BACKEND) -> Optional[CompletionCache]:
+    """Create the cache configured by COMPLETION_CACHE_BACKEND (memory, redis or none)"""
+    if backend == "memory":
+        return CompletionCache(MemoryCacheBackend())
+    if backend == "redis":
+        return CompletionCache(RedisCacheBackend())
+    if backend in ("none", "off", ""):
+        return None
+    raise ValueError(f"Unknown COMPLETION_CACHE_BACKEND: {backend}")
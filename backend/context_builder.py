@@ -0,0 +1,84 @@
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from shelf_schema import STATE_LABELS
+
+# Conversation context settings
+CONTEXT_MAX_TURNS = int(os.environ.get("CONTEXT_MAX_TURNS", "6"))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "6000"))
+
+# Rough per-message framing cost of the chat template
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token for English)"""
+    return math.ceil(len(text) / 4)
+
+
+def count_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def format_state(entities: Dict[str, Any]) -> str:
+    """Compact summary of the configuration collected so far"""
+    lines = [f"- {label}: {entities[name]}" for name, label in STATE_LABELS.items()
+             if entities.get(name) is not None]
+    if not lines:
+        return ""
+    return ("Current configuration already agreed with the customer "
+            "(earlier turns are omitted; keep these values unless the customer changes them):\n"
+            + "\n".join(lines))
+
+
+def build_context(system_prompt: str, history: Sequence[Any], entities: Dict[str, Any], user_message: str,
+                  max_turns: Optional[int] = None,
+                  token_budget: Optional[int] = None) -> tuple[List[Dict[str, str]], int]:
+    """Build the prompt from the last turns that fit, plus the session state.
+
+    History entries are user/assistant pairs (objects with ``type``,
+    ``content`` and ``clean``). Whole exchanges are kept newest first until
+    either ``max_turns`` exchanges or ``token_budget`` tokens are used. When
+    anything is dropped, a "current configuration" block derived from the
+    session entities stands in for it. Returns the messages and their
+    estimated prompt token count.
+    """
+    max_turns = CONTEXT_MAX_TURNS if max_turns is None else max_turns
+    token_budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    system = {"role": "system", "content": system_prompt}
+    current = {"role": "user", "content": user_message}
+    used = count_prompt_tokens([system, current])
+
+    state_text = format_state(entities)
+    state = {"role": "system", "content": state_text} if state_text else None
+    state_tokens = count_prompt_tokens([state]) if state else 0
+
+    kept: List[Dict[str, str]] = []
+    exchanges = 0
+    index = len(history)
+    while index > 0 and exchanges < max_turns:
+        start = max(0, index - 2)
+        pair = [
+            {"role": "user", "content": turn.content} if turn.type == "user"
+            else {"role": "assistant", "content": turn.clean}
+            for turn in history[start:index]
+        ]
+        cost = count_prompt_tokens(pair)
+        # Reserve room for the state block in case older turns get dropped
+        reserve = state_tokens if start > 0 else 0
+        if used + cost + reserve > token_budget:
+            break
+        kept[:0] = pair
+        used += cost
+        exchanges += 1
+        index = start
+
+    messages = [system]
+    if index > 0 and state is not None:
+        messages.append(state)
+        used += state_tokens
+    messages.extend(kept)
+    messages.append(current)
+    return messages, used
@@ -0,0 +1,278 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from shelf_schema import ESSENTIAL_FIELDS, FRONTEND_KEYS
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+
+# Option vocabularies from the schema, most specific phrases first
+OPTION_PATTERNS = {
+    "shelf_style": [
+        (r"industrial[\s-]+grid|industrial", "Industrial Grid"),
+        (r"commercial[\s-]+wire|commercial", "Commercial Wire"),
+        (r"heavy[\s-]*duty(?:\s+mesh)?", "Heavy Duty Mesh"),
+        (r"ventilated(?:\s+wire)?", "Ventilated Wire"),
+        (r"open[\s-]+grid(?:\s+pro)?", "Open Grid Pro"),
+    ],
+    "color_and_finish": [
+        (r"stainless(?:\s+steel)?", "Stainless Steel"),
+        (r"black(?:\s+epoxy)?", "Black Epoxy"),
+        (r"white(?:\s+epoxy)?", "White Epoxy"),
+        (r"zinc(?:[\s-]+plated)?", "Zinc Plated"),
+        (r"chrome", "Chrome"),
+    ],
+    "type_of_posts": [
+        (r"stationary|fixed|static", "Stationary"),
+        (r"mobile|casters?|wheels?|rolling", "Mobile"),
+    ],
+    "enclosure_type": [
+        (r"no\s+(?:enclosure|panels?)", "none"),
+        (r"top\s+(?:enclosure|panel)s?|enclosed\s+top", "top"),
+        (r"side\s+(?:enclosure|panel)s?|(?:enclosure|panels?)\s+on\s+(?:the\s+|three\s+)?sides", "sides"),
+    ],
+}
+
+_OPTION_RES = {
+    field: [(re.compile(rf"\b(?:{pattern})\b"), value) for pattern, value in options]
+    for field, options in OPTION_PATTERNS.items()
+}
+
+_NUM = r"(\d+(?:\.\d+)?|(?:" + "|".join(NUMBER_WORDS) + r")\b)"
+_UNIT = r"\s*(in(?:ch(?:es)?)?\b|\"|''|′|ft\b|feet\b|foot\b|'|cm\b|mm\b)?"
+_SEP = r"\s*(?:x|×|by|\*)\s*"
+
+_TRIPLE_RE = re.compile(rf"\b{_NUM}{_UNIT}{_SEP}{_NUM}{_UNIT}{_SEP}{_NUM}{_UNIT}")
+_PAIR_RE = re.compile(rf"\b{_NUM}{_UNIT}{_SEP}{_NUM}{_UNIT}")
+_DIMENSION_WORDS = {
+    "width": r"wide|width|w",
+    "length": r"deep|depth|long|length|d",
+    "post_height": r"tall|high|height|h",
+}
+_SUFFIX_RES = {
+    field: re.compile(rf"\b{_NUM}{_UNIT}\s*(?:{words})\b")
+    for field, words in _DIMENSION_WORDS.items()
+}
+# Only nouns lead a number ("width 48"); "48 wide 24 deep" must not read as "wide 24"
+_PREFIX_WORDS = {
+    "width": r"width|w",
+    "length": r"depth|length|d",
+    "post_height": r"height|h",
+}
+_PREFIX_RES = {
+    field: re.compile(rf"\b(?:{words})\b\s*(?:of|is|=|:)?\s*{_NUM}{_UNIT}")
+    for field, words in _PREFIX_WORDS.items()
+}
+_SHELVES_RE = re.compile(rf"\b{_NUM}\s*(?:shelf|shelves|levels?|tiers?)\b")
+_SHELVES_PREFIX_RE = re.compile(rf"\b(?:shelves|levels|tiers)\s*(?:of|=|:)?\s*{_NUM}\b")
+_DIVIDERS_RE = re.compile(rf"\b{_NUM}\s*dividers?\b")
+_SOLID_BOTTOM_RE = re.compile(r"\b(no\s+)?solid\s+bottom\b")
+_ANY_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+# Option words that are negated ("no wheels", "don't want black", "remove the casters")
+# or offered as alternatives ("chrome or black") within their clause are not picks
+_CLAUSE_BREAK_RE = re.compile(r"[,;.!?]")
+_NEGATED_RE = re.compile(
+    r"\b(?:no|not|without|don'?t|dont|doesn'?t|never|remove|removing|drop|skip|except|instead\s+of)\b"
+    r"(?:\s+[\w']+){0,3}\s*$"
+)
+_ALTERNATIVE_BEFORE_RE = re.compile(r"\b(?:or|either|versus|vs)\b\.?\s*$")
+_ALTERNATIVE_AFTER_RE = re.compile(r"^\s*(?:or|versus|vs)\b")
+
+# Messages asking for advice are left to the model
+_OPEN_QUESTION_RE = re.compile(
+    r"\?|\b(?:what|which|how|why|should|could|recommend|suggest|advice|help|options|difference)\b"
+)
+FAST_PATH_MAX_WORDS = 40
+
+
+def _to_number(token: str) -> float:
+    return float(NUMBER_WORDS[token]) if token in NUMBER_WORDS else float(token)
+
+
+def _to_inches(value: float, unit: Optional[str]) -> int:
+    if unit in ("ft", "feet", "foot", "'"):
+        value *= 12
+    elif unit == "cm":
+        value /= 2.54
+    elif unit == "mm":
+        value /= 25.4
+    return int(round(value))
+
+
+class SpecExtraction:
+    """Entities found in one message plus how much of it was understood"""
+
+    def __init__(self):
+        self.entities: Dict[str, Any] = {}
+        self.consumed: List[tuple] = []
+        self.conflict = False
+        # An option was negated or offered as an alternative, so the message isn't a plain spec
+        self.hedged = False
+
+    def set(self, field: str, value: Any, span: tuple) -> None:
+        if field in self.entities and self.entities[field] != value:
+            self.conflict = True
+        self.entities.setdefault(field, value)
+        self.consumed.append(span)
+
+    def covers(self, span: tuple) -> bool:
+        return any(start <= span[0] and span[1] <= end for start, end in self.consumed)
+
+
+def _hedged(text: str, span: tuple) -> bool:
+    """Whether the words around ``span`` in its clause negate it or offer an alternative"""
+    breaks = [m.end() for m in _CLAUSE_BREAK_RE.finditer(text, 0, span[0])]
+    before = text[breaks[-1] if breaks else 0:span[0]]
+    following = _CLAUSE_BREAK_RE.search(text, span[1])
+    after = text[span[1]:following.start() if following else len(text)]
+    return bool(_NEGATED_RE.search(before) or _ALTERNATIVE_BEFORE_RE.search(before)
+                or _ALTERNATIVE_AFTER_RE.search(after))
+
+
+def extract_spec(message: str) -> SpecExtraction:
+    """Deterministic extraction of shelf entities from a customer message"""
+    text = message.lower()
+    result = SpecExtraction()
+
+    match = _TRIPLE_RE.search(text)
+    if match:
+        for index, field in enumerate(("width", "length", "post_height")):
+            number, unit = match.group(1 + 2 * index), match.group(2 + 2 * index)
+            # A unit written only once at the end applies to all three numbers
+            unit = unit or match.group(6)
+            result.set(field, _to_inches(_to_number(number), unit), match.span())
+    else:
+        match = _PAIR_RE.search(text)
+        if match:
+            unit = match.group(2) or match.group(4)
+            result.set("width", _to_inches(_to_number(match.group(1)), unit), match.span())
+            result.set("length", _to_inches(_to_number(match.group(3)), unit), match.span())
+
+    for field, regex in _SUFFIX_RES.items():
+        for match in regex.finditer(text):
+            if not result.covers(match.span()):
+                result.set(field, _to_inches(_to_number(match.group(1)), match.group(2)), match.span())
+    for field, regex in _PREFIX_RES.items():
+        for match in regex.finditer(text):
+            if not result.covers(match.span()):
+                result.set(field, _to_inches(_to_number(match.group(1)), match.group(2)), match.span())
+
+    for regex in (_SHELVES_RE, _SHELVES_PREFIX_RE):
+        for match in regex.finditer(text):
+            if not result.covers(match.span()):
+                result.set("number_of_shelves", int(_to_number(match.group(1))), match.span())
+
+    match = _DIVIDERS_RE.search(text)
+    if match:
+        result.set("shelf_dividers_count", int(_to_number(match.group(1))), match.span())
+
+    match = _SOLID_BOTTOM_RE.search(text)
+    if match:
+        if _hedged(text, match.span()):
+            result.hedged = True
+        else:
+            result.set("solid_bottom_shelf", match.group(1) is None, match.span())
+
+    for field, options in _OPTION_RES.items():
+        for regex, value in options:
+            match = regex.search(text)
+            if match:
+                if _hedged(text, match.span()):
+                    result.hedged = True
+                else:
+                    result.set(field, value, match.span())
+                break
+
+    return result
+
+
+def asks_for_advice(message: str) -> bool:
+    return _OPEN_QUESTION_RE.search(message.lower()) is not None
+
+
+def is_confident(message: str, extraction: SpecExtraction) -> bool:
+    """True when every number was attributed, no option was negated or hedged and nothing asks for advice"""
+    text = message.lower()
+    if extraction.conflict or extraction.hedged or not extraction.entities:
+        return False
+    if len(text.split()) > FAST_PATH_MAX_WORDS or asks_for_advice(text):
+        return False
+    return all(extraction.covers(m.span()) for m in _ANY_NUMBER_RE.finditer(text))
+
+
+def to_frontend(entities: Dict[str, Any]) -> Dict[str, Any]:
+    """Session field names -> the keys parse_ai_response returns"""
+    return {FRONTEND_KEYS[field]: value for field, value in entities.items()}
+
+
+def _describe(state: Dict[str, Any]) -> str:
+    description = (f"{state['width']}\" wide x {state['length']}\" deep x {state['post_height']}\" tall "
+                   f"with {state['number_of_shelves']} shelves")
+    extras = []
+    if state.get("shelf_style"):
+        extras.append(f"{state['shelf_style']} style")
+    if state.get("color_and_finish"):
+        extras.append(f"{state['color_and_finish']} finish")
+    if state.get("type_of_posts"):
+        extras.append(f"{state['type_of_posts'].lower()} posts")
+    if state.get("solid_bottom_shelf"):
+        extras.append("a solid bottom shelf")
+    if state.get("shelf_dividers_count"):
+        extras.append(f"{state['shelf_dividers_count']} dividers per shelf")
+    if state.get("enclosure_type") and state["enclosure_type"] != "none":
+        extras.append(f"{state['enclosure_type']} enclosure panels")
+    if extras:
+        description += ", " + ", ".join(extras[:-1]) + (" and " if len(extras) > 1 else "") + extras[-1]
+    return description
+
+
+def _follow_up_questions(state: Dict[str, Any]) -> List[str]:
+    questions = []
+    if not state.get("color_and_finish"):
+        questions.append("Which finish would you like?")
+    if not state.get("shelf_style"):
+        questions.append("Which shelf style do you prefer?")
+    if not state.get("type_of_posts"):
+        questions.append("Should the unit be mobile or stationary?")
+    return questions
+
+
+def fast_path_turn(message: str, session_entities: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Answer a fully specified message from a template, without the model.
+
+    Returns a turn shaped like server.parse_turn's output, or None when the
+    message (together with the session state) doesn't pin down every
+    essential entity with high confidence.
+    """
+    extraction = extract_spec(message)
+    if not is_confident(message, extraction):
+        return None
+
+    state = dict(session_entities)
+    state.update(extraction.entities)
+    if any(state.get(field) is None for field in ESSENTIAL_FIELDS):
+        return None
+
+    questions = _follow_up_questions(state)
+    prose = f"Got it! I've set up a {_describe(state)}. That's everything needed for the 3D model."
+    if questions:
+        prose += " " + " ".join(questions[:2])
+    else:
+        prose += " Let me know if you'd like to adjust anything."
+
+    block = json.dumps({
+        "extracted_entities": state,
+        "has_sufficient_entities": True,
+        "next_questions": questions,
+    }, indent=2)
+    return {
+        "raw": f"{prose}\n\n```json\n{block}\n```",
+        "response": prose,
+        "extracted_entities": to_frontend(extraction.entities),
+        "has_sufficient_entities": True,
+        "next_questions": questions,
+    }
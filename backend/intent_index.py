@@ -0,0 +1,228 @@
+import json
+import math
+import os
+import re
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from fast_path import extract_spec, to_frontend
+from shelf_schema import ENTITY_FIELDS
+
+# Opening-turn intent index settings
+INTENT_INDEX_ENABLED = os.environ.get("INTENT_INDEX_ENABLED", "true").lower() == "true"
+INTENT_CORPUS = os.environ.get("INTENT_CORPUS", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              "data", "opening_intents.json"))
+INTENT_MIN_SIMILARITY = float(os.environ.get("INTENT_MIN_SIMILARITY", "0.55"))
+# A different intent scoring within this much of the best one makes the match ambiguous
+INTENT_MIN_MARGIN = float(os.environ.get("INTENT_MIN_MARGIN", "0.05"))
+INTENT_MAX_WORDS = int(os.environ.get("INTENT_MAX_WORDS", "12"))
+
+# Candidate generation reads postings rarest feature first, up to this many entries; the best few are scored exactly
+CANDIDATE_POSTINGS = 1000
+CANDIDATES = 8
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Filler that carries no intent ("i need a ... please")
+STOP_WORDS = frozenset((
+    "a an the i i'd id im me my we our us you your to for of in on at with and or some any just please "
+    "need needs want wants would like looking look get got can could help something thing things stuff"
+).split())
+
+# Domain spellings folded together before the generic plural rule
+SYNONYMS = {
+    "shelves": "shelf", "shelving": "shelf", "rack": "shelf", "racks": "shelf", "racking": "shelf",
+    "colour": "color", "colours": "color", "finishes": "finish", "dimensions": "size", "sizing": "size",
+}
+
+
+class OpeningIntent(NamedTuple):
+    name: str
+    reply: str
+    next_questions: List[str]
+    entities: Dict[str, Any]
+
+
+def _stem(word: str) -> str:
+    word = SYNONYMS.get(word, word)
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize(text: str) -> str:
+    """Lowercased content words, stemmed, filler removed"""
+    return " ".join(_stem(word) for word in _WORD_RE.findall(text.lower()) if word not in STOP_WORDS)
+
+
+def features(normalized: str) -> Counter:
+    """Character trigrams across the whole phrase plus whole words"""
+    padded = f" {normalized} "
+    grams = Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+    grams.update("w:" + word for word in normalized.split())
+    return grams
+
+
+class IntentIndex:
+    """TF-IDF cosine similarity over character trigrams of example opening messages.
+
+    Exact normalized matches are a dict lookup. Otherwise candidates come
+    from the postings of the query's rarest features and the best few are
+    scored exactly, so lookups stay in the tens of microseconds even with
+    tens of thousands of examples. Below ``min_similarity``, or when another
+    intent scores within ``min_margin``, nothing is returned and the turn
+    goes to the model.
+    """
+
+    def __init__(self, corpus: List[Dict[str, Any]], min_similarity: float = INTENT_MIN_SIMILARITY,
+                 min_margin: float = INTENT_MIN_MARGIN):
+        started = time.perf_counter()
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.intents: List[OpeningIntent] = []
+        self._doc_intent = array("I")
+        self._exact: Dict[str, int] = {}
+        # Features are interned to ints; each example is stored as parallel id/weight arrays
+        self._feature_ids: Dict[str, int] = {}
+        doc_grams: List[Counter] = []
+        df: List[int] = []
+        for item in corpus:
+            intent_id = len(self.intents)
+            self.intents.append(OpeningIntent(item["intent"], item["reply"], item.get("next_questions", []),
+                                              item.get("entities", {})))
+            for example in item["examples"]:
+                normalized = normalize(example)
+                grams = Counter()
+                for gram, count in features(normalized).items():
+                    feature = self._feature_ids.setdefault(gram, len(self._feature_ids))
+                    if feature == len(df):
+                        df.append(0)
+                    df[feature] += 1
+                    grams[feature] = count
+                self._exact.setdefault(normalized, intent_id)
+                self._doc_intent.append(intent_id)
+                doc_grams.append(grams)
+
+        count = len(doc_grams)
+        self._unknown_idf = math.log(count + 1) + 1
+        self._idf = array("d", (math.log((count + 1) / (freq + 1)) + 1 for freq in df))
+        postings: List[List[int]] = [[] for _ in df]
+        self._doc_features: List[array] = []
+        self._doc_weights: List[array] = []
+        for doc_id, grams in enumerate(doc_grams):
+            vector = self._weigh(grams)
+            self._doc_features.append(array("I", vector))
+            self._doc_weights.append(array("f", vector.values()))
+            for feature in grams:
+                postings[feature].append(doc_id)
+        self._postings = [array("I", docs) for docs in postings]
+
+        self.build_seconds = time.perf_counter() - started
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_seconds = 0.0
+
+    def _weigh(self, grams: Counter) -> Dict[Any, float]:
+        idf, unknown = self._idf, self._unknown_idf
+        vector = {gram: count * (idf[gram] if isinstance(gram, int) else unknown) for gram, count in grams.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {gram: weight / norm for gram, weight in vector.items()}
+
+    def search(self, message: str) -> Tuple[Optional[OpeningIntent], float, float]:
+        """Best matching intent, its cosine similarity and the margin over the next-best intent"""
+        normalized = normalize(message)
+        if not normalized:
+            return None, 0.0, 0.0
+        intent_id = self._exact.get(normalized)
+        if intent_id is not None:
+            return self.intents[intent_id], 1.0, 1.0
+
+        # Unseen features keep their (maximal) weight, pulling the similarity down
+        feature_ids = self._feature_ids
+        query = self._weigh(Counter({feature_ids.get(gram, gram): count
+                                     for gram, count in features(normalized).items()}))
+        postings = self._postings
+        rarest = sorted((postings[feature] for feature in query if isinstance(feature, int)), key=len)
+        votes: Counter = Counter()
+        budget = CANDIDATE_POSTINGS
+        for docs in rarest:
+            budget -= len(docs)
+            if budget < 0:
+                break
+            votes.update(docs)
+
+        scores: Dict[int, float] = {}
+        for doc_id, _ in votes.most_common(CANDIDATES):
+            score = sum(query.get(feature, 0.0) * weight
+                        for feature, weight in zip(self._doc_features[doc_id], self._doc_weights[doc_id]))
+            intent_id = self._doc_intent[doc_id]
+            if score > scores.get(intent_id, 0.0):
+                scores[intent_id] = score
+        if not scores:
+            return None, 0.0, 0.0
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        best_id, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return self.intents[best_id], best_score, best_score - runner_up
+
+    def lookup(self, message: str) -> Optional[OpeningIntent]:
+        """The intent to answer with, or None below the similarity threshold"""
+        started = time.perf_counter()
+        intent, score, margin = self.search(message)
+        hit = intent is not None and score >= self.min_similarity and margin >= self.min_margin
+        self.lookups += 1
+        self.hits += hit
+        self.lookup_seconds += time.perf_counter() - started
+        return intent if hit else None
+
+    def __len__(self) -> int:
+        return len(self._doc_intent)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "intents": len(self.intents),
+            "examples": len(self),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "mean_lookup_us": round(self.lookup_seconds / self.lookups * 1e6, 2) if self.lookups else None,
+            "build_ms": round(self.build_seconds * 1000, 2),
+            "min_similarity": self.min_similarity,
+            "min_margin": self.min_margin,
+        }
+
+
+def opening_turn(index: IntentIndex, message: str) -> Optional[Dict[str, Any]]:
+    """Answer a first message from the index, shaped like server.parse_turn's output.
+
+    Messages that are long or already carry configuration (sizes, finishes,
+    ...) are left to the model, since a stored reply can't acknowledge them.
+    """
+    if len(message.split()) > INTENT_MAX_WORDS or extract_spec(message).entities:
+        return None
+    intent = index.lookup(message)
+    if intent is None:
+        return None
+
+    block = json.dumps({
+        "extracted_entities": {**dict.fromkeys(ENTITY_FIELDS), **intent.entities},
+        "has_sufficient_entities": False,
+        "next_questions": intent.next_questions,
+    }, indent=2)
+    return {
+        "raw": f"{intent.reply}\n\n```json\n{block}\n```",
+        "response": intent.reply,
+        "extracted_entities": to_frontend(intent.entities),
+        "has_sufficient_entities": False,
+        "next_questions": intent.next_questions,
+    }
+
+
+def load_intent_index(path: str = INTENT_CORPUS) -> Optional[IntentIndex]:
+    """Build the index from a JSON corpus of {intent, examples, reply, next_questions, entities}"""
+    if not INTENT_INDEX_ENABLED:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return IntentIndex(json.load(f))
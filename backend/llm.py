@@ -0,0 +1,143 @@
+import asyncio
+import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Optional
+
+import httpx
+from cerebras.cloud.sdk import AsyncCerebras, DefaultAsyncHttpxClient, RateLimitError
+
+# Upstream connection settings
+CEREBRAS_POOL_SIZE = int(os.environ.get("CEREBRAS_POOL_SIZE", "32"))
+CEREBRAS_KEEPALIVE_CONNECTIONS = int(os.environ.get("CEREBRAS_KEEPALIVE_CONNECTIONS", str(CEREBRAS_POOL_SIZE)))
+CEREBRAS_KEEPALIVE_EXPIRY = float(os.environ.get("CEREBRAS_KEEPALIVE_EXPIRY", "30"))
+CEREBRAS_CONNECT_TIMEOUT = float(os.environ.get("CEREBRAS_CONNECT_TIMEOUT", "5"))
+CEREBRAS_TIMEOUT = float(os.environ.get("CEREBRAS_TIMEOUT", "60"))
+
+# Worker threads used when only a synchronous client is available
+SYNC_CLIENT_WORKERS = int(os.environ.get("CEREBRAS_SYNC_WORKERS", str(CEREBRAS_POOL_SIZE)))
+
+_sync_executor: Optional[ThreadPoolExecutor] = None
+
+
+def build_cerebras_client(api_key: Optional[str] = None) -> AsyncCerebras:
+    """Create the async Cerebras client backed by a shared keep-alive connection pool"""
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=CEREBRAS_POOL_SIZE,
+            max_keepalive_connections=CEREBRAS_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=CEREBRAS_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(CEREBRAS_TIMEOUT, connect=CEREBRAS_CONNECT_TIMEOUT),
+    )
+    return AsyncCerebras(
+        api_key=api_key or os.environ.get("CEREBRAS_API_KEY"),
+        http_client=http_client,
+        # Retries, deadlines and the circuit breaker live in resilience.py
+        max_retries=0,
+        # The SDK would warm up with a blocking request from a throwaway sync client; see warm_up_client
+        warm_tcp_connection=False,
+    )
+
+
+async def warm_up_client(client: Any) -> None:
+    """Open a keep-alive connection in the client's own pool, without blocking startup"""
+    if not isinstance(client, AsyncCerebras):
+        return
+    try:
+        await client.get("/v1/tcp_warming", cast_to=str, options={"timeout": 1})
+    except Exception as e:
+        print(f"Error warming up the Cerebras connection: {str(e)}")
+
+
+def is_async_client(client: Any) -> bool:
+    """Check whether the client's completion call returns an awaitable"""
+    return isinstance(client, AsyncCerebras) or inspect.iscoroutinefunction(client.chat.completions.create)
+
+
+def _get_sync_executor() -> ThreadPoolExecutor:
+    global _sync_executor
+    if _sync_executor is None:
+        _sync_executor = ThreadPoolExecutor(max_workers=SYNC_CLIENT_WORKERS, thread_name_prefix="cerebras")
+    return _sync_executor
+
+
+async def create_completion(client: Any, timeout: Optional[float] = None, **kwargs) -> Any:
+    """Run a chat completion without blocking the event loop.
+
+    Async clients are awaited directly; synchronous clients are offloaded to a
+    bounded thread pool so a slow completion never stalls other requests.
+    """
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    if is_async_client(client):
+        return await client.chat.completions.create(**kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_sync_executor(), lambda: client.chat.completions.create(**kwargs)
+    )
+
+
+async def stream_completion(client: Any, timeout: Optional[float] = None,
+                            on_usage: Optional[Callable[[Any], None]] = None, **kwargs) -> AsyncIterator[str]:
+    """Yield the text deltas of a streamed chat completion.
+
+    Closing the generator early closes the upstream stream as well. If the
+    provider attaches ``usage`` to a chunk, it is passed to ``on_usage``.
+    """
+    stream = await create_completion(client, timeout=timeout, stream=True, **kwargs)
+
+    if hasattr(stream, "__aiter__"):
+        try:
+            async for chunk in stream:
+                if on_usage is not None and getattr(chunk, "usage", None) is not None:
+                    on_usage(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+        return
+
+    # Synchronous stream: pull each chunk on the worker pool
+    loop = asyncio.get_running_loop()
+    iterator = iter(stream)
+    sentinel = object()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(_get_sync_executor(), next, iterator, sentinel)
+            if chunk is sentinel:
+                break
+            if on_usage is not None and getattr(chunk, "usage", None) is not None:
+                on_usage(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+
+def rate_limit_retry_after(error: Exception) -> Optional[str]:
+    """Retry-After to pass on when the provider rate-limited us, else None"""
+    if not isinstance(error, RateLimitError):
+        return None
+    return error.response.headers.get("retry-after", "1")
+
+
+async def close_client(client: Any) -> None:
+    """Release pooled connections held by the client"""
+    global _sync_executor
+    close = getattr(client, "close", None)
+    if close is not None:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    if _sync_executor is not None:
+        _sync_executor.shutdown(wait=False)
+        _sync_executor = None
@@ -0,0 +1,207 @@
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+# Seconds, from sub-millisecond local stages up to slow model calls
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+PARSE_PATH_NAMES = ("structured", "fenced", "fallback", "natural_language")
+
+# Model routes chosen by model_router
+ROUTE_NAMES = ("small", "large")
+
+
+class StageHistogram:
+    """Lock-free latency histogram, exported by MetricsCollector at scrape time.
+
+    Observations only happen on the event loop thread, so plain integer
+    bumps are safe and several times cheaper than prometheus_client's
+    locked Histogram.observe.
+    """
+
+    def __init__(self, bounds=STAGE_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def buckets(self) -> list:
+        cumulative, total = [], 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            cumulative.append((str(float(bound)), total))
+        cumulative.append(("+Inf", total + self.counts[-1]))
+        return cumulative
+
+
+PROMPT_SECONDS = StageHistogram()
+# Opening-intent lookups, part of the prompt stage
+INTENT_SECONDS = StageHistogram()
+LLM_SECONDS = StageHistogram()
+# JSON extraction and prose cleanup are one pass (response_parser.parse_response)
+PARSE_SECONDS = StageHistogram()
+TOTAL_SECONDS = StageHistogram()
+STREAM_TOTAL_SECONDS = StageHistogram()
+# How late the event loop ran a timer (profiling.LoopMonitor); not a stage of a turn
+LOOP_LAG_SECONDS = StageHistogram()
+STAGES = {
+    "prompt": PROMPT_SECONDS,
+    "intent": INTENT_SECONDS,
+    "llm": LLM_SECONDS,
+    "parse": PARSE_SECONDS,
+    "total": TOTAL_SECONDS,
+    "stream_total": STREAM_TOTAL_SECONDS,
+}
+
+llm_tokens = {"prompt": 0, "completion": 0}
+parse_paths = dict.fromkeys(PARSE_PATH_NAMES, 0)
+
+# Per route: latency and tokens of each model call, turns first sent there, and escalations by reason
+ROUTE_SECONDS = {route: StageHistogram() for route in ROUTE_NAMES}
+route_tokens = {route: {"prompt": 0, "completion": 0} for route in ROUTE_NAMES}
+route_turns = dict.fromkeys(ROUTE_NAMES, 0)
+route_escalations: Dict[str, int] = {}
+
+# Errors are rare, so the regular (locked) counter is fine here
+CHAT_ERRORS = Counter("shelf_chat_errors", "Failed chat turns by error type and HTTP status", ["type", "status"])
+
+
+def since(started: float) -> float:
+    return time.perf_counter() - started
+
+
+def record_usage(usage: Any, route: Optional[str] = None) -> None:
+    """Count prompt/completion tokens from a completion's ``usage``, if present"""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if prompt_tokens:
+        llm_tokens["prompt"] += prompt_tokens
+        if route is not None:
+            route_tokens[route]["prompt"] += prompt_tokens
+    if completion_tokens:
+        llm_tokens["completion"] += completion_tokens
+        if route is not None:
+            route_tokens[route]["completion"] += completion_tokens
+
+
+def record_escalation(reason: str) -> None:
+    route_escalations[reason] = route_escalations.get(reason, 0) + 1
+
+
+def route_stats() -> Dict[str, Any]:
+    escalated = sum(route_escalations.values())
+    return {
+        "turns": dict(route_turns),
+        "escalations": dict(route_escalations),
+        "escalation_rate": round(escalated / route_turns["small"], 4) if route_turns["small"] else 0.0,
+        "tokens": {route: dict(tokens) for route, tokens in route_tokens.items()},
+        "mean_llm_seconds": {route: round(h.sum / sum(h.counts), 4) if sum(h.counts) else None
+                             for route, h in ROUTE_SECONDS.items()},
+    }
+
+
+def record_parse_path(path: str) -> None:
+    parse_paths[path] += 1
+
+
+def record_error(error: Exception, status_code: int) -> None:
+    CHAT_ERRORS.labels(type(error).__name__, str(status_code)).inc()
+
+
+class MetricsCollector:
+    """Exports stage histograms and the counters the app already keeps at scrape time.
+
+    Each source is a callable so that swapped-out stores and caches are
+    always the ones read; the cache source may return None when disabled.
+    """
+
+    def __init__(self, chat_paths: Callable[[], Dict[str, int]],
+                 cache_stats: Callable[[], Optional[Dict[str, Any]]],
+                 session_stats: Callable[[], Dict[str, Any]]):
+        self.chat_paths = chat_paths
+        self.cache_stats = cache_stats
+        self.session_stats = session_stats
+
+    def collect(self) -> Iterator[Any]:
+        stages = HistogramMetricFamily("shelf_chat_stage_seconds", "Time spent in each stage of a chat turn",
+                                       labels=["stage"])
+        for stage, histogram in STAGES.items():
+            stages.add_metric([stage], histogram.buckets(), histogram.sum)
+        yield stages
+
+        lag = HistogramMetricFamily("shelf_event_loop_lag_seconds", "How late the event loop woke a periodic timer")
+        lag.add_metric([], LOOP_LAG_SECONDS.buckets(), LOOP_LAG_SECONDS.sum)
+        yield lag
+
+        tokens = CounterMetricFamily("shelf_llm_tokens", "Tokens reported by the provider's completion usage",
+                                     labels=["kind"])
+        for kind, count in llm_tokens.items():
+            tokens.add_metric([kind], count)
+        yield tokens
+
+        paths = CounterMetricFamily("shelf_parse_path", "Model replies by how their entities were parsed",
+                                    labels=["path"])
+        for path, count in parse_paths.items():
+            paths.add_metric([path], count)
+        yield paths
+
+        routes = HistogramMetricFamily("shelf_route_llm_seconds", "Model call latency by route", labels=["route"])
+        for route, histogram in ROUTE_SECONDS.items():
+            routes.add_metric([route], histogram.buckets(), histogram.sum)
+        yield routes
+
+        tokens = CounterMetricFamily("shelf_route_tokens", "Provider-reported tokens by route", labels=["route", "kind"])
+        for route, counts in route_tokens.items():
+            for kind, count in counts.items():
+                tokens.add_metric([route, kind], count)
+        yield tokens
+
+        routed = CounterMetricFamily("shelf_route_turns", "Model turns by the route first chosen", labels=["route"])
+        for route, count in route_turns.items():
+            routed.add_metric([route], count)
+        yield routed
+
+        escalations = CounterMetricFamily("shelf_route_escalations",
+                                          "Small-model turns redone on the large model, by reason", labels=["reason"])
+        for reason, count in route_escalations.items():
+            escalations.add_metric([reason], count)
+        yield escalations
+
+        turns = CounterMetricFamily("shelf_chat_turns", "Chat turns by how they were answered", labels=["path"])
+        for path, count in self.chat_paths().items():
+            turns.add_metric([path], count)
+        yield turns
+
+        cache = self.cache_stats()
+        if cache is not None:
+            lookups = CounterMetricFamily("shelf_cache_lookups", "Completion cache lookups by result",
+                                          labels=["result"])
+            lookups.add_metric(["hit"], cache["hits"])
+            lookups.add_metric(["miss"], cache["misses"])
+            yield lookups
+            yield CounterMetricFamily("shelf_cache_errors", "Completion cache backend errors", value=cache["errors"])
+
+        # The Redis store doesn't count sessions; those gauges are memory-store only
+        sessions = self.session_stats()
+        if "sessions" in sessions:
+            yield GaugeMetricFamily("shelf_live_sessions", "Sessions currently held", value=sessions["sessions"])
+        if "history_bytes" in sessions:
+            yield GaugeMetricFamily("shelf_history_bytes", "UTF-8 size of stored chat history",
+                                    value=sessions["history_bytes"])
+
+
+def register(collector: MetricsCollector) -> None:
+    REGISTRY.register(collector)
+
+
+def render() -> tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,83 @@
+import os
+import re
+from typing import Any, Dict, NamedTuple, Optional
+
+from fast_path import asks_for_advice, extract_spec, is_confident
+from shelf_schema import ENTITY_ALIASES
+
+# Model routing settings
+SMALL_MODEL = os.environ.get("SMALL_MODEL", "llama3.1-8b")
+LARGE_MODEL = os.environ.get("LARGE_MODEL", "llama-3.3-70b")
+MODEL_ROUTING_ENABLED = os.environ.get("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+ROUTER_MAX_WORDS = int(os.environ.get("ROUTER_MAX_WORDS", "12"))
+ROUTER_MAX_FIELDS = int(os.environ.get("ROUTER_MAX_FIELDS", "2"))
+
+# Short answers to the assistant's last question ("yes", "ok thanks", "sounds good")
+_CONFIRMATION_RE = re.compile(
+    r"^(?:yes|yeah|yep|sure|ok(?:ay)?|sounds good|perfect|great|correct|that works|go ahead|do it|no|nope)"
+    r"(?:[\s,.!]+(?:please|thanks|thank you))?[\s.!]*$"
+)
+
+
+class RouteDecision(NamedTuple):
+    route: str                 # "small" or "large"
+    model: str
+    reason: str
+    touched: Dict[str, Any]    # entities the message itself sets, by session field name
+    state: Dict[str, Any]      # session entities before the turn
+
+
+def choose_route(message: str, state: Dict[str, Any]) -> RouteDecision:
+    """Send short slot-filling turns to the small model, everything else to the large one"""
+    def large(reason: str) -> RouteDecision:
+        return RouteDecision("large", LARGE_MODEL, reason, {}, state)
+
+    if not MODEL_ROUTING_ENABLED:
+        return large("disabled")
+    text = message.strip().lower()
+    if len(text.split()) > ROUTER_MAX_WORDS:
+        return large("long_message")
+    if asks_for_advice(text):
+        return large("open_question")
+    if _CONFIRMATION_RE.match(text):
+        return RouteDecision("small", SMALL_MODEL, "confirmation", {}, state)
+
+    extraction = extract_spec(text)
+    if not is_confident(text, extraction):
+        return large("not_slot_filling")
+    if len(extraction.entities) > ROUTER_MAX_FIELDS:
+        return large("many_fields")
+    return RouteDecision("small", SMALL_MODEL, "slot_filling", extraction.entities, state)
+
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+        return float(a) == float(b)
+    return a == b
+
+
+def escalation_reason(turn: Dict[str, Any], decision: RouteDecision) -> Optional[str]:
+    """Why the small model's turn can't be trusted, or None to accept it.
+
+    The reply must have parsed as JSON, must agree with every entity the
+    message set, and must leave the rest of the session state alone:
+    a slot-filling turn may only change the slots it fills, and a
+    confirmation may fill empty slots but not overwrite agreed ones.
+    """
+    if turn.get("parse_path") not in ("structured", "fenced"):
+        return "unparsed_json"
+    entities = {ENTITY_ALIASES.get(key, key): value for key, value in turn["extracted_entities"].items()}
+    for field, value in decision.touched.items():
+        if field not in entities:
+            return "missed_slot"
+        if not _same(entities[field], value):
+            return "disagrees_with_message"
+    for field, value in entities.items():
+        if field in decision.touched:
+            continue
+        current = decision.state.get(field)
+        if current is None and decision.reason == "confirmation":
+            continue
+        if not _same(current, value):
+            return "conflicts_with_state"
+    return None
@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from single_flight import SingleFlight
+
+# Preview image cache settings
+PREVIEW_CACHE_MAX_ENTRIES = int(os.environ.get("PREVIEW_CACHE_MAX_ENTRIES", "2000"))
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get("PREVIEW_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Empty keeps previews in memory only
+PREVIEW_CACHE_DIR = os.environ.get("PREVIEW_CACHE_DIR", "")
+# Total size of the PNGs kept in PREVIEW_CACHE_DIR; the least recently used are deleted beyond it
+PREVIEW_DISK_MAX_BYTES = int(os.environ.get("PREVIEW_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+PREVIEW_RENDER_WORKERS = int(os.environ.get("PREVIEW_RENDER_WORKERS", "2"))
+# Renders running or queued on the pool; further misses are refused instead of queued behind them
+PREVIEW_MAX_PENDING_RENDERS = int(os.environ.get("PREVIEW_MAX_PENDING_RENDERS", "8"))
+
+# Pruning deletes down to this fraction of the disk budget, so it doesn't run on every write
+DISK_PRUNE_TARGET = 0.9
+
+# Bump whenever the renderer's output changes, so old cached images are not served
+RENDER_VERSION = 1
+
+PREVIEW_SIZES = {"small": (320, 240), "medium": (600, 450), "large": (1200, 900)}
+DEFAULT_SIZE = "medium"
+
+
+def preview_key(config: Dict[str, Any], size: str) -> str:
+    """Content address of a rendered preview: renderer version, image size and canonical configuration"""
+    payload = json.dumps({"v": RENDER_VERSION, "size": size, "config": config}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class PreviewBusy(Exception):
+    """Raised when a preview would have to wait behind too many pending renders"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Too many previews are being rendered")
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class PreviewCache:
+    """Rendered preview PNGs: a bounded in-memory LRU in front of an optional on-disk cache.
+
+    Misses render on a small thread pool so the event loop stays free, and
+    concurrent requests for the same image share one render. Files on disk
+    are named by their content key and written atomically, so several
+    workers can share the directory. The directory is kept under
+    max_disk_bytes by deleting the least recently used files, and misses
+    beyond max_pending are refused with PreviewBusy.
+    """
+
+    def __init__(self, directory: str = PREVIEW_CACHE_DIR, max_entries: int = PREVIEW_CACHE_MAX_ENTRIES,
+                 max_bytes: int = PREVIEW_CACHE_MAX_BYTES, workers: int = PREVIEW_RENDER_WORKERS,
+                 max_disk_bytes: int = PREVIEW_DISK_MAX_BYTES, max_pending: int = PREVIEW_MAX_PENDING_RENDERS):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_pending = max_pending
+        self.workers = workers
+        self.current_bytes = 0
+        # Bytes on disk; None until the directory is first scanned. Other workers' writes are seen on the next prune
+        self.disk_bytes: Optional[int] = None
+        self.pending = 0
+        # Guards the pending count; the event loop takes it, so it is never held for long
+        self._lock = threading.Lock()
+        # Serializes disk accounting and pruning between the pool threads
+        self._disk_lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._renderer = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preview-render")
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+        self.render_seconds = 0.0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_errors = 0
+        self.rejected = 0
+
+    async def get(self, config: Dict[str, Any], size: str = DEFAULT_SIZE) -> bytes:
+        """PNG bytes of the preview, from memory, disk or a fresh render"""
+        key = preview_key(config, size)
+        png = self._entries.get(key)
+        if png is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return png
+
+        async def load() -> bytes:
+            with self._lock:
+                if self.pending >= self.max_pending:
+                    self.rejected += 1
+                    raise PreviewBusy(self._retry_after())
+                self.pending += 1
+            # Counted down by the pool thread, so a caller that gives up doesn't free a slot still rendering
+            future = self._renderer.submit(self._load_or_render, key, config, size)
+            png, render_seconds = await asyncio.wrap_future(future)
+            if render_seconds is None:
+                self.disk_hits += 1
+            else:
+                self.renders += 1
+                self.render_seconds += render_seconds
+            self._remember(key, png)
+            return png
+
+        return await self._single_flight.run(key, load)
+
+    def _retry_after(self) -> float:
+        mean_render = self.render_seconds / self.renders if self.renders else 1.0
+        return mean_render * self.pending / max(1, self.workers)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def _load_or_render(self, key: str, config: Dict[str, Any], size: str) -> Tuple[bytes, Optional[float]]:
+        """PNG bytes from disk (render time None) or freshly rendered; runs on the render pool"""
+        try:
+            return self._read_or_render(key, config, size)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def _read_or_render(self, key: str, config: Dict[str, Any], size: str) -> Tuple[bytes, Optional[float]]:
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    png = f.read()
+                # Keeps recently served files from being pruned first
+                os.utime(path)
+                return png, None
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.disk_errors += 1
+                print(f"Error reading preview {key}: {e}")
+
+        from preview_renderer import render_png
+
+        started = time.perf_counter()
+        png = render_png(config, PREVIEW_SIZES[size])
+        render_seconds = time.perf_counter() - started
+        if self.directory:
+            self._write(key, png)
+        return png, render_seconds
+
+    def _write(self, key: str, png: bytes) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(png)
+            os.replace(tmp, path)
+        except OSError as e:
+            self.disk_errors += 1
+            print(f"Error writing preview {key}: {e}")
+            return
+
+        with self._disk_lock:
+            try:
+                if self.disk_bytes is None:
+                    self.disk_bytes = sum(size for _, size, _ in self._disk_files())
+                else:
+                    self.disk_bytes += len(png)
+                if self.disk_bytes > self.max_disk_bytes:
+                    self._prune_disk()
+            except OSError as e:
+                self.disk_errors += 1
+                print(f"Error pruning previews: {e}")
+
+    def _disk_files(self):
+        """(path, size, mtime) of every cached PNG in the directory"""
+        files = []
+        with os.scandir(self.directory) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith(".png"):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _prune_disk(self) -> None:
+        """Delete the least recently used files until the directory is back under budget"""
+        files = sorted(self._disk_files(), key=lambda file: file[2])
+        self.disk_bytes = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * DISK_PRUNE_TARGET
+        for path, size, _ in files:
+            if self.disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.disk_errors += 1
+                print(f"Error pruning preview {path}: {e}")
+                continue
+            self.disk_bytes -= size
+            self.disk_evictions += 1
+
+    def _remember(self, key: str, png: bytes) -> None:
+        if len(png) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = png
+        self.current_bytes += len(png)
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            _, oldest = self._entries.popitem(last=False)
+            self.current_bytes -= len(oldest)
+            self.evictions += 1
+
+    def close(self) -> None:
+        self._renderer.shutdown(wait=False, cancel_futures=True)
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.renders
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "renders": self.renders,
+            "coalesced": self._single_flight.coalesced,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "mean_render_ms": round(self.render_seconds / self.renders * 1000, 2) if self.renders else None,
+            "evictions": self.evictions,
+            "disk_bytes": self.disk_bytes,
+            "disk_evictions": self.disk_evictions,
+            "pending_renders": self.pending,
+            "rejected": self.rejected,
+            "disk_errors": self.disk_errors,
+            "directory": self.directory or None,
+        }
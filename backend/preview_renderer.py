@@ -0,0 +1,285 @@
+import math
+import struct
+import threading
+import zlib
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Wire spacing (in) per shelf style, mirroring WireShelf3D in the frontend
+WIRE_SPACING = {
+    "Industrial Grid": 1.5,
+    "Commercial Wire": 2.0,
+    "Heavy Duty Mesh": 1.2,
+    "Ventilated Wire": 1.0,
+    "Open Grid Pro": 2.5,
+}
+DEFAULT_WIRE_SPACING = 1.5
+
+FINISH_RGB = {
+    "Chrome": (226, 229, 233),
+    "Stainless Steel": (196, 201, 209),
+    # Lifted off pure black so it stays visible on the dark background
+    "Black Epoxy": (92, 94, 100),
+    "White Epoxy": (250, 251, 252),
+    "Zinc Plated": (184, 190, 170),
+}
+BACKGROUND_RGB = (26, 26, 26)
+CASTER_RGB = (70, 70, 70)
+
+DIVIDER_HEIGHT = 4.0
+CASTER_HEIGHT = 1.8
+
+# Fixed three-quarter view: yaw around the vertical axis, then pitch down
+VIEW_YAW = math.radians(-35)
+VIEW_PITCH = math.radians(22)
+
+# Rendered at this multiple of the output size, then box-filtered down for anti-aliasing
+SUPERSAMPLE = 2
+MARGIN = 0.06
+
+
+class Scene:
+    """Line segments (with a stroke width in output pixels) and translucent quads, in inches"""
+
+    def __init__(self):
+        self.segments: List[np.ndarray] = []
+        self.segment_styles: List[Tuple[Tuple[int, int, int], int]] = []
+        self.quads: List[Tuple[np.ndarray, Tuple[int, int, int], float]] = []
+
+    def lines(self, starts: np.ndarray, ends: np.ndarray, rgb: Tuple[int, int, int], width: int = 1) -> None:
+        segments = np.stack([np.atleast_2d(starts), np.atleast_2d(ends)], axis=1).astype(np.float64)
+        self.segments.append(segments)
+        self.segment_styles.extend([(rgb, width)] * len(segments))
+
+    def quad(self, corners, rgb: Tuple[int, int, int], alpha: float) -> None:
+        corners = np.asarray(corners, dtype=np.float64)
+        self.quads.append((corners, rgb, alpha))
+        self.lines(corners, np.roll(corners, -1, axis=0), rgb)
+
+
+def _box_corners(x: Tuple[float, float], y: Tuple[float, float], z: Tuple[float, float]) -> np.ndarray:
+    """The four corners of an axis-aligned rectangle; exactly one of the ranges is degenerate"""
+    if x[0] == x[1]:
+        return np.array([[x[0], y[0], z[0]], [x[0], y[1], z[0]], [x[0], y[1], z[1]], [x[0], y[0], z[1]]])
+    if y[0] == y[1]:
+        return np.array([[x[0], y[0], z[0]], [x[1], y[0], z[0]], [x[1], y[0], z[1]], [x[0], y[0], z[1]]])
+    return np.array([[x[0], y[0], z[0]], [x[1], y[0], z[0]], [x[1], y[1], z[0]], [x[0], y[1], z[0]]])
+
+
+def build_scene(config: Dict[str, Any]) -> Scene:
+    """Wireframe geometry of a canonical configuration (see shelf_schema.canonical_config)"""
+    width, length, height = config["width"], config["length"], config["post_height"]
+    shelves = config["number_of_shelves"]
+    rgb = FINISH_RGB.get(config["color_and_finish"], FINISH_RGB["Chrome"])
+    half_w, half_l = width / 2, length / 2
+    scene = Scene()
+
+    corners = np.array([[-half_w, -half_l], [half_w, -half_l], [-half_w, half_l], [half_w, half_l]])
+    base = CASTER_HEIGHT if config["type_of_posts"] == "Mobile" else 0.0
+    zeros = np.zeros(4)
+    scene.lines(np.column_stack([corners[:, 0], zeros + base, corners[:, 1]]),
+                np.column_stack([corners[:, 0], zeros + base + height, corners[:, 1]]), rgb, width=2)
+    if base:
+        scene.lines(np.column_stack([corners[:, 0], zeros, corners[:, 1]]),
+                    np.column_stack([corners[:, 0], zeros + base, corners[:, 1]]), CASTER_RGB, width=4)
+
+    spacing = WIRE_SPACING.get(config["shelf_style"], DEFAULT_WIRE_SPACING)
+    xs = np.linspace(-half_w, half_w, int(width // spacing) + 1)
+    zs = np.linspace(-half_l, half_l, int(length // spacing) + 1)
+    shelf_gap = height / (shelves + 1)
+    for level in range(shelves):
+        y = base + (level + 1) * shelf_gap
+        if level == 0 and config["solid_bottom_shelf"]:
+            scene.quad(_box_corners((-half_w, half_w), (y, y), (-half_l, half_l)), rgb, 0.55)
+            continue
+        scene.lines(np.column_stack([xs, np.full_like(xs, y), np.full_like(xs, -half_l)]),
+                    np.column_stack([xs, np.full_like(xs, y), np.full_like(xs, half_l)]), rgb)
+        scene.lines(np.column_stack([np.full_like(zs, -half_w), np.full_like(zs, y), zs]),
+                    np.column_stack([np.full_like(zs, half_w), np.full_like(zs, y), zs]), rgb)
+        if config["shelf_style"] == "Heavy Duty Mesh":
+            scene.lines(np.array([[-half_w, y, -half_l], [-half_w, y, half_l]]),
+                        np.array([[half_w, y, -half_l], [half_w, y, half_l]]), rgb, width=2)
+
+    # Frame supports between the shelves, front and back
+    levels = 3 if shelves > 4 else 2
+    top_frame = height - height / (shelves + 1)
+    frame_ys = base + top_frame / levels * np.arange(1, levels + 1)
+    for z in (-half_l, half_l):
+        scene.lines(np.column_stack([np.full(levels, -half_w), frame_ys, np.full(levels, z)]),
+                    np.column_stack([np.full(levels, half_w), frame_ys, np.full(levels, z)]), rgb, width=2)
+
+    dividers = config["shelf_dividers_count"]
+    if dividers:
+        gap = width / (dividers + 1)
+        for level in config["shelf_dividers_shelves"]:
+            y = base + level * shelf_gap
+            for d in range(1, dividers + 1):
+                x = -half_w + d * gap
+                scene.quad(_box_corners((x, x), (y, y + DIVIDER_HEIGHT), (-half_l * 0.9, half_l * 0.9)), rgb, 0.35)
+
+    enclosure = config["enclosure_type"]
+    panel_w, panel_l = (width + 1) / 2, (length + 1) / 2
+    if enclosure == "top":
+        top = base + height + 0.25
+        scene.quad(_box_corners((-panel_w, panel_w), (top, top), (-panel_l, panel_l)), rgb, 0.3)
+    elif enclosure == "sides":
+        scene.quad(_box_corners((-panel_w, panel_w), (base, base + height), (-panel_l, -panel_l)), rgb, 0.25)
+        for x in (-panel_w, panel_w):
+            scene.quad(_box_corners((x, x), (base, base + height), (-panel_l, panel_l)), rgb, 0.25)
+    return scene
+
+
+def _project(points: np.ndarray) -> np.ndarray:
+    """Orthographic view of (..., 3) points: screen x, screen y (down) and depth (larger is nearer)"""
+    x, y, z = points[..., 0], points[..., 1], points[..., 2]
+    cos_yaw, sin_yaw = math.cos(VIEW_YAW), math.sin(VIEW_YAW)
+    cos_pitch, sin_pitch = math.cos(VIEW_PITCH), math.sin(VIEW_PITCH)
+    xr = x * cos_yaw + z * sin_yaw
+    zr = -x * sin_yaw + z * cos_yaw
+    yr = y * cos_pitch - zr * sin_pitch
+    depth = y * sin_pitch + zr * cos_pitch
+    return np.stack([xr, -yr, depth], axis=-1)
+
+
+def _fill_quads(image: np.ndarray, quads, to_pixels) -> None:
+    """Alpha-blend convex quads, one horizontal span per pixel row"""
+    height, width, _ = image.shape
+    for corners, rgb, alpha in quads:
+        poly = to_pixels(_project(corners))[:, :2]
+        x0, y0 = np.floor(poly.min(axis=0)).astype(int).clip(0, (width - 1, height - 1))
+        x1, y1 = np.ceil(poly.max(axis=0)).astype(int).clip(0, (width - 1, height - 1))
+        rows = np.arange(y0, y1 + 1) + 0.5
+        left = np.full(rows.size, np.inf)
+        right = np.full(rows.size, -np.inf)
+        for (ax, ay), (bx, by) in zip(poly, np.roll(poly, -1, axis=0)):
+            if ay == by:
+                continue
+            t = (rows - ay) / (by - ay)
+            crossing = (t >= 0) & (t <= 1)
+            x = ax + t * (bx - ax)
+            left = np.where(crossing, np.minimum(left, x), left)
+            right = np.where(crossing, np.maximum(right, x), right)
+        columns = np.arange(x0, x1 + 1) + 0.5
+        inside = (columns >= left[:, None]) & (columns <= right[:, None])
+        # Blend the whole bounding box through per-channel lookup tables, then copy back the inside
+        blend = np.rint(np.arange(256)[:, None] * (1 - alpha) + np.array(rgb) * alpha).astype(np.uint8)
+        region = image[y0:y1 + 1, x0:x1 + 1]
+        blended = np.empty_like(region)
+        for channel in range(3):
+            np.take(blend[:, channel], region[..., channel], out=blended[..., channel])
+        np.copyto(region, blended, where=inside[..., None])
+
+
+def _draw_segments(image: np.ndarray, depth_buffer: np.ndarray, segments: np.ndarray, colors: np.ndarray,
+                   widths: np.ndarray, depth_range: Tuple[float, float]) -> None:
+    """Rasterize all segments at once; where strokes overlap the nearest one wins"""
+    height, width, _ = image.shape
+    p0, p1 = segments[:, 0], segments[:, 1]
+    counts = np.ceil(np.abs(p1[:, :2] - p0[:, :2]).max(axis=1)).astype(np.int64) + 1
+    owner = np.repeat(np.arange(len(segments)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    t = ((np.arange(owner.size) - starts) / np.maximum(counts - 1, 1)[owner])[:, None]
+    points = p0[owner] + t * (p1 - p0)[owner]
+
+    low, high = depth_range
+    nearness = ((points[:, 2] - low) / max(high - low, 1e-9)).astype(np.float32)
+    center = points[:, 1].astype(np.int64).clip(0, height - 1) * width + points[:, 0].astype(np.int64).clip(0, width - 1)
+
+    # Thicker strokes: offset each sample's pixel index over a square footprint
+    # (MARGIN keeps the drawing far enough from the edges that footprints don't wrap)
+    pixels, owners, nearnesses = [], [], []
+    for stroke in np.unique(widths):
+        mask = widths[owner] == stroke
+        offsets = np.arange(stroke) - stroke // 2
+        kernel = (offsets[:, None] * width + offsets[None, :]).ravel()
+        pixels.append((center[mask, None] + kernel).ravel())
+        owners.append(np.repeat(owner[mask], kernel.size))
+        nearnesses.append(np.repeat(nearness[mask], kernel.size))
+    pixel = np.concatenate(pixels).clip(0, height * width - 1)
+    owners = np.concatenate(owners)
+    nearness = np.concatenate(nearnesses)
+
+    # Z-buffer: per pixel, only the nearest sample is drawn
+    depth_buffer[:] = -1
+    np.maximum.at(depth_buffer, pixel, nearness)
+    front = nearness == depth_buffer[pixel]
+    pixel, owners, nearness = pixel[front], owners[front], nearness[front]
+
+    # Depth cue: far strokes are dimmed towards the background
+    shade = (0.55 + 0.45 * nearness)[:, None]
+    background = np.array(BACKGROUND_RGB, dtype=np.float32)
+    image.reshape(-1, 3)[pixel] = background + (colors[owners] - background) * shade
+
+
+_scratch = threading.local()
+
+
+def _buffers(width: int, height: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-thread image, blank background and depth buffers, reused across renders of the same size.
+
+    Fresh multi-megabyte arrays cost more in page faults than the drawing
+    itself, so each render thread keeps one set per image size. Copying the
+    blank background is a memcpy, far cheaper than broadcasting the colour.
+    """
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    if (width, height) not in buffers:
+        blank = np.empty((height, width, 3), dtype=np.uint8)
+        blank[:] = BACKGROUND_RGB
+        buffers[width, height] = (np.empty_like(blank), blank, np.empty(height * width, dtype=np.float32))
+    return buffers[width, height]
+
+
+def render(config: Dict[str, Any], size: Tuple[int, int]) -> np.ndarray:
+    """RGB uint8 image of shape (height, width, 3)"""
+    scene = build_scene(config)
+    out_w, out_h = size
+    width, height = out_w * SUPERSAMPLE, out_h * SUPERSAMPLE
+    segments = _project(np.concatenate(scene.segments))
+
+    flat = segments.reshape(-1, 3)
+    low, high = flat.min(axis=0), flat.max(axis=0)
+    span = np.maximum(high[:2] - low[:2], 1e-9)
+    scale = min(width * (1 - 2 * MARGIN) / span[0], height * (1 - 2 * MARGIN) / span[1])
+    offset = np.array([width, height]) / 2 - (low[:2] + high[:2]) / 2 * scale
+
+    def to_pixels(points: np.ndarray) -> np.ndarray:
+        pixels = points.copy()
+        pixels[..., :2] = points[..., :2] * scale + offset
+        return pixels
+
+    image, blank, depth_buffer = _buffers(width, height)
+    np.copyto(image, blank)
+    _fill_quads(image, scene.quads, to_pixels)
+    colors = np.array([rgb for rgb, _ in scene.segment_styles], dtype=np.float32)
+    widths = np.array([stroke * SUPERSAMPLE for _, stroke in scene.segment_styles])
+    _draw_segments(image, depth_buffer, to_pixels(segments), colors, widths, (low[2], high[2]))
+
+    # Box filter: add up the rows of each block, then the columns
+    rows = image[0::SUPERSAMPLE].astype(np.uint16)
+    for dy in range(1, SUPERSAMPLE):
+        rows += image[dy::SUPERSAMPLE]
+    filtered = rows[:, 0::SUPERSAMPLE]
+    for dx in range(1, SUPERSAMPLE):
+        filtered += rows[:, dx::SUPERSAMPLE]
+    return ((filtered + SUPERSAMPLE ** 2 // 2) // SUPERSAMPLE ** 2).astype(np.uint8)
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+
+def encode_png(pixels: np.ndarray, level: int = 6) -> bytes:
+    """8-bit RGB PNG, every scanline with filter type 0"""
+    height, width, _ = pixels.shape
+    raw = np.zeros((height, 1 + width * 3), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(height, -1)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), level)) + _png_chunk(b"IEND", b""))
+
+
+def render_png(config: Dict[str, Any], size: Tuple[int, int]) -> bytes:
+    return encode_png(render(config, size))
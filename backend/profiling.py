@@ -0,0 +1,282 @@
+import asyncio
+import contextvars
+import hashlib
+import heapq
+import hmac
+import io
+import itertools
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import metrics
+
+# Request profiling settings (off unless a rate is set or a request asks for it)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER_ENABLED = os.environ.get("PROFILE_HEADER_ENABLED", "false").lower() == "true"
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20"))
+# A request carrying this header set to 1 is profiled
+PROFILE_HEADER = "x-profile"
+
+# Bearer token for the /api/admin routes; empty leaves them disabled
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# Event-loop lag monitor settings
+LOOP_MONITOR_ENABLED = os.environ.get("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", "0.05"))
+LOOP_LAG_THRESHOLD = float(os.environ.get("LOOP_LAG_THRESHOLD", "0.1"))
+LOOP_LAG_KEEP = int(os.environ.get("LOOP_LAG_KEEP", "100"))
+
+# Innermost frames kept from the stack of a blocked loop
+STACK_DEPTH = 12
+
+# Request being served in this context; child tasks (wait_for, gather, ...) inherit it
+current_request: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_request", default=None)
+
+
+def session_tag(session_id: str) -> str:
+    """Stand-in for a session id in profile and stall labels, which admin users can read"""
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:12]
+
+
+def admin_authorized(authorization: Optional[str], token: str = ADMIN_TOKEN) -> bool:
+    """Whether an Authorization header carries the admin bearer token"""
+    if not token or not authorization:
+        return False
+    scheme, _, credentials = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), token.encode())
+
+
+class RequestProfile:
+    """A finished cProfile capture of one request"""
+
+    def __init__(self, profile_id: int, label: str, seconds: float, profiler: Any):
+        self.id = profile_id
+        self.label = label
+        self.seconds = seconds
+        self.captured_at = time.time()
+        self.profiler = profiler
+
+    def summary(self) -> Dict[str, Any]:
+        return {"id": self.id, "label": self.label, "ms": round(self.seconds * 1000, 2),
+                "captured_at": self.captured_at}
+
+    def pstats_bytes(self) -> bytes:
+        """The profile in the format pstats.Stats(path) and snakeviz load"""
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+    def text(self, limit: int = 40) -> str:
+        import pstats
+
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+
+class RequestProfiler:
+    """cProfile capture for sampled or explicitly requested requests, keeping the slowest ``keep``.
+
+    Only one request is profiled at a time (the interpreter has one
+    profiler hook per thread); requests selected while another is being
+    profiled run unprofiled and are counted as busy. cProfile sees every
+    coroutine the loop runs while the request is in flight, so a profile
+    also shows neighbours that held the loop.
+    """
+
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, keep: int = PROFILE_KEEP,
+                 header_enabled: bool = PROFILE_HEADER_ENABLED):
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.header_enabled = header_enabled
+        self._slowest: List[tuple] = []  # min-heap of (seconds, id, profile)
+        self._ids = itertools.count(1)
+        self._active = False
+        self.profiled = 0
+        self.busy = 0
+
+    def wanted(self, header: Optional[str]) -> bool:
+        if self.header_enabled and header == "1":
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def capture(self, label: str, header: Optional[str] = None) -> Iterator[None]:
+        """Profile the body if this request is selected; otherwise just run it"""
+        if not self.wanted(header):
+            yield
+            return
+        if self._active:
+            self.busy += 1
+            yield
+            return
+
+        # Imported on first use so importing the app stays fast
+        import cProfile
+
+        self._active = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._active = False
+            self._remember(RequestProfile(next(self._ids), label, time.perf_counter() - started, profiler))
+
+    def _remember(self, profile: RequestProfile) -> None:
+        self.profiled += 1
+        entry = (profile.seconds, profile.id, profile)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, entry)
+        elif profile.seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        return next((profile for _, pid, profile in self._slowest if pid == profile_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "header_enabled": self.header_enabled,
+            "profiled": self.profiled,
+            "busy": self.busy,
+            "slowest": [profile.summary() for _, _, profile in sorted(self._slowest, reverse=True)],
+        }
+
+
+class LoopMonitor:
+    """How late the event loop runs timers, and what it was doing when it was blocked.
+
+    A ticker task sleeps ``interval`` seconds and records how late it woke
+    up. A watchdog thread notices when the ticker is more than
+    ``threshold`` overdue while the loop is still stuck, and snapshots the
+    loop thread's stack and the request whose task was running. Stalls
+    past the threshold are kept in a bounded list with that snapshot.
+
+    The watchdog can't read another task's context, so a task factory
+    records the request label of every task created while one is set.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_LAG_THRESHOLD,
+                 keep: int = LOOP_LAG_KEEP):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque = deque(maxlen=keep)
+        self.stall_count = 0
+        self.ticks = 0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        # Request label of each running task created on behalf of one
+        self._requests: Dict[asyncio.Future, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._beat: Optional[float] = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._inner_factory = None
+        self._stopped = threading.Event()
+
+    @contextmanager
+    def track(self, label: str) -> Iterator[None]:
+        """Attribute loop stalls during the body (and in tasks it starts) to this request"""
+        token = current_request.set(label)
+        task = asyncio.current_task()
+        outer = self._requests.get(task)
+        self._requests[task] = label
+        try:
+            yield
+        finally:
+            if outer is None:
+                self._requests.pop(task, None)
+            else:
+                self._requests[task] = outer
+            current_request.reset(token)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._inner_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory(self._inner_factory))
+        self._ticker = asyncio.create_task(self._tick())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def _task_factory(self, inner):
+        def factory(loop, coro, **kwargs):
+            task = inner(loop, coro, **kwargs) if inner is not None else asyncio.Task(coro, loop=loop, **kwargs)
+            label = current_request.get()
+            if label is not None:
+                self._requests[task] = label
+                task.add_done_callback(self._forget)
+            return task
+        return factory
+
+    def _forget(self, task: asyncio.Future) -> None:
+        self._requests.pop(task, None)
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._loop is not None:
+            self._loop.set_task_factory(self._inner_factory)
+        if self._ticker is not None:
+            self._ticker.cancel()
+            await asyncio.gather(self._ticker, return_exceptions=True)
+            self._ticker = None
+
+    async def _tick(self) -> None:
+        while True:
+            beat = self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - beat - self.interval)
+            self.ticks += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            metrics.LOOP_LAG_SECONDS.observe(lag)
+            if lag >= self.threshold:
+                snapshot = self._snapshot if self._snapshot is not None and self._snapshot["beat"] == beat else {}
+                self.stall_count += 1
+                self.stalls.append({
+                    "at": time.time(),
+                    "blocked_ms": round(lag * 1000, 1),
+                    "request": snapshot.get("request"),
+                    "task": snapshot.get("task"),
+                    "stack": snapshot.get("stack"),
+                })
+
+    def _watch(self) -> None:
+        """Watchdog thread: snapshot the loop while it is still blocked"""
+        while not self._stopped.wait(self.interval / 2):
+            beat = self._beat
+            if beat is None or time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            if self._snapshot is not None and self._snapshot["beat"] == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            task = asyncio.current_task(self._loop)
+            self._snapshot = {
+                "beat": beat,
+                "request": self._requests.get(task),
+                "task": task.get_name() if task is not None else None,
+                "stack": traceback.format_stack(frame)[-STACK_DEPTH:] if frame is not None else None,
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._ticker is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "ticks": self.ticks,
+            "mean_lag_ms": round(self.total_lag / self.ticks * 1000, 3) if self.ticks else None,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stall_count,
+            "recent_stalls": list(self.stalls),
+        }
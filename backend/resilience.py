@@ -0,0 +1,251 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from cerebras.cloud.sdk import APIConnectionError, InternalServerError, RateLimitError
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, stop_after_delay, wait_random_exponential
+
+from admission import AdmissionController
+
+# Resilience settings for upstream calls
+LLM_DEADLINE = float(os.environ.get("LLM_DEADLINE", "45"))
+LLM_MAX_ATTEMPTS = int(os.environ.get("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.25"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "4"))
+LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_DELAY = float(os.environ.get("LLM_HEDGE_DELAY", "3"))  # used until enough samples exist
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.environ.get("LLM_BREAKER_RESET", "30"))
+
+RETRYABLE_ERRORS = (APIConnectionError, InternalServerError, RateLimitError, asyncio.TimeoutError)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the provider is considered down"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Upstream provider unavailable (circuit open)")
+        self.retry_after = retry_after
+
+
+async def within_deadline(items: AsyncIterator[Any], deadline_at: float) -> AsyncIterator[Any]:
+    """Re-yield ``items`` until they end; asyncio.TimeoutError once the monotonic ``deadline_at`` passes.
+
+    Unlike a per-read timeout, this also stops a stream that keeps
+    trickling tokens.
+    """
+    while True:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("Upstream deadline exceeded")
+        try:
+            item = await asyncio.wait_for(items.__anext__(), remaining)
+        except StopAsyncIteration:
+            return
+        yield item
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Connection problems, timeouts, 429 and 5xx are worth another attempt"""
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                raise CircuitOpenError(1.0)
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """A call ended without a verdict on provider health (cancelled, client error); the next call may probe"""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class ResilientCaller:
+    """Deadline, jittered retries, optional hedging and a circuit breaker around upstream calls.
+
+    ``attempt`` is a factory that starts one upstream call and accepts the
+    per-attempt timeout in seconds. Callers admit the first attempt
+    themselves; a hedge is only sent if ``admission`` has a free slot (and
+    rate token) right now, so hedging never exceeds its limits.
+    """
+
+    def __init__(self, deadline: float = LLM_DEADLINE, max_attempts: int = LLM_MAX_ATTEMPTS,
+                 base_delay: float = LLM_RETRY_BASE_DELAY, max_delay: float = LLM_RETRY_MAX_DELAY,
+                 hedge: bool = LLM_HEDGE_ENABLED, hedge_delay: float = LLM_HEDGE_DELAY,
+                 breaker: Optional[CircuitBreaker] = None, admission: Optional[AdmissionController] = None):
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.default_hedge_delay = hedge_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.admission = admission
+        self.latencies: deque = deque(maxlen=500)
+        self.counts: Dict[str, int] = {"calls": 0, "retries": 0, "hedges": 0, "hedges_skipped": 0,
+                                       "hedge_wins": 0, "failures": 0, "short_circuited": 0}
+
+    def hedge_delay(self) -> float:
+        """p95 of recent successful attempts, or the configured default"""
+        if len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return self.default_hedge_delay
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def call(self, attempt: Callable[[float], Awaitable[Any]]) -> Any:
+        self.counts["calls"] += 1
+        deadline_at = time.monotonic() + self.deadline
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts) | stop_after_delay(self.deadline),
+            wait=wait_random_exponential(multiplier=self.base_delay, max=self.max_delay),
+            retry=retry_if_exception(is_retryable),
+            reraise=True,
+        )
+        try:
+            async for attempt_context in retrying:
+                with attempt_context:
+                    if attempt_context.retry_state.attempt_number > 1:
+                        self.counts["retries"] += 1
+                    remaining = deadline_at - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError("Upstream deadline exceeded")
+                    return await self._guarded(attempt, remaining)
+        except CircuitOpenError:
+            self.counts["short_circuited"] += 1
+            raise
+        except Exception:
+            self.counts["failures"] += 1
+            raise
+
+    async def _guarded(self, attempt: Callable[[float], Awaitable[Any]], timeout: float) -> Any:
+        self.breaker.before_call()
+        started = time.monotonic()
+        try:
+            if self.hedge:
+                result = await self._hedged(attempt, timeout)
+            else:
+                result = await asyncio.wait_for(attempt(timeout), timeout)
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                # Client-side errors say nothing about provider health
+                self.breaker.release_probe()
+            raise
+        except BaseException:
+            # Cancelled (client gone, batch cancelled) before an outcome
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        self.latencies.append(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, attempt: Callable[[float], Awaitable[Any]], timeout: float) -> Any:
+        """Start a second request if the first is slower than p95; first reply wins"""
+        started = time.monotonic()
+        primary = asyncio.ensure_future(attempt(timeout))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=min(self.hedge_delay(), timeout))
+            if not done:
+                remaining = timeout - (time.monotonic() - started)
+                release = await self.admission.try_admit() if self.admission is not None else None
+                if self.admission is not None and release is None:
+                    # No spare capacity: keep waiting on the first request alone
+                    self.counts["hedges_skipped"] += 1
+                    done, _ = await asyncio.wait(tasks, timeout=remaining)
+                    if not done:
+                        raise asyncio.TimeoutError("Upstream deadline exceeded")
+                    return primary.result()
+                self.counts["hedges"] += 1
+                hedge = asyncio.ensure_future(attempt(remaining))
+                if release is not None:
+                    hedge.add_done_callback(lambda _: release())
+                tasks.add(hedge)
+                done, _ = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError("Upstream deadline exceeded")
+                # If the first finisher failed, give the other one the rest of the time
+                winner = next(iter(done))
+                if winner.exception() is not None and len(tasks) > len(done):
+                    pending = tasks - done
+                    more, _ = await asyncio.wait(pending, timeout=timeout - (time.monotonic() - started))
+                    successes = [t for t in more if t.exception() is None]
+                    if successes:
+                        winner = successes[0]
+                if winner is not primary and winner.exception() is None:
+                    self.counts["hedge_wins"] += 1
+                return winner.result()
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Breaker check and bookkeeping for calls that can't be retried, e.g. streams"""
+        self.counts["calls"] += 1
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.counts["short_circuited"] += 1
+            raise
+        try:
+            yield
+        except Exception as e:
+            self.counts["failures"] += 1
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_probe()
+            raise
+        except BaseException:
+            # Cancelled, or the stream was closed (GeneratorExit) before it finished
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counts,
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            "hedge_delay": self.hedge_delay() if self.hedge else None,
+        }
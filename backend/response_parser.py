@@ -0,0 +1,147 @@
+import json
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from shelf_schema import FRONTEND_KEYS, REPLY_KEY
+
+FENCE_OPEN = "```json"
+FENCE_CLOSE = "```"
+ENTITIES_KEY = '"extracted_entities"'
+
+# Fields that are kept when falsy (but not null)
+KEEP_FALSY_FIELDS = {"solid_bottom_shelf"}
+
+# How far back from the entities key to look for the enclosing object
+MAX_OBJECT_START_CANDIDATES = 16
+
+_decoder = json.JSONDecoder()
+
+# Natural-language fallback patterns, compiled once
+_UNIT = r'(?:inch|inches|in|"|′)?'
+_NL_PATTERNS = (
+    ("width", re.compile(rf"(\d+)\s*{_UNIT}\s*(?:wide|width)")),
+    ("length", re.compile(rf"(\d+)\s*{_UNIT}\s*(?:long|length|deep|depth)")),
+    ("postHeight", re.compile(rf"(\d+)\s*{_UNIT}\s*(?:tall|high|height)")),
+    ("numberOfShelves", re.compile(r"(\d+)\s*(?:shelf|shelves|level|levels|tier|tiers)")),
+)
+
+
+class ParsedResponse(NamedTuple):
+    clean: str
+    entities: Dict[str, Any]
+    has_sufficient: bool
+    next_questions: List[str]
+    # "structured", "fenced", "fallback" or "natural_language"
+    path: str
+
+
+def format_entities(extracted_entities: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert model entity names to the format expected by the frontend"""
+    formatted = {}
+    for field, key in FRONTEND_KEYS.items():
+        value = extracted_entities.get(field)
+        if value or (field in KEEP_FALSY_FIELDS and value is not None):
+            formatted[key] = value
+    return formatted
+
+
+def extract_from_natural_language(text: str) -> Dict[str, Any]:
+    """Extract entities from natural language as fallback"""
+    entities = {}
+    text_lower = text.lower()
+    for key, pattern in _NL_PATTERNS:
+        match = pattern.search(text_lower)
+        if match:
+            entities[key] = int(match.group(1))
+    return entities
+
+
+def _find_bare_object(response: str, start: int, end: int) -> Optional[Tuple[int, int, Any]]:
+    """Locate a JSON object containing the entities key inside response[start:end]"""
+    key_at = response.find(ENTITIES_KEY, start, end)
+    if key_at == -1:
+        return None
+    brace = key_at
+    for _ in range(MAX_OBJECT_START_CANDIDATES):
+        brace = response.rfind("{", start, brace)
+        if brace == -1:
+            return None
+        try:
+            data, obj_end = _decoder.raw_decode(response, brace)
+        except ValueError:
+            continue
+        if key_at < obj_end <= end and isinstance(data, dict):
+            return brace, obj_end, data
+    return None
+
+
+def split_response(response: str) -> Tuple[str, Optional[Dict[str, Any]], str]:
+    """One scan over the reply: strip entity JSON and decode the first valid block.
+
+    Returns (clean prose, decoded JSON or None, path). Structured-output
+    replies (one JSON object with the prose under "reply") are decoded
+    directly. Otherwise fenced ```json blocks are tried first, preferring
+    one with "extracted_entities"; failing that, a bare object holding that
+    key is decoded with a real JSON decoder, so nested objects are fine.
+    """
+    stripped = response.strip()
+    if stripped.startswith("{"):
+        try:
+            data = json.loads(stripped)
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and isinstance(data.get(REPLY_KEY), str):
+            return data[REPLY_KEY].strip(), data, "structured"
+
+    segments = []
+    data = None
+    path = "natural_language"
+    position = 0
+
+    start = response.find(FENCE_OPEN)
+    while start != -1:
+        end = response.find(FENCE_CLOSE, start + len(FENCE_OPEN))
+        if end == -1:
+            break
+        segments.append((position, start))
+        # Prefer the block that actually carries the entities
+        if data is None or "extracted_entities" not in data:
+            body = response[start + len(FENCE_OPEN):end].strip()
+            try:
+                decoded = json.loads(body)
+            except ValueError:
+                decoded = None
+            if isinstance(decoded, dict) and (data is None or "extracted_entities" in decoded):
+                data, path = decoded, "fenced"
+        position = end + len(FENCE_CLOSE)
+        start = response.find(FENCE_OPEN, position)
+    segments.append((position, len(response)))
+
+    # Bare entity objects left in the prose are stripped too
+    prose = []
+    for seg_start, seg_end in segments:
+        found = _find_bare_object(response, seg_start, seg_end)
+        while found is not None:
+            obj_start, obj_end, decoded = found
+            prose.append(response[seg_start:obj_start])
+            if data is None:
+                data, path = decoded, "fallback"
+            seg_start = obj_end
+            found = _find_bare_object(response, seg_start, seg_end)
+        prose.append(response[seg_start:seg_end])
+
+    return "".join(prose).strip(), data, path
+
+
+def parse_response(response: str) -> ParsedResponse:
+    """Clean prose and formatted entities from an AI reply in a single pass"""
+    clean, data, path = split_response(response)
+    if data is None:
+        return ParsedResponse(clean, extract_from_natural_language(response), False, [], path)
+    return ParsedResponse(
+        clean,
+        format_entities(data.get("extracted_entities") or {}),
+        data.get("has_sufficient_entities", False),
+        data.get("next_questions", []),
+        path,
+    )
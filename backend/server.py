@@ -1,166 +1,59 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, AsyncIterator
+import gzip
 import json
-import re
+import math
 import uuid
 import os
-from cerebras.cloud.sdk import Cerebras
+import time
 from dotenv import load_dotenv
 import asyncio
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Cerebras client
-cerebras_client = Cerebras(
-    api_key=os.environ.get("CEREBRAS_API_KEY")
-)
-
-# System prompt for the AI agent
-SYSTEM_PROMPT = """You are a professional wire shelf designer assistant working for a premium shelving company. Your role is to engage customers in natural, friendly conversation to understand their wire shelf requirements and extract key entities needed for design.
-
-You should behave like an experienced designer talking to a customer, asking clarifying questions and providing helpful suggestions. Always maintain a professional yet approachable tone.
-
-WIRE SHELF CONFIGURATION SCHEMA:
-{
-  "size_and_capacity": {
-    "width": {
-      "value": null,
-      "unit": "inches",
-      "description": "Width of the shelf unit",
-      "required": true
-    },
-    "length": {
-      "value": null,
-      "unit": "inches",
-      "description": "Depth/Length of the shelf unit",
-      "required": true
-    },
-    "post_height": {
-      "value": null,
-      "unit": "inches",
-      "description": "Height of the posts (related to number of shelves)",
-      "required": true
-    },
-    "number_of_shelves": {
-      "value": null,
-      "unit": "count",
-      "description": "Number of shelf levels (related to post height)",
-      "required": true
-    }
-  },
-  "styles_and_finishes": {
-    "shelf_style": {
-      "value": null,
-      "options": ["Industrial Grid", "Commercial Wire", "Heavy Duty Mesh", "Ventilated Wire", "Open Grid Pro"],
-      "description": "Style of the wire shelving",
-      "required": false
-    },
-    "solid_bottom_shelf": {
-      "value": false,
-      "type": "boolean",
-      "description": "Whether to include a solid bottom shelf",
-      "required": false
-    },
-    "color_and_finish": {
-      "value": null,
-      "options": ["Chrome", "Stainless Steel", "Black Epoxy", "White Epoxy", "Zinc Plated"],
-      "description": "Color and finish of the shelving",
-      "required": false
-    },
-    "type_of_posts": {
-      "value": null,
-      "options": ["Stationary", "Mobile"],
-      "description": "Whether posts are stationary or mobile",
-      "required": false
-    }
-  },
-  "accessories": {
-    "shelf_dividers": {
-      "number_of_dividers": {
-        "value": null,
-        "type": "integer",
-        "description": "Number of dividers per shelf (creates sections)",
-        "required": false
-      },
-      "shelves_to_apply_this_to": {
-        "value": null,
-        "type": "array",
-        "description": "Which shelf levels to add dividers to (e.g., [1, 2, 3] for top 3 shelves)",
-        "required": false
-      }
-    },
-    "enclosure_panels": {
-      "enclosure_type": {
-        "value": null,
-        "options": ["none", "top", "sides"],
-        "description": "Type of enclosure panels - 'top' adds panel at top, 'sides' adds panels to three sides",
-        "required": false
-      }
-    }
-  }
-}
-
-IMPORTANT RULES:
-1. The "size_and_capacity" entities (width, length, post_height, number_of_shelves) are ESSENTIAL. The 3D model can only be built when ALL 4 essential entities are collected.
-2. The "styles_and_finishes" entities are OPTIONAL and can be configured later.
-3. Always ask clarifying questions naturally, like a designer would.
-4. If a user provides partial information, acknowledge what they've given and ask for the missing essential details.
-5. Provide helpful suggestions based on common use cases (garage storage, pantry, office, etc.).
-6. ALWAYS respond with your natural conversation followed by a JSON object.
-
-RESPONSE FORMAT:
-Your response should ALWAYS end with a JSON object in this exact format:
-```json
-{
-  "extracted_entities": {
-    "width": value_or_null,
-    "length": value_or_null,
-    "post_height": value_or_null,
-    "number_of_shelves": value_or_null,
-    "shelf_style": value_or_null,
-    "solid_bottom_shelf": boolean_or_null,
-    "color_and_finish": value_or_null,
-    "type_of_posts": value_or_null,
-    "shelf_dividers_count": value_or_null,
-    "shelf_dividers_shelves": array_or_null,
-    "enclosure_type": value_or_null
-  },
-  "has_sufficient_entities": boolean,
-  "next_questions": [array_of_follow_up_questions]
-}
-```
-
-Example conversation:
-User: "I need a shelf for my garage"
-Assistant: "Great! A garage shelf is a popular choice. To design the perfect shelving unit for your garage, I'll need to understand your space and storage needs.
-
-Could you tell me:
-- How wide should the shelf be? (in inches)
-- How deep do you need it? (in inches)
-- How tall should it be?
-- How many shelf levels would work best for your storage?
-
-What are you planning to store on it? That can help me recommend the right dimensions and style."
-
-```json
-{
-  "extracted_entities": {
-    "width": null,
-    "length": null,
-    "post_height": null,
-    "number_of_shelves": null,
-    "shelf_style": null,
-    "solid_bottom_shelf": null,
-    "color_and_finish": null,
-    "type_of_posts": null
-  },
-  "has_sufficient_entities": false,
-  "next_questions": ["What width do you need?", "How deep should it be?", "What height works for your space?", "How many shelf levels do you want?"]
-}
-```"""
+from llm import build_cerebras_client, warm_up_client, create_completion, stream_completion, close_client, rate_limit_retry_after
+from admission import AdmissionController, AdmissionRejected
+from resilience import ResilientCaller, CircuitOpenError, within_deadline
+from stream_parser import ResponseStreamSplitter, StructuredReplySplitter
+from shelf_schema import build_system_prompt, canonical_config, response_format, valid_entities
+from completion_cache import build_completion_cache, make_cache_key
+from session_store import ShelfEntities, Turn, build_session_store
+from context_builder import build_context
+from fast_path import fast_path_turn
+from intent_index import load_intent_index, opening_turn
+from catalog import load_catalog
+from preview_cache import PREVIEW_SIZES, DEFAULT_SIZE, PreviewBusy, PreviewCache, preview_key
+from model_router import LARGE_MODEL, RouteDecision, choose_route, escalation_reason
+from single_flight import SingleFlight
+from profiling import (ADMIN_TOKEN, PROFILE_HEADER, LOOP_MONITOR_ENABLED, LoopMonitor, RequestProfiler,
+                       admin_authorized, session_tag)
+from batch import BATCH_MAX_CONCURRENCY, BATCH_MAX_JOBS, BATCH_MAX_MESSAGES, run_batch
+from response_parser import parse_response, split_response
+from ws_channel import ChatConnection, ConnectionRegistry, CLOSE_IDLE
+import metrics
+
+# Cerebras client (async, with a shared keep-alive connection pool), built on first use
+cerebras_client = None
+
+def llm_client():
+    """The upstream client, created lazily so importing the app stays fast"""
+    global cerebras_client
+    if cerebras_client is None:
+        cerebras_client = build_cerebras_client()
+    return cerebras_client
+
+# Deterministic completion cache (COMPLETION_CACHE_BACKEND=memory|redis|none)
+completion_cache = build_completion_cache()
+
+# Entities come back through the provider's JSON-schema mode instead of a fenced block in free text
+STRUCTURED_OUTPUT = os.environ.get("STRUCTURED_OUTPUT", "true").lower() == "true"
+
+# System prompt for the AI agent, generated from the shelf schema (byte-stable for prefix caching)
+SYSTEM_PROMPT = build_system_prompt(STRUCTURED_OUTPUT)
 
 app = FastAPI()
 
@@ -173,19 +66,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage for chat sessions
-chat_sessions = {}
-chat_histories = {}
+# Chat session storage (SESSION_BACKEND=memory for one worker, redis to share across workers)
+session_store = build_session_store()
 
 class ChatMessage(BaseModel):
     message: str
     session_id: str
+    # State version the client last applied; the reply then carries only what changed since
+    known_version: Optional[int] = None
+
+class BatchJob(BaseModel):
+    # Omitted: each job gets a fresh session
+    session_id: Optional[str] = None
+    messages: List[str] = Field(min_length=1, max_length=BATCH_MAX_MESSAGES)
+
+class BatchRequest(BaseModel):
+    jobs: List[BatchJob] = Field(min_length=1, max_length=BATCH_MAX_JOBS)
+    concurrency: int = Field(BATCH_MAX_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY)
 
 class ChatResponse(BaseModel):
     response: str
     extracted_entities: Dict[str, Any]
     has_sufficient_entities: bool
     next_questions: List[str]
+    prompt_tokens: Optional[int] = None
+    # Canonical session state: its version and the (frontend-keyed) fields changed since known_version
+    state_version: int = 0
+    changes: Dict[str, Any] = {}
+    # Stocked sizes, bill of materials and price once the session's configuration is complete
+    quote: Optional[Dict[str, Any]] = None
+
+# Set once startup has finished, cleared again when shutdown begins
+app_ready = False
+started_at = time.monotonic()
+
+# Longest a readiness probe waits on the session store
+READINESS_TIMEOUT = float(os.environ.get("READINESS_TIMEOUT", "1"))
+
+@app.on_event("startup")
+async def startup_event():
+    global app_ready
+    global intent_index
+    global catalog
+    replayed = await session_store.start()
+    if replayed is not None:
+        print(f"Restored sessions from journal: {replayed}")
+    intent_index = load_intent_index()
+    catalog = load_catalog()
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    # Connect to the provider in the background; readiness doesn't wait on it
+    app.state.warm_up = asyncio.create_task(warm_up_client(llm_client()))
+    app_ready = True
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global app_ready
+    app_ready = False
+    await loop_monitor.stop()
+    await close_client(cerebras_client)
+    if completion_cache is not None:
+        await completion_cache.close()
+    await session_store.close()
+    preview_cache.close()
 
 @app.get("/")
 async def root():
@@ -195,180 +138,636 @@ async def root():
 async def api_root():
     return {"message": "Wire Shelves 3D Configurator API"}
 
+@app.get("/api/health/live")
+async def liveness():
+    """The process is up and its event loop is answering"""
+    return {"status": "alive", "uptime": round(time.monotonic() - started_at, 3)}
+
+@app.get("/api/health/ready")
+async def readiness():
+    """Whether to route traffic here: startup finished and the session store answers"""
+    if not app_ready:
+        raise HTTPException(status_code=503, detail="Not ready: starting or shutting down")
+    try:
+        await asyncio.wait_for(session_store.ping(), READINESS_TIMEOUT)
+    except Exception as e:
+        print(f"Error in readiness check: {str(e)}")
+        raise HTTPException(status_code=503, detail="Not ready: session store unavailable")
+    return {"status": "ready", "llm_circuit": llm_resilience.breaker.state}
+
+# Answer fully specified messages from a template without calling the model
+FAST_PATH_ENABLED = os.environ.get("FAST_PATH_ENABLED", "true").lower() == "true"
+
+# Stored replies for common opening messages, built at startup (INTENT_INDEX_ENABLED, INTENT_CORPUS)
+intent_index = None
+
+# SKU catalog for snapping configurations to stocked sizes and pricing them, loaded at startup (CATALOG_PATH)
+catalog = None
+
+# Concurrency/rate limits and a bounded wait queue in front of every upstream call
+llm_admission = AdmissionController()
+
+# Deadline, retries with jitter, optional hedging (within the admission limits) and a circuit breaker
+llm_resilience = ResilientCaller(admission=llm_admission)
+
+# History responses at least this large are gzipped for clients that accept it
+HISTORY_GZIP_MIN_BYTES = int(os.environ.get("HISTORY_GZIP_MIN_BYTES", "1024"))
+
+# Live WebSocket conversation channels, one per session
+ws_connections = ConnectionRegistry()
+
+# Rendered configuration previews, in memory and optionally on disk (PREVIEW_CACHE_DIR)
+preview_cache = PreviewCache()
+
+# Previews are content-addressed, so browsers and CDNs may keep them indefinitely
+PREVIEW_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Opt-in cProfile captures of /api/chat requests (PROFILE_SAMPLE_RATE or an X-Profile: 1 header)
+request_profiler = RequestProfiler()
+
+# Event-loop lag, and the stack and request behind each stall
+loop_monitor = LoopMonitor()
+
+# Identical submits for a session share one in-flight turn (double-clicks, retries)
+chat_single_flight = SingleFlight()
+
+# How each turn was answered: local fast path, opening-intent index, completion cache or the model
+chat_path_counts = {"fast_path": 0, "intent": 0, "cache": 0, "llm": 0}
+
+# Stage latencies plus the counters kept above, exported on /metrics at scrape time
+metrics.register(metrics.MetricsCollector(
+    chat_paths=lambda: chat_path_counts,
+    cache_stats=lambda: completion_cache.stats() if completion_cache is not None else None,
+    session_stats=lambda: session_store.stats(),
+))
+
+# Sampling parameters shared by the blocking and streaming chat endpoints
+COMPLETION_PARAMS = {
+    "model": LARGE_MODEL,
+    "max_completion_tokens": 4916,
+    "temperature": 0,
+    "top_p": 0.5,
+}
+if STRUCTURED_OUTPUT:
+    COMPLETION_PARAMS["response_format"] = response_format()
+
+# The React app opens every session with this synthetic message before the customer types anything
+APP_GREETING = "Hello! I'm ready to help design wire shelving."
+
+def customer_turns(history: List[Turn]) -> int:
+    """Number of messages the customer actually typed, not counting the app's greeting"""
+    return sum(1 for turn in history if turn.type == "user" and turn.content.strip() != APP_GREETING)
+
+async def prepare_session(session_id: str, user_message: str) -> tuple[Optional[Dict[str, Any]], List[Dict[str, str]],
+                                                                        int, Optional[RouteDecision], ShelfEntities]:
+    """Load (or start) the session and prepare the turn.
+
+    Fully specified messages and common opening messages are answered
+    locally and returned as a turn. Otherwise the message list for Cerebras
+    is built: only the most recent turns that fit the context budget are
+    sent, older ones are replaced by the session's current configuration.
+    Returns (turn or None, messages, estimated prompt token count (None
+    when answered locally), model route or None, session state).
+    """
+    record = await session_store.load(session_id)
+    entities = record.entities.to_dict()
+
+    if FAST_PATH_ENABLED:
+        turn = fast_path_turn(user_message, entities)
+        if turn is not None:
+            chat_path_counts["fast_path"] += 1
+            return turn, [], None, None, record.entities
+
+    if intent_index is not None and customer_turns(record.history) == 0:
+        started = time.perf_counter()
+        turn = opening_turn(intent_index, user_message)
+        metrics.INTENT_SECONDS.observe(metrics.since(started))
+        if turn is not None:
+            chat_path_counts["intent"] += 1
+            return turn, [], None, None, record.entities
+
+    messages, prompt_tokens = build_context(SYSTEM_PROMPT, record.history, entities, user_message)
+    return None, messages, prompt_tokens, choose_route(user_message, entities), record.entities
+
+def parse_turn(ai_response: str) -> Dict[str, Any]:
+    """Parse an AI reply once into everything a turn needs (also the cached form)"""
+    # One pass finds the JSON tail, decodes the entities and cleans the prose
+    started = time.perf_counter()
+    parsed = parse_response(ai_response)
+    metrics.PARSE_SECONDS.observe(metrics.since(started))
+    metrics.record_parse_path(parsed.path)
+
+    return {
+        "raw": ai_response,
+        "parse_path": parsed.path,
+        "response": parsed.clean,
+        "extracted_entities": parsed.entities,
+        "has_sufficient_entities": parsed.has_sufficient,
+        "next_questions": parsed.next_questions,
+    }
+
+async def record_turn(session_id: str, user_message: str, turn: Dict[str, Any], state: ShelfEntities,
+                      known_version: Optional[int] = None, prompt_tokens: Optional[int] = None) -> ChatResponse:
+    """Store a completed turn, merge its entities into the session state and build the response"""
+    state = await session_store.append_turn(
+        session_id, user_message, turn["raw"], turn["response"], turn["extracted_entities"], state
+    )
+
+    return ChatResponse(
+        response=turn["response"],
+        # Values the session rejected (out of range, wrong type) aren't echoed back either
+        extracted_entities=valid_entities(turn["extracted_entities"]),
+        # From the merged session state, not just what the model repeated this turn
+        has_sufficient_entities=state.complete,
+        next_questions=turn["next_questions"],
+        prompt_tokens=prompt_tokens,
+        state_version=state.version,
+        changes=state.changes_since(known_version),
+        quote=catalog.quote(state.to_dict()) if catalog is not None and state.complete else None,
+    )
+
+def cache_key_for(model: str, messages: List[Dict[str, str]]) -> str:
+    """Completion cache key for a reply from ``model`` to these messages"""
+    return make_cache_key({**COMPLETION_PARAMS, "model": model}, SYSTEM_PROMPT, messages)
+
+async def lookup_cached_turn(messages: List[Dict[str, str]], decision: RouteDecision) -> Optional[Dict[str, Any]]:
+    """The cached turn from a model this route may answer with, if any.
+
+    Keys name the model that produced the turn: a small-route turn may
+    reuse the large model's reply, a large-route turn never gets the small
+    model's.
+    """
+    if completion_cache is None:
+        chat_path_counts["llm"] += 1
+        return None
+    models = [LARGE_MODEL] if decision.route != "small" else list(dict.fromkeys((decision.model, LARGE_MODEL)))
+    turn = await completion_cache.get_any([cache_key_for(model, messages) for model in models])
+    chat_path_counts["llm" if turn is None else "cache"] += 1
+    return turn
+
+async def cache_turn(messages: List[Dict[str, str]], model: str, turn: Dict[str, Any]) -> None:
+    if completion_cache is not None:
+        await completion_cache.set(cache_key_for(model, messages), turn)
+
+async def complete_turn(session_id: str, messages: List[Dict[str, str]], route: str, model: str) -> Dict[str, Any]:
+    """One non-streamed model call on the given route, parsed into a turn"""
+    # Call Cerebras API without blocking the event loop
+    async with llm_admission.admit():
+        started = time.perf_counter()
+        completion_response = await llm_resilience.call(
+            lambda timeout: create_completion(
+                llm_client(),
+                timeout=timeout,
+                messages=messages,
+                stream=False,
+                **{**COMPLETION_PARAMS, "model": model}
+            )
+        )
+        elapsed = metrics.since(started)
+        metrics.LLM_SECONDS.observe(elapsed)
+        metrics.ROUTE_SECONDS[route].observe(elapsed)
+
+    metrics.record_usage(getattr(completion_response, "usage", None), route)
+    return parse_turn(completion_response.choices[0].message.content)
+
+async def try_small_model(session_id: str, messages: List[Dict[str, str]],
+                          decision: RouteDecision) -> Optional[Dict[str, Any]]:
+    """The small model's turn if it passes the confidence check, else None (escalate)"""
+    try:
+        turn = await complete_turn(session_id, messages, "small", decision.model)
+    except (AdmissionRejected, CircuitOpenError):
+        raise
+    except Exception as e:
+        print(f"Error from the small model, escalating: {str(e)}")
+        metrics.record_escalation("error")
+        return None
+    reason = escalation_reason(turn, decision)
+    if reason is not None:
+        metrics.record_escalation(reason)
+        return None
+    return turn
+
+async def run_chat_turn(session_id: str, user_message: str, known_version: Optional[int] = None) -> ChatResponse:
+    """Run one chat turn; callers must hold the session lock"""
+    started = time.perf_counter()
+    turn, messages, prompt_tokens, decision, state = await prepare_session(session_id, user_message)
+    metrics.PROMPT_SECONDS.observe(metrics.since(started))
+    if turn is not None:
+        return await record_turn(session_id, user_message, turn, state, known_version, prompt_tokens)
+
+    turn = await lookup_cached_turn(messages, decision)
+    if turn is None:
+        metrics.route_turns[decision.route] += 1
+        if decision.route == "small":
+            turn = await try_small_model(session_id, messages, decision)
+            if turn is not None:
+                await cache_turn(messages, decision.model, turn)
+        if turn is None:
+            turn = await complete_turn(session_id, messages, "large", LARGE_MODEL)
+            await cache_turn(messages, LARGE_MODEL, turn)
+    else:
+        # Served from the cache, no prompt was sent
+        prompt_tokens = None
+
+    return await record_turn(session_id, user_message, turn, state, known_version, prompt_tokens)
+
 @app.post("/api/chat")
-async def chat_with_ai(chat_request: ChatMessage):
+async def chat_with_ai(chat_request: ChatMessage, request: Request = None):
+    started = time.perf_counter()
+    label = f"POST /api/chat session={session_tag(chat_request.session_id)}"
     try:
         session_id = chat_request.session_id
         user_message = chat_request.message
-        
-        # Initialize chat history if not exists
-        if session_id not in chat_histories:
-            chat_histories[session_id] = []
-
-        # Get or initialize session entities
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = {
-                "width": None,
-                "length": None,
-                "post_height": None,
-                "number_of_shelves": None,
-                "shelf_style": None,
-                "solid_bottom_shelf": None,
-                "color_and_finish": None,
-                "type_of_posts": None,
-                "shelf_dividers_count": None,
-                "shelf_dividers_shelves": None,
-                "enclosure_type": None
-            }
-
-        # Prepare conversation history for Cerebras
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-
-        # Add previous conversation history
-        for msg in chat_histories[session_id]:
-            if msg["type"] == "user":
-                messages.append({"role": "user", "content": msg["content"]})
-            else:
-                # Only add the conversational part, not the JSON
-                clean_content = clean_ai_response(msg["content"])
-                messages.append({"role": "assistant", "content": clean_content})
-
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
-
-        # Call Cerebras API
-        completion_response = cerebras_client.chat.completions.create(
-            messages=messages,
-            model="llama-3.3-70b",
-            stream=False,
-            max_completion_tokens=4916,
-            temperature=0,
-            top_p=0.5
-        )
 
-        ai_response = completion_response.choices[0].message.content
-        
-        # Store message history
-        chat_histories[session_id].append({"type": "user", "content": user_message})
-        chat_histories[session_id].append({"type": "ai", "content": ai_response})
+        known_version = chat_request.known_version
 
-        # Extract entities and sufficient status from AI response
-        extracted_entities, has_sufficient, next_questions = parse_ai_response(ai_response, session_id)
+        async def locked_turn() -> ChatResponse:
+            # One turn at a time per session, across every worker sharing the store
+            async with session_store.lock(session_id):
+                return await run_chat_turn(session_id, user_message, known_version)
 
-        # Update session entities
-        chat_sessions[session_id].update(extracted_entities)
+        profile_header = request.headers.get(PROFILE_HEADER) if request is not None else None
+        with request_profiler.capture(label, profile_header), loop_monitor.track(label):
+            chat_response = await chat_single_flight.run(
+                (session_id, " ".join(user_message.split()), known_version), locked_turn
+            )
+        if known_version is not None:
+            # Version-aware clients apply the changes; the raw extraction would only repeat them
+            return chat_response.model_dump(exclude={"extracted_entities"}, exclude_none=True)
+        return chat_response
 
-        # Clean the response (remove the JSON part)
-        clean_response = clean_ai_response(ai_response)
-
-        return ChatResponse(
-            response=clean_response,
-            extracted_entities=extracted_entities,
-            has_sufficient_entities=has_sufficient,
-            next_questions=next_questions
-        )
-        
     except Exception as e:
         print(f"Error in chat: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+        error = chat_http_error(e)
+        metrics.record_error(e, error.status_code)
+        raise error
+    finally:
+        metrics.TOTAL_SECONDS.observe(metrics.since(started))
+
+async def batch_turn(session_id: str, user_message: str) -> Dict[str, Any]:
+    """One batch turn through the same pipeline as /api/chat (without duplicate-submit coalescing)"""
+    started = time.perf_counter()
+    try:
+        with loop_monitor.track(f"POST /api/chat/batch session={session_tag(session_id)}"):
+            async with session_store.lock(session_id):
+                chat_response = await run_chat_turn(session_id, user_message)
+        return chat_response.model_dump()
+    except Exception as e:
+        print(f"Error in batch chat: {str(e)}")
+        raise
+    finally:
+        metrics.TOTAL_SECONDS.observe(metrics.since(started))
+
+def batch_error(error: Exception) -> Dict[str, Any]:
+    """A failed batch turn as the status and detail /api/chat would have answered with"""
+    http_error = chat_http_error(error)
+    metrics.record_error(error, http_error.status_code)
+    return {
+        "status": http_error.status_code,
+        "detail": http_error.detail,
+        "retry_after": (http_error.headers or {}).get("Retry-After"),
+    }
 
-def parse_ai_response(response: str, session_id: str) -> tuple[Dict[str, Any], bool, List[str]]:
-    """Parse AI response to extract JSON data"""
-    # Try to extract JSON from the response
-    json_match = re.search(r'```json\s*(\{.*?\})\s*```', response, re.DOTALL)
-    if not json_match:
-        # Fallback: look for JSON without code blocks
-        json_match = re.search(r'(\{[^{}]*"extracted_entities"[^{}]*\})', response, re.DOTALL)
+async def batch_lines(batch_request: BatchRequest) -> AsyncIterator[str]:
+    jobs = [(job.session_id or str(uuid.uuid4()), job.messages) for job in batch_request.jobs]
+    async for result in run_batch(jobs, batch_turn, batch_error, batch_request.concurrency):
+        yield json.dumps(result) + "\n"
+
+@app.post("/api/chat/batch")
+async def chat_batch(batch_request: BatchRequest):
+    """Run many conversations, streaming one NDJSON line per job as each finishes.
+
+    Turns within a session keep their order; sessions run in parallel up to
+    ``concurrency`` (capped by BATCH_MAX_CONCURRENCY). Upstream calls still
+    go through the shared admission controller.
+    """
+    return StreamingResponse(batch_lines(batch_request), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def chat_http_error(error: Exception) -> HTTPException:
+    """Overload and outages become 429/503 with Retry-After, deadlines 504, anything else 500"""
+    if isinstance(error, AdmissionRejected):
+        return HTTPException(status_code=error.status_code, detail=f"Chat error: {str(error)}",
+                             headers=error.headers)
+    if isinstance(error, CircuitOpenError):
+        return HTTPException(status_code=503, detail=f"Chat error: {str(error)}",
+                             headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))})
+    if isinstance(error, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail="Chat error: upstream deadline exceeded")
+    retry_after = rate_limit_retry_after(error)
+    if retry_after is not None:
+        return HTTPException(status_code=429, detail="Chat error: upstream rate limit reached",
+                             headers={"Retry-After": retry_after})
+    return HTTPException(status_code=500, detail=f"Chat error: {str(error)}")
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_chat_events(session_id: str, user_message: str,
+                             known_version: Optional[int] = None) -> AsyncIterator[str]:
+    """Stream prose tokens as they arrive, then one final event with the entities"""
+    async for event, data in chat_turn_events(session_id, user_message, known_version=known_version):
+        yield sse_event(event, data)
+
+async def chat_turn_events(session_id: str, user_message: str, stream: bool = True,
+                           known_version: Optional[int] = None) -> AsyncIterator[tuple[str, Dict[str, Any]]]:
+    """A turn as (event, data) pairs for any transport: token* (when streaming), then final or error"""
+    started = time.perf_counter()
+    try:
+        with loop_monitor.track(f"chat turn session={session_tag(session_id)}"):
+            async with session_store.lock(session_id):
+                if stream:
+                    async for event in stream_chat_turn(session_id, user_message, known_version):
+                        yield event
+                else:
+                    chat_response = await run_chat_turn(session_id, user_message, known_version)
+                    yield "final", chat_response.model_dump()
 
-    if json_match:
+    except Exception as e:
+        print(f"Error in chat stream: {str(e)}")
+        error = chat_http_error(e)
+        metrics.record_error(e, error.status_code)
+        yield "error", {
+            "status": error.status_code,
+            "detail": error.detail,
+            "retry_after": (error.headers or {}).get("Retry-After"),
+        }
+    finally:
+        metrics.STREAM_TOTAL_SECONDS.observe(metrics.since(started))
+
+async def stream_chat_turn(session_id: str, user_message: str,
+                           known_version: Optional[int] = None) -> AsyncIterator[tuple[str, Dict[str, Any]]]:
+    """Run one streamed chat turn; callers must hold the session lock"""
+    splitter = StructuredReplySplitter() if STRUCTURED_OUTPUT else ResponseStreamSplitter()
+    started = time.perf_counter()
+    turn, messages, prompt_tokens, decision, state = await prepare_session(session_id, user_message)
+    metrics.PROMPT_SECONDS.observe(metrics.since(started))
+    if turn is None:
+        turn = await lookup_cached_turn(messages, decision)
+        if turn is None:
+            metrics.route_turns[decision.route] += 1
+            # Small-model replies are short and fast: checked whole, then sent as one token event
+            if decision.route == "small":
+                turn = await try_small_model(session_id, messages, decision)
+                if turn is not None:
+                    await cache_turn(messages, decision.model, turn)
+        else:
+            prompt_tokens = None
+    if turn is not None:
+        yield "token", {"text": turn["response"]}
+        chat_response = await record_turn(session_id, user_message, turn, state, known_version, prompt_tokens)
+        yield "final", chat_response.model_dump()
+        return
+
+    async with llm_admission.admit(), llm_resilience.guard():
+        started = time.perf_counter()
+        # The per-read timeout alone would let a trickling stream hold the session lock and its slot
+        deadline_at = time.monotonic() + llm_resilience.deadline
+        tokens = stream_completion(
+            llm_client(), timeout=llm_resilience.deadline,
+            on_usage=lambda usage: metrics.record_usage(usage, "large"),
+            messages=messages, **COMPLETION_PARAMS
+        )
+        timed_tokens = within_deadline(tokens, deadline_at)
         try:
-            json_data = json.loads(json_match.group(1))
-            extracted_entities = json_data.get("extracted_entities", {})
-            has_sufficient = json_data.get("has_sufficient_entities", False)
-            next_questions = json_data.get("next_questions", [])
-
-            # Convert to the format expected by frontend
-            formatted_entities = {}
-            if extracted_entities.get("width"):
-                formatted_entities["width"] = extracted_entities["width"]
-            if extracted_entities.get("length"):
-                formatted_entities["length"] = extracted_entities["length"]
-            if extracted_entities.get("post_height"):
-                formatted_entities["postHeight"] = extracted_entities["post_height"]
-            if extracted_entities.get("number_of_shelves"):
-                formatted_entities["numberOfShelves"] = extracted_entities["number_of_shelves"]
-            if extracted_entities.get("shelf_style"):
-                formatted_entities["shelfStyle"] = extracted_entities["shelf_style"]
-            if extracted_entities.get("solid_bottom_shelf") is not None:
-                formatted_entities["solidBottomShelf"] = extracted_entities["solid_bottom_shelf"]
-            if extracted_entities.get("color_and_finish"):
-                formatted_entities["color"] = extracted_entities["color_and_finish"]
-            if extracted_entities.get("type_of_posts"):
-                formatted_entities["postType"] = extracted_entities["type_of_posts"]
-            if extracted_entities.get("shelf_dividers_count"):
-                formatted_entities["shelfDividersCount"] = extracted_entities["shelf_dividers_count"]
-            if extracted_entities.get("shelf_dividers_shelves"):
-                formatted_entities["shelfDividersShelves"] = extracted_entities["shelf_dividers_shelves"]
-            if extracted_entities.get("enclosure_type"):
-                formatted_entities["enclosureType"] = extracted_entities["enclosure_type"]
-
-            return formatted_entities, has_sufficient, next_questions
-        except json.JSONDecodeError:
-            pass
-
-    # Fallback: extract from natural language
-    return extract_from_natural_language(response), False, []
-
-def extract_from_natural_language(text: str) -> Dict[str, Any]:
-    """Extract entities from natural language as fallback"""
-    entities = {}
-    text_lower = text.lower()
-
-    # Extract dimensions
-    width_match = re.search(r'(\d+)\s*(?:inch|inches|in|"|''|′)?\s*(?:wide|width)', text_lower)
-    if width_match:
-        entities['width'] = int(width_match.group(1))
-
-    length_match = re.search(r'(\d+)\s*(?:inch|inches|in|"|''|′)?\s*(?:long|length|deep|depth)', text_lower)
-    if length_match:
-        entities['length'] = int(length_match.group(1))
-
-    height_match = re.search(r'(\d+)\s*(?:inch|inches|in|"|''|′)?\s*(?:tall|high|height)', text_lower)
-    if height_match:
-        entities['postHeight'] = int(height_match.group(1))
-
-    shelves_match = re.search(r'(\d+)\s*(?:shelf|shelves|level|levels|tier|tiers)', text_lower)
-    if shelves_match:
-        entities['numberOfShelves'] = int(shelves_match.group(1))
-
-    return entities
-
-def check_sufficient_entities(entities: Dict[str, Any]) -> bool:
-    """Check if we have all required entities for 3D model"""
-    required = ['width', 'length', 'postHeight', 'numberOfShelves']
-    return all(key in entities and entities[key] is not None for key in required)
+            async for token in timed_tokens:
+                text = splitter.feed(token)
+                if text:
+                    yield "token", {"text": text}
+                if splitter.json_complete:
+                    # Entity block is closed, nothing after it is shown to the user
+                    break
+        finally:
+            await timed_tokens.aclose()
+            await tokens.aclose()
+            elapsed = metrics.since(started)
+            metrics.LLM_SECONDS.observe(elapsed)
+            metrics.ROUTE_SECONDS["large"].observe(elapsed)
+
+    text = splitter.finish()
+    if text:
+        yield "token", {"text": text}
+
+    turn = parse_turn(splitter.response)
+    await cache_turn(messages, LARGE_MODEL, turn)
+    chat_response = await record_turn(session_id, user_message, turn, state, known_version, prompt_tokens)
+    yield "final", chat_response.model_dump()
+
+@app.post("/api/chat/stream")
+async def chat_stream(chat_request: ChatMessage):
+    """Stream the assistant reply as server-sent events"""
+    return StreamingResponse(
+        stream_chat_events(chat_request.session_id, chat_request.message, chat_request.known_version),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/api/ws/{session_id}")
+async def chat_websocket(websocket: WebSocket, session_id: str):
+    """One long-lived conversation channel per session.
+
+    Client frames: {"type": "message", "message": ..., "id": optional,
+    "stream": optional, default true} and {"type": "ping"}. Server frames: ready (current entities and
+    state version), token, entities (only the fields that changed, and the new version), final, error,
+    ping and pong; turn frames echo the message id as "reply_to".
+    """
+    await websocket.accept()
+    connection = ChatConnection(websocket)
+    await ws_connections.attach(session_id, connection)
+    try:
+        record = await session_store.load(session_id)
+        known_version = record.entities.version
+        await connection.send({"type": "ready", "session_id": session_id, "version": known_version,
+                               "entities": record.entities.changes_since(None)})
+        connection.start_heartbeat()
+
+        while True:
+            frame = await connection.receive()
+            kind = frame.get("type") if frame is not None else None
+            if kind == "ping":
+                await connection.send({"type": "pong"})
+                continue
+            if kind == "pong":
+                continue
+            if kind != "message" or not isinstance(frame.get("message"), str):
+                await connection.send({"type": "error", "status": 400, "detail": "Expected a message frame"})
+                continue
+
+            reply_to = frame.get("id")
+            stream = frame.get("stream", True) is not False
+            async for event, data in chat_turn_events(session_id, frame["message"], stream, known_version):
+                if event == "final":
+                    known_version = data["state_version"]
+                    await connection.send({"type": "entities", "reply_to": reply_to, "delta": data["changes"],
+                                           "version": known_version})
+                await connection.send({"type": event, "reply_to": reply_to, **data})
+
+    except WebSocketDisconnect:
+        pass
+    except asyncio.TimeoutError:
+        await connection.close(CLOSE_IDLE, "idle timeout")
+    finally:
+        ws_connections.detach(session_id, connection)
+
+def parse_ai_response(response: str, session_id: str) -> tuple[Dict[str, Any], bool, List[str]]:
+    """Parse AI response to extract JSON data"""
+    parsed = parse_response(response)
+    return parsed.entities, parsed.has_sufficient, parsed.next_questions
 
 def clean_ai_response(response: str) -> str:
     """Remove the JSON part from response"""
-    # Remove JSON code blocks
-    cleaned = re.sub(r'```json.*?```', '', response, flags=re.DOTALL)
-    # Remove standalone JSON objects
-    cleaned = re.sub(r'\{[^{}]*"extracted_entities"[^{}]*\}', '', cleaned, flags=re.DOTALL)
+    return split_response(response)[0]
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the completion cache"""
+    if completion_cache is None:
+        return {"backend": None}
+    return completion_cache.stats()
+
+@app.get("/api/chat/stats")
+async def get_chat_stats():
+    """How often turns skipped the model (fast path, cache) or called it"""
+    total = sum(chat_path_counts.values())
+    return {
+        **chat_path_counts,
+        "coalesced": chat_single_flight.coalesced,
+        "websockets": len(ws_connections),
+        "intent_index": intent_index.stats() if intent_index is not None else None,
+        "llm_skipped_rate": (total - chat_path_counts["llm"]) / total if total else 0.0,
+    }
 
-    return cleaned.strip()
+@app.get("/api/llm/admission")
+async def get_admission_stats():
+    """Queue depth, in-flight calls, rejections and wait times for upstream calls"""
+    return llm_admission.stats()
+
+@app.get("/api/llm/routing")
+async def get_routing_stats():
+    """Small/large model turns, escalations, tokens and latency per route"""
+    return metrics.route_stats()
+
+@app.get("/api/llm/resilience")
+async def get_resilience_stats():
+    """Retry, hedge and circuit breaker counters for upstream calls"""
+    return llm_resilience.stats()
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """Admin routes answer only to ADMIN_TOKEN as a bearer token, and don't exist without one"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not admin_authorized(authorization, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """The slowest profiled /api/chat requests, slowest first"""
+    return request_profiler.stats()
+
+@app.get("/api/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: int, format: str = Query("pstats", pattern="^(pstats|text)$")):
+    """One captured profile: pstats binary (for pstats/snakeviz) or the top functions as text"""
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (evicted or never captured)")
+    if format == "text":
+        return Response(profile.text(), media_type="text/plain")
+    return Response(profile.pstats_bytes(), media_type="application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="chat-{profile_id}.prof"'})
+
+@app.get("/api/admin/loop-lag", dependencies=[Depends(require_admin)])
+async def get_loop_lag():
+    """Event-loop lag and the most recent stalls with the stack and request that caused them"""
+    return loop_monitor.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: stage latencies, tokens, parse paths, cache, errors and sessions"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/preview.png")
+async def get_preview(request: Request, size: str = Query(DEFAULT_SIZE, pattern="^(" + "|".join(PREVIEW_SIZES) + ")$")):
+    """PNG preview of a configuration given as query parameters.
+
+    Takes the same entities as ``extracted_entities`` (frontend or session
+    names, dividers as ``shelfDividersShelves=1,2``). Equal configurations
+    share one cached image, whose content key is the ETag.
+    """
+    entities = {key: value for key, value in request.query_params.items() if key != "size"}
+    try:
+        config = canonical_config(entities)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    headers = {"ETag": f'"{preview_key(config, size)}"', "Cache-Control": PREVIEW_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    try:
+        png = await preview_cache.get(config, size)
+    except PreviewBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+@app.get("/api/preview/stats")
+async def get_preview_stats():
+    """Preview cache hits (memory and disk), renders and render time"""
+    return preview_cache.stats()
+
+@app.get("/api/catalog/quote")
+async def get_quote(request: Request):
+    """Snap a configuration (query parameters, as for /api/preview.png) to stocked SKUs and price it"""
+    if catalog is None:
+        raise HTTPException(status_code=404, detail="Catalog disabled")
+    try:
+        return catalog.quote_config(canonical_config(request.query_params))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Not stocked: {e}")
+
+@app.get("/api/catalog/stats")
+async def get_catalog_stats():
+    """Catalog size and quote memo hits/misses"""
+    if catalog is None:
+        return {"items": None}
+    return catalog.stats()
 
 @app.get("/api/chat/history/{session_id}")
-async def get_chat_history(session_id: str):
-    """Get chat history for a session"""
-    return chat_histories.get(session_id, [])
+async def get_chat_history(session_id: str, request: Request, after: int = Query(0, ge=0), clean: bool = True):
+    """Get chat history for a session.
+
+    ``after=N`` returns only the turns after the first N. Assistant turns
+    are the prose shown to the customer; ``clean=false`` returns the raw
+    model output instead (a JSON object in structured-output mode, prose
+    plus a ```json block otherwise). The ETag changes with
+    every new turn (If-None-Match gets a 304), X-History-Length gives the
+    cursor for the next incremental fetch, and large bodies are gzipped.
+    """
+    version, total, turns = await session_store.history_page(session_id, after)
+    etag = f'"{version}-{after}-{int(clean)}"'
+    headers = {"ETag": etag, "X-History-Length": str(total), "Cache-Control": "private, no-cache",
+               "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = json.dumps([turn.to_dict(clean) for turn in turns], separators=(",", ":")).encode()
+    if len(body) >= HISTORY_GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
 
 @app.delete("/api/chat/{session_id}")
 async def clear_chat_session(session_id: str):
     """Clear a chat session"""
-    if session_id in chat_sessions:
-        del chat_sessions[session_id]
-    if session_id in chat_histories:
-        del chat_histories[session_id]
+    await session_store.delete(session_id)
 
     return {"message": "Session cleared"}
 
@@ -0,0 +1,223 @@
+import asyncio
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+# Write-behind journal settings (an empty directory disables the journal)
+SESSION_JOURNAL_DIR = os.environ.get("SESSION_JOURNAL_DIR", "")
+JOURNAL_FLUSH_INTERVAL = float(os.environ.get("JOURNAL_FLUSH_INTERVAL", "0.05"))
+JOURNAL_SEGMENT_BYTES = int(os.environ.get("JOURNAL_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+JOURNAL_COMPACT_BYTES = int(os.environ.get("JOURNAL_COMPACT_BYTES", str(256 * 1024 * 1024)))
+
+SEGMENT_PATTERN = "segment-{:08d}.jsonl"
+SNAPSHOT_PATTERN = "snapshot-{:08d}.jsonl"
+
+# Sessions captured per event-loop slice while taking a snapshot
+SNAPSHOT_SLICE = 1000
+
+
+def _sequence(path: str) -> int:
+    return int(os.path.basename(path).split("-")[1].split(".")[0])
+
+
+class SessionJournal:
+    """Append-only write-behind journal for the in-memory session store.
+
+    The request path only appends a tuple to a list. A background task
+    wakes every ``flush_interval`` seconds, serializes the batch on a
+    single writer thread and makes it durable with one fsync (group
+    commit). Segments rotate at ``segment_bytes``; once ``compact_bytes``
+    have been written since the last snapshot, the live sessions are
+    snapshotted and older segments deleted.
+
+    Turn records carry the history index they were appended at, so replay
+    is idempotent: a turn is applied only when the session's history is
+    exactly that long, which also makes fuzzy (non-blocking) snapshots safe.
+    """
+
+    def __init__(self, directory: str = SESSION_JOURNAL_DIR, flush_interval: float = JOURNAL_FLUSH_INTERVAL,
+                 segment_bytes: int = JOURNAL_SEGMENT_BYTES, compact_bytes: int = JOURNAL_COMPACT_BYTES):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.compact_bytes = compact_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._pending: List[tuple] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._store: Any = None
+        # One thread owns the files, so batches, rotation and snapshots never interleave
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-journal")
+        self._file = None
+        self._segment = 0
+        self._segment_size = 0
+        self._since_snapshot = 0
+
+        self.batches = 0
+        self.records = 0
+        self.bytes_written = 0
+        self.snapshots = 0
+        self.last_fsync_ms = 0.0
+
+    # Request path
+
+    def record_turn(self, session_id: str, index: int, user_message: str, ai_response: str,
+                    clean_response: str, entities: Dict[str, Any]) -> None:
+        self._pending.append(("t", session_id, index, user_message, ai_response, clean_response, entities))
+        self._nudge()
+
+    def record_delete(self, session_id: str) -> None:
+        self._pending.append(("d", session_id))
+        self._nudge()
+
+    def _nudge(self) -> None:
+        if len(self._pending) == 1:
+            self._wakeup.set()
+
+    # Startup
+
+    def replay(self, store: Any) -> Dict[str, Any]:
+        """Rebuild ``store`` from the newest snapshot plus later segments; returns counts"""
+        started = time.perf_counter()
+        snapshots = sorted(glob.glob(os.path.join(self.directory, "snapshot-*.jsonl")))
+        base = _sequence(snapshots[-1]) if snapshots else 0
+        sessions = turns = 0
+        if snapshots:
+            with open(snapshots[-1], encoding="utf-8") as f:
+                for line in f:
+                    item = json.loads(line)
+                    store.restore_session(item["s"], item["e"], item["h"], item.get("v"))
+                    sessions += 1
+
+        segments = sorted(path for path in glob.glob(os.path.join(self.directory, "segment-*.jsonl"))
+                          if _sequence(path) >= base)
+        for path in segments:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write at the tail of the last segment before a crash
+                        break
+                    if record[0] == "t":
+                        turns += store.restore_turn(*record[1:])
+                    else:
+                        store.restore_delete(record[1])
+
+        self._segment = max([base] + [_sequence(path) for path in segments])
+        self._open_segment(self._segment + 1)
+        return {"snapshot_sessions": sessions, "segments": len(segments), "turns_replayed": turns,
+                "seconds": round(time.perf_counter() - started, 3)}
+
+    def start(self, store: Any) -> None:
+        self._store = store
+        self._task = asyncio.create_task(self._run())
+
+    # Background writer
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Let more records join the batch: one fsync per interval, not per turn
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                if self._since_snapshot >= self.compact_bytes:
+                    await self.compact()
+            except Exception as e:
+                print(f"Error writing session journal: {str(e)}")
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if batch:
+            await asyncio.get_running_loop().run_in_executor(self._writer, self._write_batch, batch)
+
+    def _write_batch(self, batch: List[tuple]) -> None:
+        data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in batch).encode("utf-8")
+        self._file.write(data)
+        self._file.flush()
+        started = time.perf_counter()
+        os.fsync(self._file.fileno())
+        self.last_fsync_ms = (time.perf_counter() - started) * 1000
+
+        self.batches += 1
+        self.records += len(batch)
+        self.bytes_written += len(data)
+        self._segment_size += len(data)
+        self._since_snapshot += len(data)
+        if self._segment_size >= self.segment_bytes:
+            self._open_segment(self._segment + 1)
+
+    def _open_segment(self, sequence: int) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._segment = sequence
+        self._segment_size = 0
+        self._file = open(os.path.join(self.directory, SEGMENT_PATTERN.format(sequence)), "ab")
+
+    # Compaction
+
+    async def compact(self) -> None:
+        """Snapshot the live sessions and drop the segments the snapshot covers"""
+        loop = asyncio.get_running_loop()
+        await self.flush()
+        # Everything from here on goes to a fresh segment that the snapshot won't cover
+        await loop.run_in_executor(self._writer, lambda: self._open_segment(self._segment + 1))
+        base = self._segment
+
+        captured: List[Tuple[str, Dict[str, Any], list]] = []
+        items = self._store.snapshot_items()
+        for start in range(0, len(items), SNAPSHOT_SLICE):
+            for session_id, record in items[start:start + SNAPSHOT_SLICE]:
+                captured.append((session_id, record.entities.to_dict(), record.entities.versions(), record.history[:]))
+            await asyncio.sleep(0)
+
+        await loop.run_in_executor(self._writer, self._write_snapshot, base, captured)
+
+    def _write_snapshot(self, base: int, captured: List[Tuple[str, Dict[str, Any], list, list]]) -> None:
+        path = os.path.join(self.directory, SNAPSHOT_PATTERN.format(base))
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            for session_id, entities, versions, history in captured:
+                item = {"s": session_id, "e": entities, "v": versions,
+                        "h": [[t.type, t.content, t.clean] for t in history]}
+                f.write(json.dumps(item, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+        for old in glob.glob(os.path.join(self.directory, "*-*.jsonl")):
+            if _sequence(old) < base:
+                os.remove(old)
+        self.snapshots += 1
+        self._since_snapshot = 0
+
+    async def close(self) -> None:
+        """Stop the writer and make everything recorded so far durable"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._writer.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "records": self.records,
+            "bytes_written": self.bytes_written,
+            "segment": self._segment,
+            "snapshots": self.snapshots,
+            "last_fsync_ms": round(self.last_fsync_ms, 3),
+        }
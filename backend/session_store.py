@@ -0,0 +1,457 @@
+import asyncio
+import itertools
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from session_journal import SESSION_JOURNAL_DIR, SessionJournal
+from shelf_schema import ENTITY_FIELDS, ESSENTIAL_FIELDS, FIELDS_BY_KEY, FRONTEND_KEYS, coerce_entity
+
+# Session retention settings
+SESSION_IDLE_TTL = float(os.environ.get("SESSION_IDLE_TTL", str(6 * 60 * 60)))
+SESSION_MAX_SESSIONS = int(os.environ.get("SESSION_MAX_SESSIONS", "10000"))
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")
+SESSION_LOCK_TIMEOUT = float(os.environ.get("SESSION_LOCK_TIMEOUT", "120"))
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# Hidden field of the Redis entities hash that identifies one incarnation of a session
+EPOCH_FIELD = "_epoch"
+# Hidden field of the Redis entities hash holding ShelfEntities.versions()
+VERSIONS_FIELD = "_versions"
+
+
+@dataclass(slots=True)
+class ShelfEntities:
+    """Canonical, typed configuration of one session, versioned by its merges.
+
+    Every merge that changes a value bumps ``version`` and stamps the
+    changed fields with it, so the fields a client is missing can be
+    found from the version it last saw. Values that don't fit their field
+    are dropped instead of merged. ``missing`` counts the unset essential
+    fields, which makes the completeness check O(1).
+    """
+    width: Optional[float] = None
+    length: Optional[float] = None
+    post_height: Optional[float] = None
+    number_of_shelves: Optional[int] = None
+    shelf_style: Optional[str] = None
+    solid_bottom_shelf: Optional[bool] = None
+    color_and_finish: Optional[str] = None
+    type_of_posts: Optional[str] = None
+    shelf_dividers_count: Optional[int] = None
+    shelf_dividers_shelves: Optional[List[int]] = None
+    enclosure_type: Optional[str] = None
+    version: int = 0
+    # Field name -> version it last changed at
+    changed_at: Dict[str, int] = field(default_factory=dict)
+    missing: int = len(ESSENTIAL_FIELDS)
+
+    def update(self, entities: Dict[str, Any]) -> List[str]:
+        """Merge extracted entities given with either frontend or session keys; returns the changed fields"""
+        changed = []
+        for key, raw in entities.items():
+            spec = FIELDS_BY_KEY.get(key)
+            if spec is None:
+                continue
+            try:
+                value = coerce_entity(spec, raw)
+            except ValueError:
+                continue
+            name = spec.name
+            old = getattr(self, name)
+            if value == old:
+                continue
+            if spec.essential:
+                self.missing += (value is None) - (old is None)
+            setattr(self, name, value)
+            changed.append(name)
+        if changed:
+            self.version += 1
+            for name in changed:
+                self.changed_at[name] = self.version
+        return changed
+
+    @property
+    def complete(self) -> bool:
+        """Every essential field is set"""
+        return self.missing == 0
+
+    def changes_since(self, version: Optional[int]) -> Dict[str, Any]:
+        """Frontend-keyed fields changed after ``version``; every set field when the version is unknown
+
+        A version ahead of this state's (the session was recreated or
+        restored from a snapshot) also gets the full state.
+        """
+        if version is None or version > self.version:
+            return {FRONTEND_KEYS[name]: value for name, value in self.to_dict().items() if value is not None}
+        return {FRONTEND_KEYS[name]: getattr(self, name) for name, at in self.changed_at.items() if at > version}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in ENTITY_FIELDS}
+
+    def versions(self) -> list:
+        """[version, changed_at], persisted next to the values"""
+        return [self.version, dict(self.changed_at)]
+
+    def restore_versions(self, versions: Optional[list]) -> None:
+        if versions:
+            self.version, self.changed_at = versions[0], dict(versions[1])
+
+
+@dataclass(slots=True)
+class Turn:
+    """One history entry; assistant turns keep their prose cleaned once up front"""
+    type: str
+    content: str
+    clean: str
+
+    def to_dict(self, clean: bool = False) -> Dict[str, str]:
+        return {"type": self.type, "content": self.clean if clean else self.content}
+
+
+@dataclass(slots=True)
+class SessionRecord:
+    entities: ShelfEntities = field(default_factory=ShelfEntities)
+    history: List[Turn] = field(default_factory=list)
+    last_access: float = 0.0
+    # UTF-8 size of the stored history text
+    history_bytes: int = 0
+    # Distinguishes a recreated session from an earlier one with the same id
+    epoch: int = 0
+
+
+class InMemorySessionStore:
+    """Process-local session store with idle-TTL and max-sessions eviction.
+
+    Sessions are kept in least-recently-used order, so both the expired and
+    the over-capacity sessions are always at the front. With a journal,
+    every change is also queued for the write-behind log and the sessions
+    are rebuilt from it on start().
+    """
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL, max_sessions: int = SESSION_MAX_SESSIONS,
+                 clock: Callable[[], float] = time.monotonic, journal: Optional[SessionJournal] = None):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.journal = journal
+        self.evictions = 0
+        self.history_bytes = 0
+        self._epochs = itertools.count(1)
+        # Keeps history versions from different processes/restarts apart
+        self._instance = secrets.token_hex(4)
+        self._sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._locks: Dict[str, list] = {}
+
+    async def load(self, session_id: str) -> SessionRecord:
+        """Get a session for use, creating it if needed"""
+        now = self.clock()
+        self._evict(now)
+        record = self._sessions.get(session_id)
+        if record is None:
+            record = SessionRecord(last_access=now, epoch=next(self._epochs))
+            self._sessions[session_id] = record
+            self._evict(now)
+        else:
+            self._sessions.move_to_end(session_id)
+        record.last_access = now
+        return record
+
+    async def append_turn(self, session_id: str, user_message: str, ai_response: str,
+                          clean_response: str, entities: Dict[str, Any],
+                          state: Optional[ShelfEntities] = None) -> ShelfEntities:
+        """Store a user/assistant exchange, merge the extracted entities and return the merged state.
+
+        ``state`` is the session's state loaded earlier under the session lock,
+        normally the live record's own. Sessions are not evicted while locked,
+        but if this one was deleted mid-turn the turn is stored on a record
+        rebuilt around ``state`` rather than on an empty one.
+        """
+        record = self._sessions.get(session_id)
+        if record is None:
+            record = self._reinstate(session_id, state)
+        else:
+            self._sessions.move_to_end(session_id)
+            record.last_access = self.clock()
+        if self.journal is not None:
+            self.journal.record_turn(session_id, len(record.history), user_message, ai_response,
+                                     clean_response, entities)
+        self._append(record, user_message, ai_response, clean_response, entities)
+        return record.entities
+
+    def _reinstate(self, session_id: str, state: Optional[ShelfEntities]) -> SessionRecord:
+        """A new record for a session that disappeared during its turn, keeping the state the turn built on"""
+        self.restore_delete(session_id)
+        record = self._restored(session_id)
+        if state is not None:
+            record.entities = state
+        self._evict(record.last_access)
+        return record
+
+    def _append(self, record: SessionRecord, user_message: str, ai_response: str,
+                clean_response: str, entities: Dict[str, Any]) -> None:
+        record.history.append(Turn("user", user_message, user_message))
+        record.history.append(Turn("ai", ai_response, clean_response))
+        record.entities.update(entities)
+        size = sum(len(text.encode()) for text in (user_message, ai_response, clean_response))
+        record.history_bytes += size
+        self.history_bytes += size
+
+    async def history(self, session_id: str) -> List[Turn]:
+        record = self._sessions.get(session_id)
+        if record is None or self._expired(record, self.clock()):
+            return []
+        return record.history
+
+    async def history_page(self, session_id: str, start: int = 0) -> Tuple[str, int, List[Turn]]:
+        """(version, total turns, turns from ``start``); the version changes whenever history does"""
+        record = self._sessions.get(session_id)
+        if record is None or self._expired(record, self.clock()):
+            return "0", 0, []
+        return f"{self._instance}.{record.epoch}.{len(record.history)}", len(record.history), record.history[start:]
+
+    async def delete(self, session_id: str) -> None:
+        if self.journal is not None:
+            self.journal.record_delete(session_id)
+        self.restore_delete(session_id)
+
+    async def start(self) -> Optional[Dict[str, Any]]:
+        """Replay the journal (if any) and start its background writer"""
+        if self.journal is None:
+            return None
+        replayed = self.journal.replay(self)
+        self._evict(self.clock())
+        self.journal.start(self)
+        return replayed
+
+    async def ping(self) -> bool:
+        return True
+
+    def restore_session(self, session_id: str, entities: Dict[str, Any], history: List[list],
+                        versions: Optional[list] = None) -> None:
+        """Replay a snapshotted session"""
+        self.restore_delete(session_id)
+        record = self._restored(session_id)
+        record.entities.update(entities)
+        record.entities.restore_versions(versions)
+        record.history = [Turn(*item) for item in history]
+        record.history_bytes = sum(len(t.content.encode()) + (len(t.clean.encode()) if t.type == "ai" else 0)
+                                   for t in record.history)
+        self.history_bytes += record.history_bytes
+
+    def restore_turn(self, session_id: str, index: int, user_message: str, ai_response: str,
+                     clean_response: str, entities: Dict[str, Any]) -> int:
+        """Replay a journaled exchange unless the session already has it; returns 1 if applied"""
+        record = self._sessions.get(session_id)
+        if (len(record.history) if record is not None else 0) != index:
+            return 0
+        if record is None:
+            record = self._restored(session_id)
+        self._append(record, user_message, ai_response, clean_response, entities)
+        return 1
+
+    def restore_delete(self, session_id: str) -> None:
+        record = self._sessions.pop(session_id, None)
+        if record is not None:
+            self.history_bytes -= record.history_bytes
+
+    def _restored(self, session_id: str) -> SessionRecord:
+        record = self._sessions[session_id] = SessionRecord(last_access=self.clock(), epoch=next(self._epochs))
+        return record
+
+    def snapshot_items(self) -> List[Tuple[str, SessionRecord]]:
+        return list(self._sessions.items())
+
+    @asynccontextmanager
+    async def lock(self, session_id: str) -> AsyncIterator[None]:
+        """Serialize read-modify-write cycles on one session"""
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _expired(self, record: SessionRecord, now: float) -> bool:
+        return now - record.last_access > self.idle_ttl
+
+    def _evict(self, now: float) -> None:
+        sessions = self._sessions
+        excess = len(sessions) - self.max_sessions
+        victims = []
+        for session_id, record in sessions.items():
+            if len(victims) >= excess and not self._expired(record, now):
+                break
+            # Locked sessions are mid-turn; their turn still has to be stored
+            if session_id not in self._locks:
+                victims.append(session_id)
+        for session_id in victims:
+            self.history_bytes -= sessions.pop(session_id).history_bytes
+            self.evictions += 1
+            if self.journal is not None:
+                self.journal.record_delete(session_id)
+
+    async def close(self) -> None:
+        if self.journal is not None:
+            await self.journal.close()
+        self._sessions.clear()
+        self.history_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "history_bytes": self.history_bytes,
+            "evictions": self.evictions,
+            "idle_ttl": self.idle_ttl,
+            "max_sessions": self.max_sessions,
+        }
+        if self.journal is not None:
+            stats["journal"] = self.journal.stats()
+        return stats
+
+
+class RedisSessionStore:
+    """Session store shared by every worker and replica through Redis.
+
+    Each session is a hash of entity fields plus a list of turns. Appending
+    a turn is a single MULTI/EXEC transaction, and every write refreshes the
+    idle TTL; the session cap is left to Redis' maxmemory eviction policy.
+    """
+
+    def __init__(self, url: str = REDIS_URL, idle_ttl: float = SESSION_IDLE_TTL,
+                 lock_timeout: float = SESSION_LOCK_TIMEOUT, prefix: str = "shelf-ai:session:",
+                 client: Any = None):
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.idle_ttl = max(1, int(idle_ttl))
+        self.lock_timeout = lock_timeout
+        self.prefix = prefix
+
+    def _keys(self, session_id: str) -> tuple:
+        base = self.prefix + session_id
+        return base + ":entities", base + ":history"
+
+    async def load(self, session_id: str) -> SessionRecord:
+        entities_key, history_key = self._keys(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(entities_key)
+            pipe.lrange(history_key, 0, -1)
+            pipe.expire(entities_key, self.idle_ttl)
+            pipe.expire(history_key, self.idle_ttl)
+            raw_entities, raw_history, _, _ = await pipe.execute()
+
+        record = SessionRecord(entities=self._entities(raw_entities), last_access=time.time())
+        record.history = [Turn(*json.loads(item)) for item in raw_history]
+        return record
+
+    @staticmethod
+    def _entities(raw_entities: Dict[Any, Any]) -> ShelfEntities:
+        entities = ShelfEntities()
+        entities.update({key: json.loads(value) for key, value in raw_entities.items()
+                         if key not in (EPOCH_FIELD, VERSIONS_FIELD)})
+        versions = raw_entities.get(VERSIONS_FIELD)
+        entities.restore_versions(json.loads(versions) if versions else None)
+        return entities
+
+    async def append_turn(self, session_id: str, user_message: str, ai_response: str,
+                          clean_response: str, entities: Dict[str, Any],
+                          state: Optional[ShelfEntities] = None) -> ShelfEntities:
+        """Store an exchange and return the merged state.
+
+        The merge runs here against ``state`` (loaded under the session lock
+        earlier in the turn, else read now), so only changed fields and the
+        new versions are written.
+        """
+        entities_key, history_key = self._keys(session_id)
+        if state is None:
+            state = self._entities(await self.client.hgetall(entities_key))
+        changed = state.update(entities)
+        fields = {name: json.dumps(getattr(state, name)) for name in changed}
+        if changed:
+            fields[VERSIONS_FIELD] = json.dumps(state.versions())
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(
+                history_key,
+                json.dumps(["user", user_message, user_message]),
+                json.dumps(["ai", ai_response, clean_response]),
+            )
+            if fields:
+                pipe.hset(entities_key, mapping=fields)
+            pipe.hsetnx(entities_key, EPOCH_FIELD, json.dumps(secrets.token_hex(6)))
+            pipe.expire(entities_key, self.idle_ttl)
+            pipe.expire(history_key, self.idle_ttl)
+            await pipe.execute()
+        return state
+
+    async def history(self, session_id: str) -> List[Turn]:
+        _, history_key = self._keys(session_id)
+        return [Turn(*json.loads(item)) for item in await self.client.lrange(history_key, 0, -1)]
+
+    async def history_page(self, session_id: str, start: int = 0) -> Tuple[str, int, List[Turn]]:
+        """(version, total turns, turns from ``start``) in one round trip"""
+        entities_key, history_key = self._keys(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hget(entities_key, EPOCH_FIELD)
+            pipe.llen(history_key)
+            pipe.lrange(history_key, start, -1)
+            epoch, total, raw_history = await pipe.execute()
+        if not total:
+            return "0", 0, []
+        epoch = json.loads(epoch) if epoch else "0"
+        return f"{epoch}.{total}", total, [Turn(*json.loads(item)) for item in raw_history]
+
+    async def delete(self, session_id: str) -> None:
+        await self.client.delete(*self._keys(session_id))
+
+    @asynccontextmanager
+    async def lock(self, session_id: str) -> AsyncIterator[None]:
+        """Distributed lock so only one worker runs a turn for a session at a time"""
+        async with self.client.lock(self.prefix + session_id + ":lock", timeout=self.lock_timeout):
+            yield
+
+    async def start(self) -> None:
+        return None
+
+    async def ping(self) -> bool:
+        return await self.client.ping()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "idle_ttl": self.idle_ttl}
+
+
+def build_session_store(backend: str = SESSION_BACKEND):
+    """Create the store configured by SESSION_BACKEND (memory or redis).
+
+    The memory store only works with a single uvicorn worker; use redis to
+    run several workers or replicas. Setting SESSION_JOURNAL_DIR makes the
+    memory store survive restarts.
+    """
+    if backend == "memory":
+        return InMemorySessionStore(journal=SessionJournal() if SESSION_JOURNAL_DIR else None)
+    if backend == "redis":
+        return RedisSessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
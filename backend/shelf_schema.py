@@ -0,0 +1,261 @@
+import json
+import math
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+
+# Property of the structured reply that carries the prose shown to the customer
+REPLY_KEY = "reply"
+
+
+class EntityField(NamedTuple):
+    name: str           # session / model field name
+    frontend_key: str   # key the React configurator reads
+    kind: str           # JSON type of the value: number, integer, boolean, string or array
+    description: str
+    label: str          # used in the "current configuration" context block
+    unit: Optional[str] = None
+    options: Tuple[str, ...] = ()
+    essential: bool = False
+    default: Any = None  # value of an unset optional field in a canonical configuration
+    bounds: Optional[Tuple[int, int]] = None  # inclusive range of the value (of each item, for arrays)
+
+
+# Bounds of a canonical configuration; they also keep preview render cost in check
+MAX_DIMENSION = 240
+MAX_SHELVES = 20
+MAX_DIVIDERS = 20
+
+
+# The one definition of the shelf configuration: prompt, reply schema,
+# frontend mapping, session fields and context labels are all derived from it
+SHELF_FIELDS: Tuple[EntityField, ...] = (
+    EntityField("width", "width", "number", "Width of the shelf unit", "width (in)",
+                unit="in", essential=True, bounds=(1, MAX_DIMENSION)),
+    EntityField("length", "length", "number", "Depth/length of the shelf unit", "depth/length (in)",
+                unit="in", essential=True, bounds=(1, MAX_DIMENSION)),
+    EntityField("post_height", "postHeight", "number", "Post height, related to the number of shelves",
+                "post height (in)", unit="in", essential=True, bounds=(1, MAX_DIMENSION)),
+    EntityField("number_of_shelves", "numberOfShelves", "integer", "Shelf levels, related to post height",
+                "number of shelves", essential=True, bounds=(1, MAX_SHELVES)),
+    EntityField("shelf_style", "shelfStyle", "string", "Wire shelving style", "shelf style",
+                options=("Industrial Grid", "Commercial Wire", "Heavy Duty Mesh", "Ventilated Wire",
+                         "Open Grid Pro"), default="Industrial Grid"),
+    EntityField("solid_bottom_shelf", "solidBottomShelf", "boolean", "Add a solid bottom shelf",
+                "solid bottom shelf", default=False),
+    EntityField("color_and_finish", "color", "string", "Color and finish", "color and finish",
+                options=("Chrome", "Stainless Steel", "Black Epoxy", "White Epoxy", "Zinc Plated"), default="Chrome"),
+    EntityField("type_of_posts", "postType", "string", "Stationary or mobile (casters)", "type of posts",
+                options=("Stationary", "Mobile"), default="Stationary"),
+    EntityField("shelf_dividers_count", "shelfDividersCount", "integer", "Dividers per shelf (creates sections)",
+                "dividers per shelf", default=0, bounds=(0, MAX_DIVIDERS)),
+    EntityField("shelf_dividers_shelves", "shelfDividersShelves", "array",
+                "Shelf levels that get dividers, e.g. [1,2,3] for the top three", "shelves with dividers", default=(),
+                bounds=(1, MAX_SHELVES)),
+    EntityField("enclosure_type", "enclosureType", "string",
+                "top adds a top panel, sides adds panels on three sides", "enclosure panels",
+                options=("none", "top", "sides"), default="none"),
+)
+
+ENTITY_FIELDS = tuple(field.name for field in SHELF_FIELDS)
+# Field by session name or frontend key
+FIELDS_BY_KEY = {**{field.frontend_key: field for field in SHELF_FIELDS}, **{field.name: field for field in SHELF_FIELDS}}
+ESSENTIAL_FIELDS = tuple(field.name for field in SHELF_FIELDS if field.essential)
+
+# Frontend (camelCase) entity keys mapped onto the session fields
+ENTITY_ALIASES = {field.frontend_key: field.name for field in SHELF_FIELDS if field.frontend_key != field.name}
+
+# Session field name -> frontend key
+FRONTEND_KEYS = {field.name: field.frontend_key for field in SHELF_FIELDS}
+
+STATE_LABELS = {field.name: field.label for field in SHELF_FIELDS}
+
+def _parse_value(field: EntityField, raw: Any) -> Any:
+    if field.kind == "array":
+        items = raw.split(",") if isinstance(raw, str) else raw
+        return [int(item) for item in items if str(item).strip()]
+    if field.kind == "boolean":
+        if isinstance(raw, str):
+            if raw.lower() not in ("true", "false", "1", "0"):
+                raise ValueError("must be true or false")
+            return raw.lower() in ("true", "1")
+        return bool(raw)
+    if field.kind == "integer":
+        return int(float(raw))
+    if field.kind == "number":
+        value = float(raw)
+        if not math.isfinite(value):
+            raise ValueError("must be a finite number")
+        return round(value, 1)
+    if field.options and raw not in field.options:
+        raise ValueError(f"must be one of {', '.join(field.options)}")
+    return raw
+
+
+# Exact or case-insensitive spelling -> canonical option, per field with options
+_OPTION_LOOKUP = {field.name: {**{option.lower(): option for option in field.options},
+                               **{option: option for option in field.options}}
+                  for field in SHELF_FIELDS if field.options}
+
+# Python type a value of each kind already has once coerced
+_COERCED_TYPES = {"number": int, "integer": int, "boolean": bool}
+
+
+def _check_bounds(field: EntityField, value: Any) -> None:
+    """Raise ValueError when a value (or, for arrays, any item) is outside the field's bounds"""
+    if field.bounds is None:
+        return
+    low, high = field.bounds
+    for item in value if field.kind == "array" else (value,):
+        if not low <= item <= high:
+            unit = " inches" if field.unit == "in" else ""
+            raise ValueError(f"{field.name} must be between {low} and {high}{unit}")
+
+
+def coerce_entity(field: EntityField, raw: Any) -> Any:
+    """Typed session value of an extracted entity (None or "" clears it).
+
+    Whole numbers stay ints so prompts and responses read "48", not "48.0".
+    Raises ValueError for a value that doesn't fit the field, including
+    one outside the bounds a canonical configuration allows.
+    """
+    if raw is None or raw == "":
+        return None
+    # Most values arrive already typed (structured output, journal replay)
+    if type(raw) is _COERCED_TYPES.get(field.kind):
+        _check_bounds(field, raw)
+        return raw
+    if field.options:
+        options = _OPTION_LOOKUP[field.name]
+        option = options.get(raw) or options.get(raw.strip().lower()) if isinstance(raw, str) else None
+        if option is None:
+            raise ValueError(f"{field.name} must be one of {', '.join(field.options)}")
+        return option
+    try:
+        value = _parse_value(field, raw)
+    except TypeError as e:
+        raise ValueError(f"{field.name}: {e}") from e
+    _check_bounds(field, value)
+    return int(value) if field.kind == "number" and value.is_integer() else value
+
+
+def valid_entities(entities: Mapping[str, Any]) -> Dict[str, Any]:
+    """The extracted entities a session would accept, as given; unknown or out-of-range ones are left out"""
+    valid = {}
+    for key, raw in entities.items():
+        field = FIELDS_BY_KEY.get(key)
+        if field is None:
+            continue
+        try:
+            coerce_entity(field, raw)
+        except ValueError:
+            continue
+        valid[key] = raw
+    return valid
+
+
+def canonical_config(entities: Mapping[str, Any]) -> Dict[str, Any]:
+    """Validated configuration with every field set, from frontend or session entity names.
+
+    Unset optional fields take their defaults, so configurations that only
+    differ in spelling one out come out equal. Raises ValueError for
+    missing essentials or out-of-range values.
+    """
+    values = {ENTITY_ALIASES.get(key, key): value for key, value in entities.items()}
+    config = {}
+    for field in SHELF_FIELDS:
+        raw = values.get(field.name)
+        if raw is None or raw == "":
+            if field.essential:
+                raise ValueError(f"{field.name} is required")
+            config[field.name] = list(field.default) if field.kind == "array" else field.default
+            continue
+        try:
+            config[field.name] = _parse_value(field, raw)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{field.name}: {e}") from e
+
+    for field in SHELF_FIELDS:
+        # Divider levels beyond the shelf count are dropped below instead
+        if field.kind != "array":
+            _check_bounds(field, config[field.name])
+    levels = sorted({level for level in config["shelf_dividers_shelves"]
+                     if 1 <= level <= config["number_of_shelves"]})
+    config["shelf_dividers_shelves"] = levels if config["shelf_dividers_count"] else []
+    if not levels:
+        config["shelf_dividers_count"] = 0
+    return config
+
+
+def _value_schema(field: EntityField) -> Dict[str, Any]:
+    if field.options:
+        return {"type": ["string", "null"], "enum": [*field.options, None]}
+    if field.kind == "array":
+        return {"type": ["array", "null"], "items": {"type": "integer"}}
+    return {"type": [field.kind, "null"]}
+
+
+def turn_json_schema() -> Dict[str, Any]:
+    """JSON schema of one structured assistant turn"""
+    return {
+        "type": "object",
+        "properties": {
+            REPLY_KEY: {"type": "string"},
+            "extracted_entities": {
+                "type": "object",
+                "properties": {field.name: _value_schema(field) for field in SHELF_FIELDS},
+                "required": list(ENTITY_FIELDS),
+                "additionalProperties": False,
+            },
+            "has_sufficient_entities": {"type": "boolean"},
+            "next_questions": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": [REPLY_KEY, "extracted_entities", "has_sufficient_entities", "next_questions"],
+        "additionalProperties": False,
+    }
+
+
+def response_format() -> Dict[str, Any]:
+    """``response_format`` for the completions API: strict JSON-schema output"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "shelf_turn", "strict": True, "schema": turn_json_schema()},
+    }
+
+
+def _describe_field(field: EntityField) -> str:
+    kind = "one of " + "|".join(field.options) if field.options else field.kind
+    if field.unit:
+        kind += f", {field.unit}"
+    line = f"- {field.name} ({kind}): {field.description}"
+    return line + " [essential]" if field.essential else line
+
+
+def build_system_prompt(structured: bool) -> str:
+    """Compact system prompt generated from SHELF_FIELDS.
+
+    The text depends only on the schema and the output mode, so it is
+    byte-identical across workers and restarts and the provider can reuse
+    its cached prefix.
+    """
+    lines = [
+        "You are a friendly, professional wire shelf designer for a premium shelving company. "
+        "Talk like an experienced designer: ask clarifying questions naturally and suggest options "
+        "for the customer's use (garage, pantry, office, ...).",
+        "Configuration fields (null until the customer gives them):",
+        *(_describe_field(field) for field in SHELF_FIELDS),
+        "Rules: the 3D model needs every essential field; has_sufficient_entities is true only when all are set. "
+        "Acknowledge partial information and ask for the missing essentials. Other fields are optional. "
+        "Keep values already agreed unless the customer changes them. Convert sizes to inches.",
+    ]
+    if structured:
+        lines.append(
+            f"Answer as JSON: {REPLY_KEY} (your message to the customer), extracted_entities (every field, "
+            "null if unknown), has_sufficient_entities, next_questions (short follow-up questions)."
+        )
+    else:
+        template = json.dumps({
+            "extracted_entities": dict.fromkeys(ENTITY_FIELDS),
+            "has_sufficient_entities": False,
+            "next_questions": [],
+        }, separators=(",", ":"))
+        lines.append(f"End every reply with a ```json block of this shape (fill in values):\n```json\n{template}\n```")
+    return "\n".join(lines)
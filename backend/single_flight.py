@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _LeaderCancelled(Exception):
+    """Handed to followers when the caller running the work was cancelled"""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the work; callers arriving while it is
+    still in flight await the same result (or exception) instead of
+    starting their own. If the first caller is cancelled (its client went
+    away), a waiting follower runs the work itself and the rest join it.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        joined = False
+        while True:
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            if not joined:
+                self.coalesced += 1
+                joined = True
+            try:
+                # Shield so one follower's cancellation doesn't cancel the shared result
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                # Nobody cancelled this caller; take over the work or join whoever did
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved; followers (if any) re-raise it themselves
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,160 @@
+import json
+import re
+from typing import List
+
+from response_parser import split_response
+from shelf_schema import REPLY_KEY
+
+JSON_FENCE_OPEN = "```json"
+JSON_FENCE_CLOSE = "```"
+
+
+class ResponseStreamSplitter:
+    """Split a streamed AI reply into prose and the trailing ```json block.
+
+    Prose is released as soon as it cannot be the start of the JSON fence;
+    everything from the fence onwards is held back so the client never sees
+    the raw entity block.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._pending = ""
+        self._json_tail = None
+        self.json_complete = False
+
+    @property
+    def response(self) -> str:
+        """Full reply received so far, JSON block included"""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> str:
+        """Add a streamed chunk and return the prose that is safe to emit"""
+        if not chunk:
+            return ""
+        self._chunks.append(chunk)
+
+        if self._json_tail is not None:
+            self._json_tail += chunk
+            self._check_json_complete()
+            return ""
+
+        self._pending += chunk
+        fence_at = self._pending.find(JSON_FENCE_OPEN)
+        if fence_at >= 0:
+            text = self._pending[:fence_at]
+            self._json_tail = self._pending[fence_at:]
+            self._pending = ""
+            self._check_json_complete()
+            return text
+
+        # Hold back any suffix that could still grow into the fence
+        hold = 0
+        for size in range(min(len(JSON_FENCE_OPEN) - 1, len(self._pending)), 0, -1):
+            if JSON_FENCE_OPEN.startswith(self._pending[-size:]):
+                hold = size
+                break
+        text = self._pending[:len(self._pending) - hold]
+        self._pending = self._pending[len(self._pending) - hold:]
+        return text
+
+    def finish(self) -> str:
+        """Flush prose held back at the end of the stream"""
+        text, self._pending = self._pending, ""
+        return text
+
+    def _check_json_complete(self):
+        self.json_complete = self._json_tail.find(JSON_FENCE_CLOSE, len(JSON_FENCE_OPEN)) >= 0
+
+
+_REPLY_START = re.compile(r'"' + REPLY_KEY + r'"\s*:\s*"')
+_ESCAPE_LENGTHS = {"u": 6}
+
+
+class StructuredReplySplitter:
+    """Stream the "reply" string out of a structured-output (JSON) reply.
+
+    The JSON string is decoded incrementally, escapes included, so the
+    client sees plain prose while the rest of the object is held back.
+    Same interface as ResponseStreamSplitter.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._buffer = ""
+        self._position = -1   # index of the next undecoded reply character, -1 before the reply starts
+        self._reply_done = False
+        self.json_complete = False
+
+    @property
+    def response(self) -> str:
+        """Full reply received so far"""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> str:
+        """Add a streamed chunk and return the prose that is safe to emit"""
+        if not chunk:
+            return ""
+        self._chunks.append(chunk)
+        self._buffer += chunk
+
+        if self._reply_done:
+            self._check_json_complete()
+            return ""
+        if self._position < 0:
+            match = _REPLY_START.search(self._buffer)
+            if match is None:
+                return ""
+            self._position = match.end()
+        return self._decode()
+
+    def finish(self) -> str:
+        """Prose of a reply that never contained a structured "reply" string"""
+        if self._position >= 0:
+            return ""
+        return split_response(self.response)[0]
+
+    def _decode(self) -> str:
+        buffer = self._buffer
+        out = []
+        index = self._position
+        while index < len(buffer):
+            char = buffer[index]
+            if char == '"':
+                self._reply_done = True
+                index += 1
+                break
+            if char != "\\":
+                end = index + 1
+                while end < len(buffer) and buffer[end] not in '"\\':
+                    end += 1
+                out.append(buffer[index:end])
+                index = end
+                continue
+            # Escape sequence: wait until it has fully arrived
+            if index + 1 >= len(buffer):
+                break
+            length = _ESCAPE_LENGTHS.get(buffer[index + 1], 2)
+            if index + length > len(buffer):
+                break
+            escape = buffer[index:index + length]
+            if length == 6 and 0xD800 <= int(escape[2:], 16) <= 0xDBFF:
+                # High surrogate: decode together with the low surrogate that follows
+                if index + 12 > len(buffer):
+                    break
+                escape = buffer[index:index + 12]
+            out.append(json.loads(f'"{escape}"'))
+            index += len(escape)
+        self._position = index
+        if self._reply_done:
+            self._check_json_complete()
+        return "".join(out)
+
+    def _check_json_complete(self):
+        tail = self._buffer.rstrip()
+        if tail.endswith("}"):
+            try:
+                json.loads(tail)
+            except ValueError:
+                return
+            self.json_complete = True
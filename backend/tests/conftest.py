@@ -0,0 +1,28 @@
+"""Shared fixtures; run the suite from the backend directory with ``python -m pytest``."""
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other flat, as uvicorn runs them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+from admission import AdmissionController
+from resilience import ResilientCaller
+from session_store import InMemorySessionStore
+from single_flight import SingleFlight
+
+
+@pytest.fixture
+def app_server(monkeypatch):
+    """The server module with a fresh memory store and no cache, intent index or catalog"""
+    monkeypatch.setattr(server, "session_store", InMemorySessionStore())
+    monkeypatch.setattr(server, "completion_cache", None)
+    monkeypatch.setattr(server, "intent_index", None)
+    monkeypatch.setattr(server, "catalog", None)
+    monkeypatch.setattr(server, "chat_single_flight", SingleFlight())
+    admission = AdmissionController()
+    monkeypatch.setattr(server, "llm_admission", admission)
+    monkeypatch.setattr(server, "llm_resilience", ResilientCaller(admission=admission))
+    return server
@@ -0,0 +1,47 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_llm import FakeAsyncLLM
+from profiling import RequestProfiler, session_tag
+
+ADMIN_ROUTES = ["/api/admin/profiles", "/api/admin/profiles/1", "/api/admin/loop-lag"]
+TOKEN = "s3cret-admin-token"
+
+
+@pytest.fixture
+def client(app_server, monkeypatch):
+    monkeypatch.setattr(app_server, "cerebras_client", FakeAsyncLLM(latency=0))
+    monkeypatch.setattr(app_server, "request_profiler", RequestProfiler(sample_rate=1.0))
+    return TestClient(app_server.app)
+
+
+@pytest.mark.parametrize("path", ADMIN_ROUTES)
+def test_admin_routes_are_off_without_a_token(app_server, client, monkeypatch, path):
+    monkeypatch.setattr(app_server, "ADMIN_TOKEN", "")
+    assert client.get(path, headers={"Authorization": "Bearer "}).status_code == 404
+
+
+@pytest.mark.parametrize("path", ADMIN_ROUTES)
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong", TOKEN, f"Basic {TOKEN}"])
+def test_admin_routes_need_the_bearer_token(app_server, client, monkeypatch, path, authorization):
+    monkeypatch.setattr(app_server, "ADMIN_TOKEN", TOKEN)
+    headers = {"Authorization": authorization} if authorization else {}
+    response = client.get(path, headers=headers)
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_profile_labels_do_not_reveal_session_ids(app_server, client, monkeypatch):
+    monkeypatch.setattr(app_server, "ADMIN_TOKEN", TOKEN)
+    session_id = "customer-7f3a9c"
+    assert client.post("/api/chat", json={"message": "I need a shelf", "session_id": session_id}).status_code == 200
+
+    response = client.get("/api/admin/profiles", headers={"Authorization": f"Bearer {TOKEN}"})
+
+    assert response.status_code == 200
+    assert session_id not in response.text
+    assert session_tag(session_id) in response.text
+
+
+def test_profile_header_is_ignored_by_default():
+    assert not RequestProfiler(sample_rate=0).wanted("1")
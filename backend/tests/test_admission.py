@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def controller() -> AdmissionController:
+    # Rate tokens refill slowly enough that a returned token is obvious
+    return AdmissionController(max_concurrency=1, rate=0.01, burst=2, max_queue=8, max_queue_time=0.05)
+
+
+def test_queue_timeout_returns_the_rate_token():
+    async def scenario():
+        admission = controller()
+        async with admission.admit():
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with admission.admit():
+                    pass
+        return admission, rejected.value
+
+    admission, rejected = asyncio.run(scenario())
+
+    assert rejected.reason == "queue_timeout"
+    assert rejected.status_code == 503
+    # Only the admitted call spent a token
+    assert admission.bucket.tokens == pytest.approx(1, abs=0.01)
+
+
+def test_cancelled_wait_returns_the_rate_token():
+    async def scenario():
+        admission = controller()
+        async with admission.admit():
+            waiter = asyncio.ensure_future(admission.admit().__aenter__())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        return admission
+
+    admission = asyncio.run(scenario())
+
+    assert admission.bucket.tokens == pytest.approx(1, abs=0.01)
+    assert admission.waiting == 0
+
+
+def test_rate_limited_rejection_returns_the_rate_token():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=4, rate=0.01, burst=1, max_queue=8, max_queue_time=0.05)
+        async with admission.admit():
+            pass
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit():
+                pass
+        return admission, rejected.value
+
+    admission, rejected = asyncio.run(scenario())
+
+    assert rejected.reason == "rate_limited"
+    assert rejected.status_code == 429
+    assert admission.bucket.tokens == pytest.approx(0, abs=0.01)
+
+
+def test_rate_delay_close_to_the_queue_time_still_takes_a_free_slot():
+    async def scenario():
+        # The second token is due just inside max_queue_time, leaving no time for the slot wait
+        admission = AdmissionController(max_concurrency=4, rate=10, burst=1, max_queue=8, max_queue_time=0.1)
+        async with admission.admit():
+            pass
+        async with admission.admit():
+            pass
+        return admission
+
+    admission = asyncio.run(scenario())
+
+    assert admission.admitted == 2
+    assert admission.rejected["queue_timeout"] == 0
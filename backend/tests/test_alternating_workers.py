@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from benchmarks.fake_llm import ReplayLLM
+from benchmarks.fake_redis import FakeRedis
+from session_store import RedisSessionStore
+
+
+def reply(text: str, **entities) -> str:
+    return f"{text}\n\n```json\n{json.dumps({'extracted_entities': entities, 'next_questions': []})}\n```"
+
+
+TURNS = [
+    ("I need a garage shelf 48 inches wide", reply("48 inches wide, got it.", width=48)),
+    ("make it 18 deep", reply("18 inches deep.", length=18)),
+    ("72 tall please", reply("72 inches tall.", post_height=72)),
+    ("and 4 levels", reply("Four shelves, that completes it.", number_of_shelves=4)),
+]
+
+
+def test_conversation_survives_alternating_workers(app_server, monkeypatch):
+    # Two workers: separate stores, and so no shared Python state, on one Redis
+    redis = FakeRedis()
+    workers = [RedisSessionStore(client=redis), RedisSessionStore(client=redis)]
+    monkeypatch.setattr(app_server, "FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(app_server, "cerebras_client", ReplayLLM(dict(TURNS)))
+
+    async def scenario():
+        responses, version = [], None
+        for index, (message, _) in enumerate(TURNS):
+            app_server.session_store = workers[index % 2]
+            request = app_server.ChatMessage(message=message, session_id="alternating", known_version=version)
+            response = await app_server.chat_with_ai(request)
+            response = response if isinstance(response, dict) else response.model_dump()
+            version = response["state_version"]
+            responses.append(response)
+        return responses, [await worker.load("alternating") for worker in workers]
+
+    responses, records = asyncio.run(scenario())
+
+    # Each worker's reply carries only what that turn changed, on top of the other worker's state
+    assert [response["changes"] for response in responses] == [
+        {"width": 48}, {"length": 18}, {"postHeight": 72}, {"numberOfShelves": 4},
+    ]
+    assert [response["state_version"] for response in responses] == [1, 2, 3, 4]
+    assert [response["has_sufficient_entities"] for response in responses] == [False, False, False, True]
+    for record in records:
+        assert [turn.content for turn in record.history if turn.type == "user"] == [message for message, _ in TURNS]
+        assert record.entities.changes_since(None) == {"width": 48, "length": 18, "postHeight": 72,
+                                                       "numberOfShelves": 4}
+        assert record.entities.version == 4
@@ -0,0 +1,43 @@
+import csv
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from batch import BATCH_MAX_MESSAGES
+from batch_cli import read_jobs, split_long_jobs
+from benchmarks.fake_llm import FakeAsyncLLM
+
+TURNS = BATCH_MAX_MESSAGES * 2 + 5
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["session_id", "message"])
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_long_csv_session_is_sent_as_ordered_parts_the_server_accepts(app_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_server, "cerebras_client", FakeAsyncLLM(latency=0))
+    messages = [f"turn {number}" for number in range(TURNS)]
+    path = write_csv(tmp_path / "turns.csv", [("long", message) for message in messages] + [("", "hello")])
+
+    jobs = split_long_jobs(read_jobs(path), BATCH_MAX_MESSAGES)
+
+    assert [len(job["messages"]) for job in jobs] == [BATCH_MAX_MESSAGES, BATCH_MAX_MESSAGES, 5, 1]
+    assert [message for job in jobs[:3] for message in job["messages"]] == messages
+    assert {job["session_id"] for job in jobs[:3]} == {"long"}
+
+    response = TestClient(app_server.app).post("/api/chat/batch", json={"jobs": jobs})
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert all(result["error"] is None for result in results)
+    history = TestClient(app_server.app).get("/api/chat/history/long").json()
+    assert [turn["content"] for turn in history if turn["type"] == "user"] == messages
+
+
+def test_long_job_without_a_session_is_rejected():
+    with pytest.raises(ValueError, match="no session_id"):
+        split_long_jobs([{"messages": ["hi"] * (BATCH_MAX_MESSAGES + 1)}], BATCH_MAX_MESSAGES)
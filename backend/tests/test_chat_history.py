@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_llm import CANNED_REPLY, FakeAsyncLLM, to_structured
+from response_parser import split_response
+
+PROSE = split_response(CANNED_REPLY)[0]
+
+
+def test_history_returns_the_prose_by_default(app_server, monkeypatch):
+    monkeypatch.setattr(app_server, "STRUCTURED_OUTPUT", True)
+    monkeypatch.setattr(app_server, "cerebras_client", FakeAsyncLLM(latency=0))
+    asyncio.run(app_server.chat_with_ai(app_server.ChatMessage(message="I need a shelf", session_id="h")))
+    client = TestClient(app_server.app)
+
+    default = client.get("/api/chat/history/h")
+    raw = client.get("/api/chat/history/h?clean=false")
+
+    assert default.json() == [{"type": "user", "content": "I need a shelf"}, {"type": "ai", "content": PROSE}]
+    # The raw form is the structured reply as the model sent it
+    assert json.loads(raw.json()[1]["content"]) == json.loads(to_structured(CANNED_REPLY))
+    assert default.headers["etag"] != raw.headers["etag"]
+
+
+def test_history_revalidation_and_incremental_fetch(app_server, monkeypatch):
+    monkeypatch.setattr(app_server, "cerebras_client", FakeAsyncLLM(latency=0))
+    asyncio.run(app_server.chat_with_ai(app_server.ChatMessage(message="first", session_id="h")))
+    client = TestClient(app_server.app)
+
+    first = client.get("/api/chat/history/h")
+    unchanged = client.get("/api/chat/history/h", headers={"If-None-Match": first.headers["etag"]})
+    asyncio.run(app_server.chat_with_ai(app_server.ChatMessage(message="second", session_id="h")))
+    newest = client.get(f"/api/chat/history/h?after={first.headers['x-history-length']}")
+
+    assert unchanged.status_code == 304
+    assert [turn["content"] for turn in newest.json()] == ["second", PROSE]
+    assert newest.headers["x-history-length"] == "4"
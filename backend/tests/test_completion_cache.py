@@ -0,0 +1,99 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import model_router
+from benchmarks.fake_llm import make_completion, reply_text
+from completion_cache import build_completion_cache, make_cache_key
+from context_builder import build_context
+
+PARAMS = {"model": "test", "temperature": 0}
+SYSTEM_PROMPT = "You design wire shelving."
+
+
+def history(*exchanges):
+    turns = []
+    for user, assistant in exchanges:
+        turns.append(SimpleNamespace(type="user", content=user, clean=user))
+        turns.append(SimpleNamespace(type="ai", content=assistant, clean=assistant))
+    return turns
+
+
+def windowed_key(entities):
+    turns = history(("older question", "older answer"), ("how tall?", "72 inches."))
+    messages, _ = build_context(SYSTEM_PROMPT, turns, entities, "add 5 shelves", max_turns=1)
+    return make_cache_key(PARAMS, SYSTEM_PROMPT, messages)
+
+
+def test_sessions_with_different_state_get_different_keys():
+    # Same windowed turns, different agreed configuration in the state block
+    assert windowed_key({"width": 48, "length": 24}) != windowed_key({"width": 60, "length": 18})
+
+
+def test_same_state_and_turns_share_a_key():
+    assert windowed_key({"width": 48, "length": 24}) == windowed_key({"width": 48, "length": 24})
+
+
+def test_key_ignores_whitespace_and_case_of_user_turns():
+    first = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": "48 Wide,  24 deep"}]
+    second = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": "48 wide, 24 deep "}]
+    assert make_cache_key(PARAMS, SYSTEM_PROMPT, first) == make_cache_key(PARAMS, SYSTEM_PROMPT, second)
+
+
+class ModelLLM:
+    """Answers '48 inches wide' with a matching reply and records which model was asked"""
+
+    def __init__(self):
+        self.models = []
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, messages, model, stream=False, **kwargs):
+        self.models.append(model)
+        block = json.dumps({"extracted_entities": {"width": 48}, "has_sufficient_entities": False,
+                            "next_questions": ["How deep?"]})
+        return make_completion(reply_text(f"48 inches wide from {model}.\n\n```json\n{block}\n```", kwargs))
+
+
+def routed(route: str):
+    def choose(message, state):
+        decision = model_router.choose_route(message, state)
+        assert decision.route == "small"
+        return decision if route == "small" else decision._replace(route="large", model=model_router.LARGE_MODEL)
+    return choose
+
+
+def turn(server, session_id: str):
+    async def scenario():
+        return await server.chat_with_ai(server.ChatMessage(message="48 inches wide", session_id=session_id))
+    return asyncio.run(scenario()).response
+
+
+def test_small_model_replies_are_not_served_to_large_route_turns(app_server, monkeypatch):
+    llm = ModelLLM()
+    monkeypatch.setattr(app_server, "cerebras_client", llm)
+    monkeypatch.setattr(app_server, "completion_cache", build_completion_cache("memory"))
+
+    monkeypatch.setattr(app_server, "choose_route", routed("small"))
+    small = turn(app_server, "first")
+    monkeypatch.setattr(app_server, "choose_route", routed("large"))
+    large = turn(app_server, "second")
+
+    assert llm.models == [model_router.SMALL_MODEL, model_router.LARGE_MODEL]
+    assert model_router.SMALL_MODEL in small
+    assert model_router.LARGE_MODEL in large
+
+
+def test_small_route_turns_reuse_large_model_replies(app_server, monkeypatch):
+    llm = ModelLLM()
+    monkeypatch.setattr(app_server, "cerebras_client", llm)
+    monkeypatch.setattr(app_server, "completion_cache", build_completion_cache("memory"))
+
+    monkeypatch.setattr(app_server, "choose_route", routed("large"))
+    turn(app_server, "first")
+    monkeypatch.setattr(app_server, "choose_route", routed("small"))
+    reused = turn(app_server, "second")
+
+    assert llm.models == [model_router.LARGE_MODEL]
+    assert model_router.LARGE_MODEL in reused
+    assert app_server.completion_cache.stats()["hits"] == 1
+    assert app_server.completion_cache.stats()["misses"] == 1
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from benchmarks.fake_llm import FakeAsyncLLM, make_completion, reply_text
+
+LATENCY = 0.3
+CHATS = 10
+
+
+class EchoLLM(FakeAsyncLLM):
+    """Slow fake that answers with the user message and records peak concurrency"""
+
+    def __init__(self, latency: float):
+        super().__init__(latency=latency)
+        self.active = 0
+        self.peak = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, messages, stream=False, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        return make_completion(reply_text(f"Noted: {messages[-1]['content']}", kwargs))
+
+
+def chat(server, message: str, session_id: str):
+    return server.chat_with_ai(server.ChatMessage(message=message, session_id=session_id))
+
+
+async def max_loop_lag(work) -> tuple:
+    """Await ``work()`` while a 10 ms ticker measures how late the loop wakes it"""
+    lags = []
+
+    async def tick():
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - before - 0.01)
+
+    ticker = asyncio.create_task(tick())
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    ticker.cancel()
+    return elapsed, max(lags)
+
+
+def test_parallel_chats_overlap_and_keep_the_loop_responsive(app_server, monkeypatch):
+    llm = EchoLLM(LATENCY)
+    monkeypatch.setattr(app_server, "cerebras_client", llm)
+
+    def work():
+        return asyncio.gather(*(chat(app_server, "I need a shelf for my garage", f"parallel-{i}") for i in range(CHATS)))
+
+    elapsed, lag = asyncio.run(max_loop_lag(work))
+
+    assert llm.calls == CHATS
+    assert llm.peak == CHATS
+    # Serial would be CHATS * LATENCY
+    assert elapsed < 2 * LATENCY
+    assert lag < 0.1
+
+
+def test_turns_for_one_session_run_one_at_a_time_in_order(app_server, monkeypatch):
+    llm = EchoLLM(0.05)
+    monkeypatch.setattr(app_server, "cerebras_client", llm)
+    messages = [f"Question {i} about my garage shelf" for i in range(5)]
+
+    async def scenario():
+        await asyncio.gather(*(chat(app_server, message, "serial") for message in messages))
+        return await app_server.session_store.history("serial")
+
+    history = asyncio.run(scenario())
+
+    assert llm.peak == 1
+    assert [turn.type for turn in history] == ["user", "ai"] * len(messages)
+    for question, answer in zip(history[::2], history[1::2]):
+        assert answer.clean == f"Noted: {question.content}"
+    # A task started first takes the lock first
+    assert [turn.content for turn in history[::2]] == messages
@@ -0,0 +1,67 @@
+import asyncio
+
+from benchmarks.fake_llm import FakeAsyncLLM
+
+SUBMITS = 10
+
+
+def test_identical_submits_share_one_upstream_call(app_server, monkeypatch):
+    llm = FakeAsyncLLM(latency=0.05)
+    monkeypatch.setattr(app_server, "cerebras_client", llm)
+    # A double-click storm, including a copy with stray whitespace
+    messages = ["I need a shelf for my garage"] * (SUBMITS - 1) + ["I need a shelf  for my garage "]
+
+    async def scenario():
+        responses = await asyncio.gather(*(
+            app_server.chat_with_ai(app_server.ChatMessage(message=message, session_id="dupes"))
+            for message in messages
+        ))
+        return responses, await app_server.session_store.history("dupes")
+
+    responses, history = asyncio.run(scenario())
+
+    assert llm.calls == 1
+    assert len(responses) == SUBMITS
+    assert all(response.model_dump() == responses[0].model_dump() for response in responses)
+    assert [turn.type for turn in history] == ["user", "ai"]
+
+
+def test_a_resubmit_after_the_turn_finished_runs_again(app_server, monkeypatch):
+    llm = FakeAsyncLLM(latency=0)
+    monkeypatch.setattr(app_server, "cerebras_client", llm)
+    request = app_server.ChatMessage(message="I need a shelf for my garage", session_id="again")
+
+    async def scenario():
+        await app_server.chat_with_ai(request)
+        await app_server.chat_with_ai(request)
+        return await app_server.session_store.history("again")
+
+    history = asyncio.run(scenario())
+
+    assert llm.calls == 2
+    assert len(history) == 4
+
+
+def test_followers_survive_the_leader_being_cancelled(app_server, monkeypatch):
+    llm = FakeAsyncLLM(latency=0.05)
+    monkeypatch.setattr(app_server, "cerebras_client", llm)
+    request = app_server.ChatMessage(message="I need a shelf for my garage", session_id="gone")
+
+    async def scenario():
+        leader = asyncio.ensure_future(app_server.chat_with_ai(request))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(app_server.chat_with_ai(request)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # The first client disconnects mid-turn
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        responses = await asyncio.gather(*followers)
+        return leader, responses, await app_server.session_store.history("gone")
+
+    leader, responses, history = asyncio.run(scenario())
+
+    assert leader.cancelled()
+    assert all(response.model_dump() == responses[0].model_dump() for response in responses)
+    # One follower re-ran the turn for all of them
+    assert llm.calls == 2
+    assert [turn.type for turn in history] == ["user", "ai"]
@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+from fast_path import extract_spec, fast_path_turn
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "benchmarks", "data", "spec_messages.json")
+
+with open(CORPUS) as f:
+    SPEC_MESSAGES = json.load(f)
+
+
+@pytest.mark.parametrize("item", SPEC_MESSAGES, ids=[item["message"] for item in SPEC_MESSAGES])
+def test_fast_path_routing(item):
+    turn = fast_path_turn(item["message"], {})
+    assert (turn is not None) == item["fast_path"]
+    if turn is not None:
+        assert extract_spec(item["message"]).entities == item["expected"]
+
+
+@pytest.mark.parametrize("message, field", [
+    ("48x24x72, 5 shelves, no wheels", "type_of_posts"),
+    ("48x24x72, 5 shelves, remove the casters", "type_of_posts"),
+    ("48x24x72, 5 shelves, I dont want black", "color_and_finish"),
+    ("48x24x72, 5 shelves, without the top panel", "enclosure_type"),
+    ("48x24x72, 5 shelves, chrome or black for a garage", "color_and_finish"),
+])
+def test_negated_or_alternative_options_are_not_picked(message, field):
+    extraction = extract_spec(message)
+    assert extraction.hedged
+    assert field not in extraction.entities
+
+
+def test_negation_in_an_earlier_clause_does_not_hedge():
+    extraction = extract_spec("no, stationary")
+    assert not extraction.hedged
+    assert extraction.entities == {"type_of_posts": "Stationary"}
@@ -0,0 +1,37 @@
+import asyncio
+
+from benchmarks.fake_llm import FakeAsyncLLM
+from intent_index import load_intent_index
+
+
+def send(app_server, session_id, messages):
+    async def scenario():
+        return [await app_server.chat_with_ai(app_server.ChatMessage(message=message, session_id=session_id))
+                for message in messages]
+
+    return asyncio.run(scenario())
+
+
+def test_opener_after_the_app_greeting_is_answered_from_the_index(app_server, monkeypatch):
+    llm = FakeAsyncLLM(latency=0)
+    monkeypatch.setattr(app_server, "cerebras_client", llm)
+    monkeypatch.setattr(app_server, "intent_index", load_intent_index())
+    monkeypatch.setitem(app_server.chat_path_counts, "intent", 0)
+
+    # The sequence frontend/src/App.js sends: its greeting on load, then what the customer typed
+    greeting, opener = send(app_server, "app", [app_server.APP_GREETING, "I need a shelf for my garage"])
+
+    assert llm.calls == 1
+    assert app_server.chat_path_counts["intent"] == 1
+    assert "garage" in opener.response
+
+
+def test_later_turns_are_not_treated_as_openers(app_server, monkeypatch):
+    llm = FakeAsyncLLM(latency=0)
+    monkeypatch.setattr(app_server, "cerebras_client", llm)
+    monkeypatch.setattr(app_server, "intent_index", load_intent_index())
+    monkeypatch.setitem(app_server.chat_path_counts, "intent", 0)
+
+    send(app_server, "later", [app_server.APP_GREETING, "I want 48 inches wide", "I need a shelf for my garage"])
+
+    assert app_server.chat_path_counts["intent"] == 0
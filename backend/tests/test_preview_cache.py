@@ -0,0 +1,103 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import preview_renderer
+from preview_cache import PreviewBusy, PreviewCache
+
+PNG_BYTES = 1000
+
+
+def fake_render(config, size):
+    return b"\x89PNG" + bytes(PNG_BYTES - 4)
+
+
+def config(width: int):
+    return {"width": width, "length": 18, "postHeight": 72, "numberOfShelves": 4}
+
+
+def disk_usage(directory):
+    return sum(entry.stat().st_size for shard in os.scandir(directory) for entry in os.scandir(shard.path))
+
+
+def test_disk_cache_stays_under_its_byte_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(preview_renderer, "render_png", fake_render)
+    cache = PreviewCache(directory=str(tmp_path), max_entries=1, max_disk_bytes=10 * PNG_BYTES)
+
+    async def scenario():
+        for width in range(30):
+            await cache.get(config(width))
+
+    asyncio.run(scenario())
+    cache.close()
+
+    assert disk_usage(tmp_path) <= 10 * PNG_BYTES
+    assert cache.stats()["disk_evictions"] >= 20
+    assert cache.disk_bytes == disk_usage(tmp_path)
+
+
+def test_recently_served_files_outlive_older_ones(tmp_path, monkeypatch):
+    monkeypatch.setattr(preview_renderer, "render_png", fake_render)
+    cache = PreviewCache(directory=str(tmp_path), max_entries=1, max_disk_bytes=3 * PNG_BYTES)
+
+    async def scenario():
+        for width in (1, 2, 3):
+            await cache.get(config(width))
+            time.sleep(0.01)
+        # From disk: the memory cache only holds the latest image
+        await cache.get(config(1))
+        time.sleep(0.01)
+        await cache.get(config(4))
+        cache._entries.clear()
+        renders = cache.renders
+        await cache.get(config(1))
+        return cache.renders - renders
+
+    assert asyncio.run(scenario()) == 0
+    cache.close()
+
+
+def test_misses_beyond_the_pending_limit_are_refused(monkeypatch):
+    release = threading.Event()
+
+    def blocked_render(config, size):
+        release.wait(5)
+        return fake_render(config, size)
+
+    monkeypatch.setattr(preview_renderer, "render_png", blocked_render)
+    cache = PreviewCache(workers=1, max_pending=2)
+
+    async def scenario():
+        pending = [asyncio.ensure_future(cache.get(config(width))) for width in (1, 2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(PreviewBusy) as busy:
+            await cache.get(config(3))
+        # The same image as a pending render shares it instead
+        same = asyncio.ensure_future(cache.get(config(1)))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*pending, same)
+        return busy.value
+
+    busy = asyncio.run(scenario())
+    cache.close()
+
+    assert int(busy.headers["Retry-After"]) >= 1
+    assert cache.stats()["rejected"] == 1
+    assert cache.pending == 0
+
+
+def test_busy_preview_is_a_503_with_retry_after(app_server, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    async def busy(config, size):
+        raise PreviewBusy(2.5)
+
+    monkeypatch.setattr(app_server.preview_cache, "get", busy)
+    response = TestClient(app_server.app).get("/api/preview.png", params=config(48))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
@@ -0,0 +1,209 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from cerebras.cloud.sdk import BadRequestError
+
+from admission import AdmissionController
+from benchmarks.fake_llm import FakeAsyncLLM
+from resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, within_deadline
+
+
+def half_open_caller() -> ResilientCaller:
+    """A caller whose breaker has tripped and is ready to let one probe through"""
+    caller = ResilientCaller(max_attempts=1, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0))
+    caller.breaker.record_failure()
+    assert caller.breaker.state == "open"
+    return caller
+
+
+async def ok(timeout: float) -> str:
+    return "ok"
+
+
+async def hang(timeout: float) -> str:
+    await asyncio.sleep(3600)
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    async def scenario():
+        caller = half_open_caller()
+        probe = asyncio.ensure_future(caller.call(hang))
+        await asyncio.sleep(0.01)
+        assert caller.breaker.state == "half_open"
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        return caller, await caller.call(ok)
+
+    caller, result = asyncio.run(scenario())
+
+    assert result == "ok"
+    assert caller.breaker.state == "closed"
+
+
+def test_cancelled_stream_probe_lets_the_next_call_probe():
+    async def stream(caller):
+        async with caller.guard():
+            await asyncio.sleep(3600)
+
+    async def scenario():
+        caller = half_open_caller()
+        probe = asyncio.ensure_future(stream(caller))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        async with caller.guard():
+            pass
+        return caller
+
+    assert asyncio.run(scenario()).breaker.state == "closed"
+
+
+def test_closed_stream_generator_lets_the_next_call_probe():
+    async def tokens(caller):
+        async with caller.guard():
+            yield "first"
+            yield "second"
+
+    async def scenario():
+        caller = half_open_caller()
+        stream = tokens(caller)
+        await stream.__anext__()
+        # The client went away mid-stream
+        await stream.aclose()
+        return caller, await caller.call(ok)
+
+    caller, result = asyncio.run(scenario())
+
+    assert result == "ok"
+    assert caller.breaker.state == "closed"
+
+
+async def bad_request(timeout: float) -> str:
+    response = httpx.Response(400, request=httpx.Request("POST", "https://api.cerebras.ai/v1/chat/completions"))
+    raise BadRequestError("bad request", response=response, body=None)
+
+
+def test_client_error_on_the_probe_leaves_the_breaker_half_open():
+    async def scenario():
+        caller = half_open_caller()
+        with pytest.raises(BadRequestError):
+            await caller.call(bad_request)
+        return caller
+
+    caller = asyncio.run(scenario())
+
+    assert caller.breaker.state == "half_open"
+    assert caller.breaker.failures == 1
+    # The next call is allowed to probe
+    assert asyncio.run(caller.call(ok)) == "ok"
+    assert caller.breaker.state == "closed"
+
+
+def test_client_error_on_a_stream_probe_leaves_the_breaker_half_open():
+    async def scenario():
+        caller = half_open_caller()
+        with pytest.raises(BadRequestError):
+            async with caller.guard():
+                await bad_request(1)
+        return caller
+
+    assert asyncio.run(scenario()).breaker.state == "half_open"
+
+
+def test_a_probe_in_flight_still_short_circuits_other_calls():
+    async def scenario():
+        caller = half_open_caller()
+        probe = asyncio.ensure_future(caller.call(hang))
+        await asyncio.sleep(0.01)
+        with pytest.raises(CircuitOpenError):
+            await caller.call(ok)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_within_deadline_stops_a_trickling_stream():
+    async def trickle():
+        while True:
+            await asyncio.sleep(0.02)
+            yield "token"
+
+    async def scenario():
+        received = []
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            async for token in within_deadline(trickle(), started + 0.1):
+                received.append(token)
+        return received, time.monotonic() - started
+
+    received, elapsed = asyncio.run(scenario())
+
+    assert 0 < len(received) < 10
+    assert elapsed < 0.2
+
+
+def test_streamed_turn_gets_an_overall_deadline(app_server, monkeypatch):
+    # Every read is quick, but the whole reply would take seconds
+    monkeypatch.setattr(app_server, "cerebras_client", FakeAsyncLLM(latency=5))
+    monkeypatch.setattr(app_server.llm_resilience, "deadline", 0.2)
+
+    async def scenario():
+        started = time.monotonic()
+        events = [event async for event in app_server.chat_turn_events("trickle", "I need a shelf for my garage")]
+        elapsed = time.monotonic() - started
+        # The session lock and the admission slot are free again
+        async with app_server.session_store.lock("trickle"):
+            pass
+        return events, elapsed
+
+    events, elapsed = asyncio.run(scenario())
+
+    assert events[-1][0] == "error"
+    assert events[-1][1]["status"] == 504
+    assert elapsed < 1
+    assert app_server.llm_admission.in_flight == 0
+
+
+def hedging_caller(max_concurrency: int) -> ResilientCaller:
+    admission = AdmissionController(max_concurrency=max_concurrency)
+    return ResilientCaller(max_attempts=1, hedge=True, hedge_delay=0.01, admission=admission)
+
+
+async def slow(timeout: float) -> str:
+    await asyncio.sleep(0.05)
+    return "ok"
+
+
+def test_hedge_is_skipped_without_spare_admission_capacity():
+    async def scenario():
+        caller = hedging_caller(1)
+        async with caller.admission.admit():
+            return caller, await caller.call(slow)
+
+    caller, result = asyncio.run(scenario())
+
+    assert result == "ok"
+    assert caller.counts["hedges"] == 0
+    assert caller.counts["hedges_skipped"] == 1
+
+
+def test_hedge_holds_an_admission_slot_while_it_runs():
+    async def scenario():
+        caller = hedging_caller(2)
+        async with caller.admission.admit():
+            call = asyncio.ensure_future(caller.call(slow))
+            await asyncio.sleep(0.02)
+            in_flight = caller.admission.in_flight
+            result = await call
+        await asyncio.sleep(0)
+        return caller, in_flight, result
+
+    caller, in_flight, result = asyncio.run(scenario())
+
+    assert result == "ok"
+    assert caller.counts["hedges"] == 1
+    assert in_flight == 2
+    assert caller.admission.in_flight == 0
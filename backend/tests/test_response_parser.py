@@ -0,0 +1,108 @@
+import json
+import re
+
+import pytest
+
+from benchmarks.context_replay import load_conversations
+from response_parser import parse_response
+
+
+def legacy_parse(response: str):
+    """server.parse_ai_response + clean_ai_response as they were before the single-pass parser"""
+    json_match = re.search(r'```json\s*(\{.*?\})\s*```', response, re.DOTALL)
+    if not json_match:
+        json_match = re.search(r'(\{[^{}]*"extracted_entities"[^{}]*\})', response, re.DOTALL)
+    parsed = None
+    if json_match:
+        try:
+            json_data = json.loads(json_match.group(1))
+            extracted = json_data.get("extracted_entities", {})
+            entities = {key: extracted[field] for field, key in (
+                ("width", "width"), ("length", "length"), ("post_height", "postHeight"),
+                ("number_of_shelves", "numberOfShelves"), ("shelf_style", "shelfStyle"),
+                ("solid_bottom_shelf", "solidBottomShelf"), ("color_and_finish", "color"),
+                ("type_of_posts", "postType"), ("shelf_dividers_count", "shelfDividersCount"),
+                ("shelf_dividers_shelves", "shelfDividersShelves"), ("enclosure_type", "enclosureType"),
+            ) if extracted.get(field) or (field == "solid_bottom_shelf" and extracted.get(field) is not None)}
+            parsed = (entities, json_data.get("has_sufficient_entities", False),
+                      json_data.get("next_questions", []))
+        except json.JSONDecodeError:
+            pass
+    if parsed is None:
+        text_lower = response.lower()
+        entities = {}
+        for key, pattern in (("width", r'(\d+)\s*(?:inch|inches|in|"|′)?\s*(?:wide|width)'),
+                             ("length", r'(\d+)\s*(?:inch|inches|in|"|′)?\s*(?:long|length|deep|depth)'),
+                             ("postHeight", r'(\d+)\s*(?:inch|inches|in|"|′)?\s*(?:tall|high|height)'),
+                             ("numberOfShelves", r'(\d+)\s*(?:shelf|shelves|level|levels|tier|tiers)')):
+            match = re.search(pattern, text_lower)
+            if match:
+                entities[key] = int(match.group(1))
+        parsed = (entities, False, [])
+    cleaned = re.sub(r'```json.*?```', '', response, flags=re.DOTALL)
+    cleaned = re.sub(r'\{[^{}]*"extracted_entities"[^{}]*\}', '', cleaned, flags=re.DOTALL)
+    return (cleaned.strip(), *parsed)
+
+
+def current_parse(response: str):
+    parsed = parse_response(response)
+    return parsed.clean, parsed.entities, parsed.has_sufficient, parsed.next_questions
+
+
+REPLIES = [turn["assistant"] for conversation in load_conversations() for turn in conversation["turns"]]
+TYPICAL = next(reply for reply in REPLIES if '"width": 48' in reply and '"post_height": 72' in reply)
+PROSE, BLOCK = TYPICAL.split("```json")
+DATA = json.loads(BLOCK.strip("`\n"))
+
+
+@pytest.mark.parametrize("reply", REPLIES)
+def test_recorded_replies_parse_like_the_legacy_parser(reply):
+    assert current_parse(reply) == legacy_parse(reply)
+
+
+def test_nested_json_in_a_fence():
+    nested = json.loads(json.dumps(DATA))
+    nested["extracted_entities"]["shelf_dividers"] = {"count": 2, "shelves": {"levels": [1, 2]}}
+    reply = PROSE + "```json\n" + json.dumps(nested, indent=2) + "\n```"
+    assert current_parse(reply) == legacy_parse(reply)
+    assert current_parse(reply)[1]["postHeight"] == 72
+
+
+def test_bare_json_object():
+    # The legacy pattern can't match an object with nested braces and fell back to prose scraping
+    reply = PROSE + json.dumps(DATA)
+    clean, entities, has_sufficient, questions = current_parse(reply)
+    assert clean == PROSE.strip()
+    assert entities == legacy_parse(TYPICAL)[1]
+    assert (has_sufficient, questions) == (DATA["has_sufficient_entities"], DATA["next_questions"])
+    assert parse_response(reply).path == "fallback"
+
+
+def test_multiple_blocks_prefer_the_one_with_entities():
+    reply = PROSE + "```json\n{\"note\": 1}\n```\n" + TYPICAL + "\n" + TYPICAL
+    clean, entities, has_sufficient, questions = current_parse(reply)
+    legacy_clean, legacy_entities, _, _ = legacy_parse(reply)
+    # Every block is stripped as before, but the legacy parser took the first block's (empty) entities
+    assert clean == legacy_clean
+    assert legacy_entities == {}
+    assert entities == legacy_parse(TYPICAL)[1]
+    assert questions == DATA["next_questions"]
+
+
+@pytest.mark.parametrize("reply", [
+    PROSE + "```json\n{\"extracted_entities\": {\"width\": 48,, }\n```",
+    PROSE + "{\"extracted_entities\": {\"width\": 48",
+    "Sure, a 36 inch wide, 14 deep unit with 4 shelves works. ```json\n{not json}\n```",
+    PROSE * 3,
+])
+def test_malformed_or_missing_json_falls_back_like_the_legacy_parser(reply):
+    assert current_parse(reply) == legacy_parse(reply)
+    assert parse_response(reply).path == "natural_language"
+
+
+def test_structured_reply():
+    reply = json.dumps({"reply": " 48 wide it is. ", **DATA})
+    clean, entities, has_sufficient, questions = current_parse(reply)
+    assert clean == "48 wide it is."
+    assert entities == legacy_parse(TYPICAL)[1]
+    assert parse_response(reply).path == "structured"
@@ -0,0 +1,74 @@
+import asyncio
+
+from session_store import InMemorySessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_session_evicted_mid_turn_keeps_its_history_and_state():
+    clock = Clock()
+    store = InMemorySessionStore(idle_ttl=10, max_sessions=2, clock=clock)
+
+    async def scenario():
+        async with store.lock("customer"):
+            record = await store.load("customer")
+            await store.append_turn("customer", "48 wide", "48 it is.", "48 it is.", {"width": 48}, record.entities)
+        async with store.lock("customer"):
+            state = (await store.load("customer")).entities
+            # While the model is thinking: the session idles past its TTL and others fill the store
+            clock.now += 60
+            for other in ("b", "c", "d"):
+                await store.load(other)
+            merged = await store.append_turn("customer", "18 deep", "18 deep.", "18 deep.", {"length": 18}, state)
+        return merged, await store.history("customer")
+
+    merged, history = asyncio.run(scenario())
+
+    assert merged.to_dict()["width"] == 48
+    assert merged.to_dict()["length"] == 18
+    assert merged.version == 2
+    assert [turn.content for turn in history if turn.type == "user"] == ["48 wide", "18 deep"]
+
+
+def test_unlocked_idle_sessions_are_still_evicted():
+    clock = Clock()
+    store = InMemorySessionStore(idle_ttl=10, max_sessions=2, clock=clock)
+
+    async def scenario():
+        for session_id in ("a", "b"):
+            await store.load(session_id)
+        async with store.lock("b"):
+            await store.load("c")
+        clock.now += 60
+        await store.load("d")
+
+    asyncio.run(scenario())
+
+    assert "a" not in store
+    assert "d" in store
+    assert store.evictions == 3
+
+
+def test_session_deleted_mid_turn_is_rebuilt_from_the_turns_state():
+    store = InMemorySessionStore()
+
+    async def scenario():
+        async with store.lock("customer"):
+            record = await store.load("customer")
+            await store.append_turn("customer", "48 wide", "48 it is.", "48 it is.", {"width": 48}, record.entities)
+        async with store.lock("customer"):
+            state = (await store.load("customer")).entities
+            await store.delete("customer")
+            return await store.append_turn("customer", "18 deep", "18 deep.", "18 deep.", {"length": 18}, state)
+
+    merged = asyncio.run(scenario())
+
+    assert merged.to_dict()["width"] == 48
+    assert merged.version == 2
+    assert "customer" in store
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.fake_llm import FakeAsyncLLM
+from session_store import ShelfEntities
+from shelf_schema import FIELDS_BY_KEY, canonical_config, coerce_entity
+
+
+@pytest.mark.parametrize("key, raw", [
+    ("width", -48), ("width", "-48"), ("length", 0), ("postHeight", 10_000.5), ("numberOfShelves", 10_000),
+    ("numberOfShelves", "0"), ("shelfDividersCount", 99), ("shelfDividersShelves", [1, 50]),
+])
+def test_out_of_range_values_are_rejected(key, raw):
+    with pytest.raises(ValueError, match="must be between"):
+        coerce_entity(FIELDS_BY_KEY[key], raw)
+
+
+def test_out_of_range_values_never_enter_state():
+    state = ShelfEntities()
+    state.update({"width": 48})
+
+    changed = state.update({"width": -10, "numberOfShelves": 10_000, "length": 18})
+
+    assert changed == ["length"]
+    assert state.to_dict()["width"] == 48
+    assert state.to_dict()["number_of_shelves"] is None
+    assert state.version == 2
+
+
+def test_canonical_config_keeps_its_messages():
+    with pytest.raises(ValueError, match="^width must be between 1 and 240 inches$"):
+        canonical_config({"width": 500, "length": 18, "postHeight": 72, "numberOfShelves": 4})
+    with pytest.raises(ValueError, match="^number_of_shelves must be between 1 and 20$"):
+        canonical_config({"width": 48, "length": 18, "postHeight": 72, "numberOfShelves": 0})
+
+
+def test_model_extracted_nonsense_is_not_committed_or_echoed(app_server, monkeypatch):
+    block = json.dumps({"extracted_entities": {"width": -48, "number_of_shelves": 10_000, "length": 18},
+                        "has_sufficient_entities": False, "next_questions": []})
+    monkeypatch.setattr(app_server, "cerebras_client", FakeAsyncLLM(latency=0, reply=f"Noted.\n\n```json\n{block}\n```"))
+
+    async def scenario():
+        request = app_server.ChatMessage(message="make it huge", session_id="nonsense", known_version=0)
+        plain = app_server.ChatMessage(message="and again", session_id="nonsense")
+        return await app_server.chat_with_ai(request), await app_server.chat_with_ai(plain)
+
+    versioned, plain = asyncio.run(scenario())
+
+    assert versioned["changes"] == {"length": 18}
+    assert versioned["state_version"] == 1
+    assert plain.extracted_entities == {"length": 18}
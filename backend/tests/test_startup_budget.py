@@ -0,0 +1,16 @@
+from benchmarks.startup_budget import BUDGET_MS, eager_imports, import_times
+
+RUNS = 3
+
+
+def test_import_server_stays_within_the_startup_budget():
+    # Best of a few fresh interpreters, so one slow run on a busy machine doesn't fail the suite
+    runs = [import_times() for _ in range(RUNS)]
+    best = min(runs, key=lambda times: times["server"])
+
+    slowest = sorted(best.items(), key=lambda item: -item[1])[1:6]
+    assert best["server"] / 1000 <= BUDGET_MS, f"import server took {best['server'] / 1000:.0f} ms; slowest: {slowest}"
+
+
+def test_heavy_integrations_are_not_imported_eagerly():
+    assert eager_imports(import_times()) == []
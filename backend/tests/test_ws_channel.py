@@ -0,0 +1,20 @@
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_llm import FakeAsyncLLM
+
+
+def test_binary_frame_gets_an_error_frame_and_keeps_the_connection(app_server, monkeypatch):
+    monkeypatch.setattr(app_server, "cerebras_client", FakeAsyncLLM(latency=0))
+
+    with TestClient(app_server.app).websocket_connect("/api/ws/binary") as websocket:
+        assert websocket.receive_json()["type"] == "ready"
+        websocket.send_bytes(b"\x00\x01not text")
+        error = websocket.receive_json()
+        websocket.send_json({"type": "ping"})
+        pong = websocket.receive_json()
+        websocket.send_json({"type": "message", "message": "I need a shelf for my garage", "stream": False})
+        frames = [websocket.receive_json() for _ in range(2)]
+
+    assert error == {"type": "error", "status": 400, "detail": "Expected a message frame"}
+    assert pong == {"type": "pong"}
+    assert [frame["type"] for frame in frames] == ["entities", "final"]
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+# WebSocket conversation channel settings
+WS_HEARTBEAT_INTERVAL = float(os.environ.get("WS_HEARTBEAT_INTERVAL", "20"))
+WS_IDLE_TIMEOUT = float(os.environ.get("WS_IDLE_TIMEOUT", "60"))
+
+# Close codes (4000-4999 are reserved for applications)
+CLOSE_REPLACED = 4000
+CLOSE_IDLE = 4001
+
+
+class ChatConnection:
+    """One session's WebSocket: serialized JSON sends, heartbeats and an idle timeout.
+
+    The heartbeat task and the conversation loop both send, so sends go
+    through a lock. Any frame from the client (including a pong) counts as
+    activity; a client silent for ``idle_timeout`` seconds is dropped.
+    """
+
+    def __init__(self, websocket: WebSocket, heartbeat_interval: float = WS_HEARTBEAT_INTERVAL,
+                 idle_timeout: float = WS_IDLE_TIMEOUT):
+        self.websocket = websocket
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self._send_lock = asyncio.Lock()
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(message))
+
+    async def receive(self) -> Optional[Dict[str, Any]]:
+        """Next client frame as a dict, None if it isn't a JSON object (binary frames included).
+
+        Raises asyncio.TimeoutError when the client has been idle too long
+        and WebSocketDisconnect when it has gone.
+        """
+        message = await asyncio.wait_for(self.websocket.receive(), self.idle_timeout)
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        text = message.get("text")
+        if text is None:
+            return None
+        try:
+            frame = json.loads(text)
+        except ValueError:
+            return None
+        return frame if isinstance(frame, dict) else None
+
+    def start_heartbeat(self) -> None:
+        self._heartbeat = asyncio.create_task(self._send_heartbeats())
+
+    async def _send_heartbeats(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.heartbeat_interval)
+                await self.send({"type": "ping"})
+        except Exception:
+            # The connection is gone; the conversation loop notices on its next receive
+            pass
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.stop()
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except RuntimeError:
+            # Already closed
+            pass
+
+    def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+
+class ConnectionRegistry:
+    """At most one live connection per session; a new one replaces the old"""
+
+    def __init__(self):
+        self._connections: Dict[str, ChatConnection] = {}
+
+    async def attach(self, session_id: str, connection: ChatConnection) -> None:
+        previous = self._connections.get(session_id)
+        self._connections[session_id] = connection
+        if previous is not None:
+            await previous.close(CLOSE_REPLACED, "replaced by a newer connection")
+
+    def detach(self, session_id: str, connection: ChatConnection) -> None:
+        connection.stop()
+        if self._connections.get(session_id) is connection:
+            del self._connections[session_id]
+
+    def __len__(self) -> int:
+        return len(self._connections)
@@ -6,16 +6,27 @@ cd /backend || { echo "Backend directory not found"; exit 1; }
 
 echo "Starting FastAPI backend"
 # Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+# More than one worker requires SESSION_BACKEND=redis so workers share sessions
+uvicorn server:app --host 0.0.0.0 --port 8001 --workers "${UVICORN_WORKERS:-1}" &
 BACKEND_PID=$!
 
-echo "Waiting for backend to start..."
-sleep 30
-
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+# Start nginx as soon as the backend reports ready, instead of after a fixed delay
+echo "Waiting for backend readiness..."
+READY_URL="http://127.0.0.1:8001/api/health/ready"
+DEADLINE=$(( $(date +%s) + ${STARTUP_TIMEOUT:-60} ))
+until wget -q -O /dev/null "$READY_URL" 2>/dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    if [ "$(date +%s)" -ge "$DEADLINE" ]; then
+        echo "Backend not ready after ${STARTUP_TIMEOUT:-60}s, exiting"
+        kill $BACKEND_PID
+        exit 1
+    fi
+    sleep 0.2
+done
+echo "Backend ready"
 
 # Start Nginx
 nginx -g 'daemon off;' &
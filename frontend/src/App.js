@@ -507,6 +507,15 @@ const ChatInterface = ({ onParametersExtracted, extractedParams, sessionId }) =>
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [isInitialized, setIsInitialized] = useState(false);
+  // Last session state version applied; replies then only carry the fields that changed
+  const stateVersionRef = useRef(null);
+
+  const applyStateChanges = (data) => {
+    if (data.changes && Object.keys(data.changes).length > 0) {
+      onParametersExtracted(data.changes);
+    }
+    stateVersionRef.current = data.state_version;
+  };
 
   // Initialize chat with AI greeting
   useEffect(() => {
@@ -515,10 +524,12 @@ const ChatInterface = ({ onParametersExtracted, extractedParams, sessionId }) =>
         try {
           const response = await axios.post(`${API}/chat`, {
             message: "Hello! I'm ready to help design wire shelving.",
-            session_id: sessionId
+            session_id: sessionId,
+            known_version: stateVersionRef.current
           });
           
           setMessages([{ type: 'ai', content: response.data.response }]);
+          applyStateChanges(response.data);
           setIsInitialized(true);
         } catch (error) {
           console.error('Error initializing chat:', error);
@@ -546,16 +557,15 @@ const ChatInterface = ({ onParametersExtracted, extractedParams, sessionId }) =>
     try {
       const response = await axios.post(`${API}/chat`, {
         message: currentInput,
-        session_id: sessionId
+        session_id: sessionId,
+        known_version: stateVersionRef.current
       });
 
       const aiMessage = { type: 'ai', content: response.data.response };
       setMessages(prev => [...prev, aiMessage]);
       
-      // Update extracted parameters
-      if (response.data.extracted_entities) {
-        onParametersExtracted(response.data.extracted_entities);
-      }
+      // Merge only the parameters that changed; no change, no 3D re-render
+      applyStateChanges(response.data);
       
     } catch (error) {
       console.error('Error in chat:', error);
@@ -1093,8 +1103,8 @@ function App() {
 
   const hasMinimumParams = shelfParams.width && shelfParams.length && shelfParams.postHeight && shelfParams.numberOfShelves;
 
-  const updateShelfParams = (newParams) => {
-    setShelfParams(newParams);
+  const updateShelfParams = (changedParams) => {
+    setShelfParams(prev => ({ ...prev, ...changedParams }));
   };
 
   const handleDownload3DModel = () => {